@@ -1,45 +1,96 @@
-from fastapi import APIRouter, Depends, Query
-from app.db.mongo import attendance_collection, users_collection
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from app.db.async_mongo import get_db
+from app.attendance.listing import (
+    ATTENDANCE_MAX_PAGE_SIZE, ATTENDANCE_PAGE_SIZE, build_query, export_attendance, page_attendance, parse_fields
+)
+from app.attendance.rollups import daily_present, monthly_present
+from app.attendance.trends import attendance_trends, trend_range
 from datetime import date
 from calendar import monthrange
-from app.services.dependencies import get_current_user, require_admin
+from app.face.frame_recognition import RECOGNIZE_MAX_FRAMES, RecognizerBusy, decode_frame, frame_recognizer
+from app.services.dependencies import get_current_user, get_recognizer_from_token, require_admin, require_recognizer
+import asyncio
+import time
 
 router = APIRouter(prefix="/attendance", tags=["Attendance"])
 
 
+async def _page(db, query: dict, limit: int, cursor: str | None, fields: str | None) -> dict:
+    try:
+        return await page_attendance(db, query, limit, cursor, parse_fields(fields))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/me")
-def get_my_attendance(current_user=Depends(get_current_user)):
+async def get_my_attendance(
+    limit: int = Query(ATTENDANCE_PAGE_SIZE, ge=1, le=ATTENDANCE_MAX_PAGE_SIZE),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
+    from_date: str | None = Query(None, alias="from", example="2025-01-01"),
+    to_date: str | None = Query(None, alias="to", example="2025-01-31"),
+    fields: str | None = Query(None, example="date,status"),
+    current_user=Depends(get_current_user),
+    db=Depends(get_db)
+):
+    """Own records, newest first, one page at a time (follow `next_cursor`)."""
     user_id = current_user["user_id"]
 
-    records = list(
-        attendance_collection.find(
-            {"user_id": user_id},
-            {"_id": 0}  # hide Mongo ObjectId
-        ).sort("date", -1)
-    )
+    page = await _page(db, await build_query(db, user_id, from_date, to_date), limit, cursor, fields)
 
     return {
         "user_id": user_id,
-        "attendance": records
+        **page
     }
 
 
 @router.get("/all")
-def get_all_attendance(admin_user=Depends(require_admin)):
-    records = list(
-        attendance_collection.find(
-            {},
-            {"_id": 0}
-        ).sort("date", -1)
-    )
+async def get_all_attendance(
+    limit: int = Query(ATTENDANCE_PAGE_SIZE, ge=1, le=ATTENDANCE_MAX_PAGE_SIZE),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
+    from_date: str | None = Query(None, alias="from", example="2025-01-01"),
+    to_date: str | None = Query(None, alias="to", example="2025-01-31"),
+    department: str | None = None,
+    user_id: str | None = None,
+    fields: str | None = Query(None, example="user_id,date"),
+    admin_user=Depends(require_admin),
+    db=Depends(get_db)
+):
+    """All records, newest first, one page at a time (follow `next_cursor`). Requires admin role."""
+    query = await build_query(db, user_id, from_date, to_date, department)
+    return await _page(db, query, limit, cursor, fields)
 
-    return {
-        "count": len(records),
-        "attendance": records
-    }
+
+@router.get("/export")
+async def export_attendance_records(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    from_date: str | None = Query(None, alias="from", example="2025-01-01"),
+    to_date: str | None = Query(None, alias="to", example="2025-01-31"),
+    department: str | None = None,
+    user_id: str | None = None,
+    fields: str | None = Query(None, example="user_id,date,status"),
+    admin_user=Depends(require_admin),
+    db=Depends(get_db)
+):
+    """
+    Stream every matching record as NDJSON or CSV, newest first, without
+    loading the result set into memory. Requires admin role.
+    """
+    try:
+        columns = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    query = await build_query(db, user_id, from_date, to_date, department)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_attendance(db, query, format, columns),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="attendance.{format}"'}
+    )
 
 @router.get("/summary/me")
-def my_monthly_summary(current_user=Depends(get_current_user)):
+async def my_monthly_summary(current_user=Depends(get_current_user), db=Depends(get_db)):
     user_id = current_user["user_id"]
 
     today = date.today()
@@ -54,10 +105,8 @@ def my_monthly_summary(current_user=Depends(get_current_user)):
 
     month_prefix = f"{year}-{month:02d}"
 
-    present_days = attendance_collection.count_documents({
-        "user_id": user_id,
-        "date": {"$regex": f"^{month_prefix}"}
-    })
+    # One rollup lookup instead of a regex count over the user's records
+    present_days = await monthly_present(db, user_id, month_prefix)
 
     absent_days = total_days - present_days
     attendance_percentage = round((present_days / total_days) * 100, 2) if total_days else 0.0
@@ -72,16 +121,15 @@ def my_monthly_summary(current_user=Depends(get_current_user)):
     }
 
 @router.get("/summary/day")
-def daily_summary(
+async def daily_summary(
     date: str = Query(..., example="2025-01-20"),
-    admin_user=Depends(require_admin)
+    admin_user=Depends(require_admin),
+    db=Depends(get_db)
 ):
     # Count only students (exclude admins)
-    total_users = users_collection.count_documents({"role": "user"})
+    total_users = await db.users.count_documents({"role": "user"})
 
-    present_count = attendance_collection.count_documents({
-        "date": date
-    })
+    present_count = await daily_present(db, date)
 
     absent_count = total_users - present_count
 
@@ -89,4 +137,126 @@ def daily_summary(
         "date": date,
         "present_count": present_count,
         "absent_count": absent_count
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/trends")
+async def get_attendance_trends(
+    from_date: str | None = Query(None, alias="from", example="2025-01-01"),
+    to_date: str | None = Query(None, alias="to", example="2025-01-31"),
+    group_by: str = Query("day", pattern="^(day|department|user)$"),
+    admin_user=Depends(require_admin),
+    db=Depends(get_db)
+):
+    """
+    Aggregated attendance between two dates (default: the last 30 days),
+    grouped by day, department or user. Requires admin role.
+    """
+    try:
+        start, end = trend_range(from_date, to_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return await attendance_trends(db, start, end, group_by)
+
+
+@router.post("/recognize")
+async def recognize_frames(
+    file: UploadFile | None = File(None),
+    files: list[UploadFile] | None = File(None),
+    recognizer=Depends(require_recognizer)
+):
+    """
+    Recognise faces in a JPEG frame (`file`) or a small batch of frames
+    (`files`) sent by a kiosk, and mark attendance for recognised users.
+    Requires a kiosk token (`POST /auth/kiosk-token`) or admin role.
+    Returns the faces found in each frame with their user ID, box and
+    match distance.
+    """
+    uploads = ([file] if file else []) + (files or [])
+    if not uploads:
+        raise HTTPException(status_code=400, detail="No frame uploaded")
+    if len(uploads) > RECOGNIZE_MAX_FRAMES:
+        raise HTTPException(status_code=400, detail=f"At most {RECOGNIZE_MAX_FRAMES} frames per request")
+
+    try:
+        frames = [decode_frame(await upload.read()) for upload in uploads]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    start = time.perf_counter()
+    try:
+        results = await asyncio.to_thread(frame_recognizer.recognize, frames)
+    except RecognizerBusy:
+        raise HTTPException(status_code=503, detail="Recognition server busy. Please retry shortly.")
+
+    return {
+        "frames": [{"frame": i, "faces": faces} for i, faces in enumerate(results)],
+        "processing_ms": round((time.perf_counter() - start) * 1000, 1)
+    }
+
+
+@router.get("/recognize/stats")
+async def recognition_stats(admin_user=Depends(require_admin)):
+    """Stage latencies, gallery state and attendance counters of server-side recognition."""
+    return frame_recognizer.snapshot_stats()
+
+
+@router.websocket("/recognize/ws")
+async def recognize_stream(websocket: WebSocket, token: str = Query(...)):
+    """
+    Streaming variant of `/attendance/recognize` for browser kiosks.
+
+    Browsers cannot set headers on a WebSocket, so the kiosk (or admin)
+    token is passed as `?token=`. The client sends binary JPEG frames; each processed frame
+    is answered with one JSON message. Frames arriving while the previous
+    one is processed replace each other, so a slow server skips stale
+    frames instead of falling behind the camera.
+    """
+    try:
+        await get_recognizer_from_token(token, websocket.app.state.db)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+
+    latest = asyncio.Queue(maxsize=1)
+    counters = {"received": 0, "dropped": 0}
+
+    def offer(item):
+        if latest.full():
+            latest.get_nowait()
+            counters["dropped"] += 1
+        latest.put_nowait(item)
+
+    async def receive():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    counters["received"] += 1
+                    offer((counters["received"], message["bytes"]))
+        finally:
+            offer(None)  # stop the sender
+
+    receiver = asyncio.create_task(receive())
+    try:
+        while (item := await latest.get()) is not None:
+            frame_id, data = item
+            reply = {"frame": frame_id, "dropped": counters["dropped"]}
+            start = time.perf_counter()
+            try:
+                frame = decode_frame(data)
+                reply["faces"] = (await asyncio.to_thread(frame_recognizer.recognize, [frame]))[0]
+            except ValueError as e:
+                reply["error"] = str(e)
+            except RecognizerBusy:
+                reply["error"] = "Recognition server busy"
+            reply["processing_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            await websocket.send_json(reply)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
@@ -1,21 +1,49 @@
-from fastapi import APIRouter, HTTPException
-from app.db.mongo import users_collection
-from app.services.auth import verify_password
+import os
+from datetime import timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from app.db.async_mongo import get_db
+from app.services.dependencies import KIOSK_ROLE, require_admin
 from app.services.jwt_service import create_access_token
+from app.services.login_guard import LoginQueueFull, LoginThrottled, login_throttle, password_verifier
+
+# Lifetime of kiosk device tokens; rotate SECRET_KEY to revoke them early
+KIOSK_TOKEN_EXPIRE_HOURS = float(os.getenv("KIOSK_TOKEN_EXPIRE_HOURS", 24 * 30))
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
 
 @router.post("/login")
-def login(user_id: str, password: str):
-    user = users_collection.find_one({"user_id": user_id})
+async def login(user_id: str, password: str, request: Request, db=Depends(get_db)):
+    try:
+        login_throttle.check(user_id, request.client.host if request.client else None)
+    except LoginThrottled as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many login attempts. Please wait and try again.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    user = await db.users.find_one({"user_id": user_id}, {"user_id": 1, "role": 1, "password_hash": 1})
 
     if not user:
+        login_throttle.failed(user_id)
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    if not verify_password(password, user["password_hash"]):
+    # bcrypt runs on its own bounded pool, never on the API's threads
+    try:
+        valid = await password_verifier.verify(user["user_id"], password, user["password_hash"])
+    except LoginQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many logins in progress. Please retry shortly.",
+            headers={"Retry-After": "1"}
+        )
+
+    if not valid:
+        login_throttle.failed(user_id)
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    login_throttle.succeeded(user_id)
     token = create_access_token({
         "sub": user["user_id"],
         "role": user["role"]
@@ -25,3 +53,37 @@ def login(user_id: str, password: str):
         "access_token": token,
         "token_type": "bearer"
     }
+
+
+@router.get("/login/stats")
+async def login_stats(admin_user=Depends(require_admin)):
+    """Password verification pool and throttling counters."""
+    return {
+        **password_verifier.snapshot_stats(),
+        "throttled": login_throttle.throttled
+    }
+
+
+@router.post("/kiosk-token")
+async def create_kiosk_token(
+    name: str = Query(..., min_length=1, max_length=64, pattern=r"^[A-Za-z0-9_.-]+$"),
+    hours: float | None = Query(None, gt=0),
+    admin_user=Depends(require_admin)
+):
+    """
+    Issue a token for a recognition kiosk (admin only).
+
+    The token can only submit frames to `/attendance/recognize` and its
+    WebSocket; it cannot act as any user.
+    """
+    hours = min(hours or KIOSK_TOKEN_EXPIRE_HOURS, KIOSK_TOKEN_EXPIRE_HOURS)
+    token = create_access_token(
+        {"sub": f"kiosk:{name}", "role": KIOSK_ROLE},
+        expires_delta=timedelta(hours=hours)
+    )
+    return {
+        "access_token": token,
+        "token_type": "bearer",
+        "kiosk": name,
+        "expires_in": int(hours * 3600)
+    }
@@ -1,30 +1,41 @@
 from fastapi import APIRouter, Depends, HTTPException, File, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
 from app.services.dependencies import get_current_user, require_admin
 from app.models.user import UserCreateByAdmin
 from app.services.auth import hash_password
-from app.db.mongo import users_collection
+from app.db.async_mongo import get_db
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
-from app.face.face_service import register_face_from_image
-import io
+from app.face.bulk_enrolment import bulk_enrol, items_from_files, items_from_zip, read_roster
+from app.face.registration_jobs import RegistrationInProgress, RegistrationQueueFull, registration_jobs
+import asyncio
+import json
+import zipfile
+import os
+
+# How long register-face waits for its job before answering 202 Accepted
+REGISTRATION_SYNC_WAIT = float(os.getenv("REGISTRATION_SYNC_WAIT", 5))
+# Images/clips accepted by one register-face call
+ENROL_MAX_SAMPLES = int(os.getenv("ENROL_MAX_SAMPLES", 20))
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
 
 @router.get("/me")
-def get_my_profile(current_user=Depends(get_current_user)):
+async def get_my_profile(current_user=Depends(get_current_user)):
     return current_user
 
 
 @router.get("/all")
-def get_all_users(admin_user=Depends(require_admin)):
+async def get_all_users(admin_user=Depends(require_admin), db=Depends(get_db)):
     """Get all users (admin only). Excludes password hash and face encodings for security."""
-    users = list(users_collection.find(
+    users = await db.users.find(
         {"role": "user"},
         {
             "password_hash": 0,
             "face_encodings": 0
         }
-    ))
+    ).to_list(length=None)
     
     # Convert ObjectId to string for JSON serialization
     for user in users:
@@ -37,34 +48,44 @@ def get_all_users(admin_user=Depends(require_admin)):
 
 
 @router.get("/admin-only")
-def admin_test(admin_user=Depends(require_admin)):
+async def admin_test(admin_user=Depends(require_admin)):
     return {
         "message": "You are an admin",
         "admin": admin_user
     }
 
 @router.post("/create")
-def create_user(
+async def create_user(
     user: UserCreateByAdmin,
-    admin_user=Depends(require_admin)
+    admin_user=Depends(require_admin),
+    db=Depends(get_db)
 ):
     # Check if user already exists
-    existing = users_collection.find_one({"user_id": user.user_id})
+    existing = await db.users.find_one({"user_id": user.user_id}, {"_id": 1})
     if existing:
         raise HTTPException(
             status_code=400,
             detail="User already exists"
         )
 
-    users_collection.insert_one({
-        "user_id": user.user_id,
-        "password_hash": hash_password(user.password),
-        "role": "user",
-        "name": user.name,
-        "email": user.email,
-        "department": user.department,
-        "created_at": datetime.utcnow()
-    })
+    # bcrypt is CPU-bound: keep it off the event loop
+    password_hash = await asyncio.to_thread(hash_password, user.password)
+    try:
+        await db.users.insert_one({
+            "user_id": user.user_id,
+            "password_hash": password_hash,
+            "role": "user",
+            "name": user.name,
+            "email": user.email,
+            "department": user.department,
+            "created_at": datetime.utcnow()
+        })
+    except DuplicateKeyError:
+        # Created by a concurrent request since the check above
+        raise HTTPException(
+            status_code=400,
+            detail="User already exists"
+        )
 
     return {
         "message": "User created successfully",
@@ -75,15 +96,22 @@ def create_user(
 @router.post("/register-face/{user_id}")
 async def register_face(
     user_id: str,
-    file: UploadFile = File(...),
-    admin_user=Depends(require_admin)
+    file: UploadFile | None = File(None),
+    files: list[UploadFile] | None = File(None),
+    admin_user=Depends(require_admin),
+    db=Depends(get_db)
 ):
     """
     Register face for a user. Requires admin role.
-    Accepts image file, processes it, and stores face encodings in MongoDB.
+    Accepts one image (`file`) and/or several images or a short video clip
+    (`files`), processes them in a worker process, and stores a compact
+    face representation (centroid plus a few prototypes) in MongoDB.
+    Answers with the result when processing finishes within
+    REGISTRATION_SYNC_WAIT seconds, otherwise with 202 and a job to poll
+    at `/users/register-face/jobs/{job_id}`.
     """
     # Check if user exists
-    user = users_collection.find_one({"user_id": user_id})
+    user = await db.users.find_one({"user_id": user_id}, {"_id": 0, "face_encodings": 1})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -94,29 +122,67 @@ async def register_face(
             detail="User already has a registered face. Re-registration not allowed."
         )
     
+    # Read the uploaded samples
+    uploads = ([file] if file else []) + (files or [])
+    if not uploads:
+        raise HTTPException(status_code=400, detail="No image uploaded")
+    if len(uploads) > ENROL_MAX_SAMPLES:
+        raise HTTPException(status_code=400, detail=f"At most {ENROL_MAX_SAMPLES} samples per registration")
+    samples = [await upload.read() for upload in uploads]
+    
     try:
-        # Read the uploaded image file
-        image_data = await file.read()
-        
-        # Process face and get encodings
-        encodings = register_face_from_image(image_data, user_id)
-        
-        # Store encodings in MongoDB
-        users_collection.update_one(
-            {"user_id": user_id},
-            {"$set": {
-                "face_encodings": encodings,
-                "face_registered_at": datetime.utcnow()
-            }}
-        )
-        
-        return {
-            "message": "Face registered successfully",
-            "user_id": user_id,
-            "encodings_count": len(encodings)
-        }
+        job = registration_jobs.submit(user_id, samples)
+    except RegistrationInProgress:
+        raise HTTPException(status_code=409, detail="A face registration for this user is already in progress")
+    except RegistrationQueueFull:
+        raise HTTPException(status_code=503, detail="Too many face registrations in progress. Please retry shortly.")
+    
+    if not await job.wait(REGISTRATION_SYNC_WAIT):
+        return JSONResponse(status_code=202, content=job.to_dict())
+    
+    if job.status == "failed":
+        raise HTTPException(status_code=job.error_status, detail=job.error)
+    return job.result
+
+
+@router.get("/register-face/jobs/{job_id}")
+async def get_registration_job(job_id: str, admin_user=Depends(require_admin)):
+    """Status of a face registration job (queued, running, done or failed)."""
+    job = registration_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Registration job not found")
+    return job.to_dict()
+
+
+@router.post("/bulk-enrol")
+async def bulk_enrol_faces(
+    files: list[UploadFile] = File(...),
+    roster: UploadFile | None = File(None),
+    admin_user=Depends(require_admin)
+):
+    """
+    Enrol a whole roster of photos in one request. Requires admin role.
+    
+    Accepts either one zip of photos (optionally containing `roster.csv`) or
+    several photo files named `<user_id>.jpg`, plus an optional roster CSV
+    (user_id, name, password, email, department, photo) used to create
+    users that do not exist yet. Streams one JSON line per progress event.
+    """
+    roster_rows = read_roster((await roster.read()).decode("utf-8-sig")) if roster else None
+    
+    if len(files) == 1 and files[0].filename.lower().endswith(".zip"):
+        try:
+            items = items_from_zip(await files[0].read(), roster_rows)
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail="Uploaded file is not a valid zip archive")
+    else:
+        items = items_from_files([(f.filename, await f.read()) for f in files], roster_rows)
+    
+    if not items:
+        raise HTTPException(status_code=400, detail="No photos found in upload")
+    
+    def events():
+        for event in bulk_enrol(items):
+            yield json.dumps(event) + "\n"
     
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing face: {str(e)}")
\ No newline at end of file
+    return StreamingResponse(events(), media_type="application/x-ndjson")
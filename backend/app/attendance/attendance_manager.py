@@ -1,23 +1,28 @@
 from datetime import datetime
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from app.db.mongo import attendance_collection
+from app.attendance.rollups import record_marks
 
 def mark_attendance(user_id):
     today = datetime.now().strftime("%Y-%m-%d")
     now_time = datetime.now().strftime("%H:%M:%S")
 
-    existing = attendance_collection.find_one({
-        "user_id": user_id,
-        "date": today
-    })
-
-    if existing:
+    # Single round trip: inserts only if the user has no record for today
+    try:
+        result = attendance_collection.update_one(
+            {"user_id": user_id, "date": today},
+            {"$setOnInsert": {"time": now_time, "status": "present"}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Another recognizer inserted the same mark a moment earlier
         return False
 
-    attendance_collection.insert_one({
-        "user_id": user_id,
-        "date": today,
-        "time": now_time,
-        "status": "present"
-    })
-
-    return True
+    created = result.upserted_id is not None
+    if created:
+        try:
+            record_marks([(user_id, today)])
+        except PyMongoError as e:
+            # The record is stored; only the counts drift until the next rollup rebuild
+            print(f"⚠ Could not update attendance rollups: {e}")
+    return created
@@ -0,0 +1,286 @@
+"""
+Batched, asynchronous attendance writer.
+
+Recognition events are queued and written in batches with one
+`bulk_write` of upserts keyed on (user_id, date), so a crowd arriving at
+once costs a handful of round trips instead of two per student. If
+MongoDB is unreachable, events go to a bounded on-disk spool and are
+replayed before the next successful batch. Newly created records are
+counted in the attendance rollups (see `rollups.record_marks`).
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from app.db.mongo import attendance_collection
+from app.db.schema import DUPLICATE_KEY, INDEXES, apply_indexes
+from app.attendance.rollups import record_marks
+
+ATTENDANCE_BATCH_SIZE = int(os.getenv("ATTENDANCE_BATCH_SIZE", 100))
+ATTENDANCE_FLUSH_INTERVAL = float(os.getenv("ATTENDANCE_FLUSH_INTERVAL", 0.5))
+ATTENDANCE_MAX_PENDING = int(os.getenv("ATTENDANCE_MAX_PENDING", 10000))
+ATTENDANCE_SPOOL_PATH = os.getenv(
+    "ATTENDANCE_SPOOL_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "attendance_spool.jsonl")
+)
+ATTENDANCE_SPOOL_MAX_EVENTS = int(os.getenv("ATTENDANCE_SPOOL_MAX_EVENTS", 100000))
+
+
+def attendance_upsert(user_id: str, date: str, time_str: str) -> UpdateOne:
+    """Insert-once write for one user and day; an existing record is left untouched."""
+    return UpdateOne(
+        {"user_id": user_id, "date": date},
+        {"$setOnInsert": {"time": time_str, "status": "present"}},
+        upsert=True
+    )
+
+
+class AttendanceSink:
+    """
+    Queue of attendance events flushed to MongoDB in batches.
+
+    `submit()` is fire-and-forget and returns a Future that resolves to
+    True (new record), False (already marked that day) or None (MongoDB
+    unavailable - the event was spooled to disk for a later retry - or
+    the batch failed unexpectedly and was logged). When
+    `max_pending` events are queued, `submit()` blocks (back-pressure).
+    `close()` flushes everything still queued; it also runs at exit.
+    `on_created` receives the (user_id, date) pairs of every batch's new
+    records; pass None to skip rollup maintenance.
+    """
+
+    def __init__(self, collection=attendance_collection, batch_size: int = ATTENDANCE_BATCH_SIZE,
+                 flush_interval: float = ATTENDANCE_FLUSH_INTERVAL,
+                 max_pending: int = ATTENDANCE_MAX_PENDING,
+                 spool_path: str | None = ATTENDANCE_SPOOL_PATH,
+                 spool_max_events: int = ATTENDANCE_SPOOL_MAX_EVENTS,
+                 on_created=record_marks):
+        self.collection = collection
+        self.on_created = on_created
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self.spool_max_events = spool_max_events
+
+        self.written = 0
+        self.duplicates = 0
+        self.spool_dropped = 0
+        self.batches = 0
+        self.rollup_errors = 0
+        self.spool_corrupt = 0
+        self.failed_batches = 0
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._stop = threading.Event()
+        self._thread = None
+        self._spool_size = self._count_spool()
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def start(self):
+        self._ensure_unique_index()
+        self._thread = threading.Thread(target=self._run, name="attendance-sink", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def close(self, timeout: float | None = None):
+        """Write every queued event, then stop the flush thread."""
+        if self._thread is None or self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        atexit.unregister(self.close)
+
+    def _ensure_unique_index(self):
+        try:
+            for name, error in apply_indexes(self.collection, INDEXES["attendance"]):
+                # Existing duplicate marks block the index; upserts still dedupe new ones
+                print(f"⚠ Could not create attendance index {name}: {error}")
+        except PyMongoError:
+            pass
+
+    # -- producers ---------------------------------------------------------
+
+    def submit(self, user_id: str, when: datetime | None = None,
+               block: bool = True, timeout: float | None = None) -> Future:
+        """
+        Queue an attendance event.
+
+        Args:
+            user_id: Recognised user
+            when: Time of the sighting (defaults to now)
+            block, timeout: Behaviour when the queue is full, as for queue.Queue.put
+
+        Raises:
+            queue.Full: If the queue stays full (non-blocking or timed out)
+        """
+        when = when or datetime.now()
+        future = Future()
+        event = {"user_id": user_id, "date": when.strftime("%Y-%m-%d"), "time": when.strftime("%H:%M:%S")}
+        self._queue.put((event, future), block=block, timeout=timeout)
+        return future
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    # -- flush thread ------------------------------------------------------
+
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                self._write(batch)
+            except Exception as e:
+                # The thread must survive: once it stops, the queue fills and submit() blocks forever
+                self.failed_batches += 1
+                print(f"⚠ Attendance batch of {len(batch)} event(s) failed: {e!r}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        # Give a crowd arriving together a moment to land in the same batch
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0 and not self._stop.is_set():
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        # One upsert per (user_id, date); repeat sightings share its outcome
+        grouped = {}
+        for event, future in batch:
+            key = (event["user_id"], event["date"])
+            grouped.setdefault(key, (event, []))[1].append(future)
+        events = [event for event, _ in grouped.values()]
+
+        try:
+            self._replay_spool()
+            inserted = self._bulk_upsert(events)
+        except PyMongoError:
+            try:
+                self._spool(events)
+            except OSError as e:
+                self.spool_dropped += len(events)
+                print(f"⚠ Could not spool {len(events)} attendance event(s): {e}")
+            for _, futures in grouped.values():
+                for future in futures:
+                    future.set_result(None)
+            return
+
+        self.batches += 1
+        for i, (_, futures) in enumerate(grouped.values()):
+            created = i in inserted
+            if created:
+                self.written += 1
+            else:
+                self.duplicates += 1
+            for j, future in enumerate(futures):
+                # Only the first sighting "created" the record
+                future.set_result(created and j == 0)
+
+    def _bulk_upsert(self, events) -> set:
+        """Upsert events; returns the positions of events that created a record."""
+        ops = [attendance_upsert(e["user_id"], e["date"], e["time"]) for e in events]
+        try:
+            result = self.collection.bulk_write(ops, ordered=False)
+            inserted = set(result.upserted_ids)
+        except BulkWriteError as e:
+            # Duplicate keys mean another writer marked the same user first
+            errors = [err for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY]
+            if errors:
+                raise
+            inserted = {item["index"] for item in e.details.get("upserted", [])}
+        self._record_created([events[i] for i in sorted(inserted)])
+        return inserted
+
+    def _record_created(self, events):
+        if not events or self.on_created is None:
+            return
+        try:
+            self.on_created([(e["user_id"], e["date"]) for e in events])
+        except PyMongoError as e:
+            # The records are stored; only the counts drift until the next rollup rebuild
+            self.rollup_errors += 1
+            print(f"⚠ Could not update attendance rollups: {e}")
+
+    # -- on-disk spool -----------------------------------------------------
+
+    def _count_spool(self) -> int:
+        if not self.spool_path or not os.path.exists(self.spool_path):
+            return 0
+        with open(self.spool_path, encoding="utf-8") as f:
+            return sum(1 for _ in f)
+
+    def _spool(self, events):
+        if not self.spool_path:
+            self.spool_dropped += len(events)
+            return
+        room = self.spool_max_events - self._spool_size
+        kept = events[:max(room, 0)]
+        self.spool_dropped += len(events) - len(kept)
+        if not kept:
+            return
+        os.makedirs(os.path.dirname(self.spool_path), exist_ok=True)
+        with open(self.spool_path, "a", encoding="utf-8") as f:
+            for event in kept:
+                f.write(json.dumps(event) + "\n")
+        self._spool_size += len(kept)
+
+    def _replay_spool(self):
+        """Write spooled events first; the spool is cleared only once they are stored."""
+        if not self._spool_size:
+            return
+        events, corrupt = [], 0
+        with open(self.spool_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    event = None
+                # e.g. a line cut short by a crash or a full disk: skip it, keep the rest
+                if isinstance(event, dict) and all(isinstance(event.get(k), str) for k in ("user_id", "date", "time")):
+                    events.append(event)
+                else:
+                    corrupt += 1
+        for start in range(0, len(events), self.batch_size):
+            self._bulk_upsert(events[start:start + self.batch_size])
+        os.remove(self.spool_path)
+        self._spool_size = 0
+        if corrupt:
+            self.spool_corrupt += corrupt
+            print(f"⚠ Skipped {corrupt} malformed attendance spool line(s)")
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "batches": self.batches,
+            "written": self.written,
+            "duplicates": self.duplicates,
+            "spooled": self._spool_size,
+            "spool_dropped": self.spool_dropped,
+            "spool_corrupt": self.spool_corrupt,
+            "failed_batches": self.failed_batches,
+            "rollup_errors": self.rollup_errors
+        }
@@ -0,0 +1,173 @@
+"""
+Keyset-paginated and streamed attendance listings.
+
+Records are listed newest first, ordered by (date, user_id) descending.
+A page ends with an opaque cursor encoding its last (date, user_id); the
+next page starts strictly after it, so every page is one index range
+scan however deep into the history it is, and records written meanwhile
+never shift later pages. Exports walk the same ordering through a Mongo
+cursor in batches, so memory stays flat on multi-year datasets. All
+queries run on the API's async database (see `app.db.async_mongo`).
+"""
+import base64
+import csv
+import io
+import json
+import os
+
+ATTENDANCE_PAGE_SIZE = int(os.getenv("ATTENDANCE_PAGE_SIZE", 100))
+ATTENDANCE_MAX_PAGE_SIZE = int(os.getenv("ATTENDANCE_MAX_PAGE_SIZE", 1000))
+EXPORT_BATCH_SIZE = int(os.getenv("ATTENDANCE_EXPORT_BATCH_SIZE", 1000))
+
+RECORD_FIELDS = ("user_id", "date", "time", "status")
+SORT = [("date", -1), ("user_id", -1)]
+
+
+def encode_cursor(record: dict) -> str:
+    """Opaque cursor pointing just after `record`."""
+    raw = json.dumps([record["date"], record["user_id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """
+    (date, user_id) a cursor points after.
+
+    Raises:
+        ValueError: If the cursor was not produced by `encode_cursor`
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        date, user_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(date, str) or not isinstance(user_id, str):
+        raise ValueError("Invalid cursor")
+    return date, user_id
+
+
+def parse_fields(fields: str | None) -> list:
+    """
+    Validate a comma-separated field list for projection-only listings.
+
+    Raises:
+        ValueError: If an unknown field is requested
+    """
+    if not fields:
+        return list(RECORD_FIELDS)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in RECORD_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(RECORD_FIELDS)}")
+    return requested
+
+
+async def build_query(db, user_id: str | None = None, start: str | None = None, end: str | None = None,
+                      department: str | None = None) -> dict:
+    """
+    Mongo filter for a listing.
+
+    Args:
+        db: The API's async database
+        user_id: Only this user's records
+        start, end: Inclusive "YYYY-MM-DD" bounds
+        department: Only records of users in this department
+    """
+    query = {}
+    if start or end:
+        query["date"] = {}
+        if start:
+            query["date"]["$gte"] = start
+        if end:
+            query["date"]["$lte"] = end
+
+    if department is not None:
+        members = await db.users.distinct("user_id", {"department": department})
+        if user_id is not None:
+            members = [member for member in members if member == user_id]
+        query["user_id"] = {"$in": members}
+    elif user_id is not None:
+        query["user_id"] = user_id
+    return query
+
+
+def _projection(fields) -> dict:
+    # The sort keys are always read: the next cursor is built from them
+    projection = {"_id": 0, "date": 1, "user_id": 1}
+    projection.update({field: 1 for field in fields})
+    return projection
+
+
+async def page_attendance(db, query: dict, limit: int = ATTENDANCE_PAGE_SIZE, cursor: str | None = None,
+                          fields=RECORD_FIELDS) -> dict:
+    """
+    One page of records matching `query`, newest first.
+
+    Args:
+        db: The API's async database
+        query: Filter from `build_query`
+        limit: Records per page, at most ATTENDANCE_MAX_PAGE_SIZE
+        cursor: `next_cursor` of the previous page
+        fields: Record fields to return
+
+    Returns:
+        Dict with `count`, `attendance` and `next_cursor` (None on the last page)
+
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    limit = max(1, min(limit, ATTENDANCE_MAX_PAGE_SIZE))
+    if cursor:
+        date, user_id = decode_cursor(cursor)
+        after = {"$or": [{"date": {"$lt": date}}, {"date": date, "user_id": {"$lt": user_id}}]}
+        query = {"$and": [query, after]} if query else after
+
+    # One extra record tells whether another page exists
+    rows = await db.attendance.find(query, _projection(fields)).sort(SORT).limit(limit + 1).to_list(length=None)
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    records = [{field: row.get(field) for field in fields} for row in rows[:limit]]
+    return {
+        "count": len(records),
+        "attendance": records,
+        "next_cursor": next_cursor
+    }
+
+
+async def export_attendance(db, query: dict, fmt: str = "ndjson", fields=RECORD_FIELDS,
+                            batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Stream every record matching `query` as NDJSON lines or CSV rows.
+
+    Yields one string per batch of `batch_size` records (CSV starts with a
+    header row), reading the Mongo cursor batch by batch.
+
+    Raises:
+        ValueError: If `fmt` is neither "ndjson" nor "csv"
+    """
+    if fmt not in ("ndjson", "csv"):
+        raise ValueError("format must be 'ndjson' or 'csv'")
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer:
+        writer.writerow(fields)
+
+    cursor = db.attendance.find(query, _projection(fields)).sort(SORT).batch_size(batch_size)
+    pending = 0
+    try:
+        async for row in cursor:
+            if writer:
+                writer.writerow([row.get(field, "") for field in fields])
+            else:
+                buffer.write(json.dumps({field: row.get(field) for field in fields}) + "\n")
+            pending += 1
+            if pending >= batch_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+    finally:
+        await cursor.close()
+
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,151 @@
+"""
+Day-partitioned "already marked today" cache shared by recognizer processes.
+
+Each process keeps today's present users in memory, so repeat sightings
+cost nothing. Marks are also recorded in a small SQLite file so other
+recognizer processes on the machine see them, and the set is warmed from
+`attendance_collection` with one query per day so a restart does not
+re-query MongoDB for everyone already marked. The warm-up runs on a
+background thread, never on the recognition path; until it finishes,
+users are only known from the local store (a repeat claim just re-sends
+an idempotent attendance upsert). A failed warm-up is retried every
+`PRESENCE_WARM_RETRY` seconds. Earlier days are dropped automatically
+when the date changes.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pymongo.errors import PyMongoError
+from app.db.mongo import attendance_collection
+
+PRESENCE_DB_PATH = os.getenv(
+    "PRESENCE_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "presence.db")
+)
+PRESENCE_WARM_RETRY = float(os.getenv("PRESENCE_WARM_RETRY", 30))
+
+
+class PresenceCache:
+    """
+    Set of users marked present today, shared through a local SQLite store.
+
+    Args:
+        path: SQLite file shared by every recognizer on this machine
+        collection: Attendance collection used to warm each new day
+        warm_retry: Seconds between attempts when a warm-up fails
+    """
+
+    def __init__(self, path: str = PRESENCE_DB_PATH, collection=attendance_collection,
+                 warm_retry: float = PRESENCE_WARM_RETRY):
+        self.path = path
+        self.collection = collection
+        self.warm_retry = warm_retry
+        self.warm_failures = 0
+        self._day = None
+        self._warmed_day = None
+        self._warming = False
+        self._warm_after = 0.0
+        self._present = set()
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS presence ("
+            " date TEXT NOT NULL, user_id TEXT NOT NULL,"
+            " PRIMARY KEY (date, user_id)) WITHOUT ROWID"
+        )
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now().strftime("%Y-%m-%d")
+
+    def _roll_over(self):
+        """
+        Switch to today's partition, dropping earlier days, and start the
+        day's warm-up if it has not succeeded yet. Call with the lock held.
+        """
+        today = self._today()
+        if today != self._day:
+            # Local store only: the MongoDB query runs on the warm-up thread
+            self._db.execute("DELETE FROM presence WHERE date < ?", (today,))
+            rows = self._db.execute("SELECT user_id FROM presence WHERE date = ?", (today,))
+            self._present = {user_id for (user_id,) in rows}
+            self._day = today
+            self._warm_after = 0.0
+
+        if self._warmed_day != today and not self._warming and time.monotonic() >= self._warm_after:
+            self._warming = True
+            threading.Thread(target=self._warm, args=(today,), name="presence-warm", daemon=True).start()
+        return today
+
+    def _warm(self, day: str):
+        """Merge the day's attendance from MongoDB into the local store."""
+        try:
+            marked = [doc["user_id"] for doc in self.collection.find({"date": day}, {"_id": 0, "user_id": 1})]
+        except PyMongoError:
+            # Offline: keep working from the local store and retry later
+            with self._lock:
+                self.warm_failures += 1
+                self._warm_after = time.monotonic() + self.warm_retry
+                self._warming = False
+            return
+
+        with self._lock:
+            try:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO presence (date, user_id) VALUES (?, ?)",
+                    ((day, user_id) for user_id in marked)
+                )
+                if self._day == day:
+                    self._present.update(marked)
+                self._warmed_day = day
+            finally:
+                self._warming = False
+
+    def is_present(self, user_id: str) -> bool:
+        """True if the user is already marked today, by this or another process."""
+        with self._lock:
+            today = self._roll_over()
+            if user_id in self._present:
+                return True
+            # Another recognizer may have marked them since we warmed
+            row = self._db.execute(
+                "SELECT 1 FROM presence WHERE date = ? AND user_id = ?", (today, user_id)
+            ).fetchone()
+            if row:
+                self._present.add(user_id)
+            return row is not None
+
+    def claim(self, user_id: str) -> bool:
+        """
+        Atomically record the user as present today.
+
+        Returns:
+            True if this call marked them, False if they already were -
+            only the claiming caller needs to write attendance
+        """
+        with self._lock:
+            today = self._roll_over()
+            if user_id in self._present:
+                return False
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO presence (date, user_id) VALUES (?, ?)", (today, user_id)
+            )
+            self._present.add(user_id)
+            return cursor.rowcount == 1
+
+    def discard(self, user_id: str):
+        """Undo a claim whose attendance write could not be queued."""
+        with self._lock:
+            today = self._roll_over()
+            self._present.discard(user_id)
+            self._db.execute("DELETE FROM presence WHERE date = ? AND user_id = ?", (today, user_id))
+
+    def __len__(self):
+        with self._lock:
+            self._roll_over()
+            return len(self._present)
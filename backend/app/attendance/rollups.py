@@ -0,0 +1,151 @@
+"""
+Pre-aggregated attendance counts.
+
+Two small collections are kept up to date as attendance is written:
+
+    attendance_daily     {_id: "2025-01-20", present: 42}
+    attendance_monthly   {_id: "<user_id>:2025-01", user_id, month, present: 17}
+
+Every writer that creates an attendance record calls `record_marks`
+with the (user_id, date) pairs it inserted, so summary endpoints read one
+document by `_id` instead of counting the attendance collection. Only
+newly created records are counted; repeat sightings never reach here.
+If a rollup update fails after its attendance write succeeded, the
+counts drift until `rebuild_rollups` runs (see
+`app.scripts.rebuild_attendance_rollups`).
+"""
+from pymongo import ReplaceOne, UpdateOne
+from app.db.mongo import attendance_collection, attendance_daily_collection, attendance_monthly_collection
+
+
+def month_of(date: str) -> str:
+    """"YYYY-MM" of a "YYYY-MM-DD" attendance date."""
+    return date[:7]
+
+
+def monthly_key(user_id: str, month: str) -> str:
+    return f"{user_id}:{month}"
+
+
+def record_marks(marks):
+    """
+    Count newly created attendance records in the rollups.
+
+    Args:
+        marks: Iterable of (user_id, date) pairs, one per record inserted
+    """
+    daily, monthly = {}, {}
+    for user_id, date in marks:
+        daily[date] = daily.get(date, 0) + 1
+        key = (user_id, month_of(date))
+        monthly[key] = monthly.get(key, 0) + 1
+    if not daily:
+        return
+
+    attendance_daily_collection.bulk_write([
+        UpdateOne({"_id": date}, {"$inc": {"present": count}}, upsert=True)
+        for date, count in daily.items()
+    ], ordered=False)
+    attendance_monthly_collection.bulk_write([
+        UpdateOne(
+            {"_id": monthly_key(user_id, month)},
+            {"$inc": {"present": count}, "$setOnInsert": {"user_id": user_id, "month": month}},
+            upsert=True
+        )
+        for (user_id, month), count in monthly.items()
+    ], ordered=False)
+
+
+async def daily_present(db, date: str) -> int:
+    """Users marked present on `date` (`db` is the API's async database)."""
+    doc = await db.attendance_daily.find_one({"_id": date}, {"present": 1})
+    return doc["present"] if doc else 0
+
+
+async def monthly_present(db, user_id: str, month: str) -> int:
+    """Days `user_id` was marked present in `month` ("YYYY-MM")."""
+    doc = await db.attendance_monthly.find_one({"_id": monthly_key(user_id, month)}, {"present": 1})
+    return doc["present"] if doc else 0
+
+
+def compute_rollups():
+    """
+    Count the attendance collection from scratch.
+
+    Returns:
+        Tuple of (daily, monthly) dicts: {date: present} and
+        {(user_id, month): present}
+    """
+    daily, monthly = {}, {}
+    # Legacy duplicate marks for the same user and day count once
+    per_user_day = attendance_collection.aggregate([
+        {"$group": {"_id": {"user_id": "$user_id", "date": "$date"}}}
+    ], allowDiskUse=True)
+    for row in per_user_day:
+        user_id, date = row["_id"]["user_id"], row["_id"]["date"]
+        daily[date] = daily.get(date, 0) + 1
+        key = (user_id, month_of(date))
+        monthly[key] = monthly.get(key, 0) + 1
+    return daily, monthly
+
+
+def stored_rollups():
+    """The rollups as currently stored, in the shape of `compute_rollups`."""
+    daily = {doc["_id"]: doc["present"] for doc in attendance_daily_collection.find()}
+    monthly = {(doc["user_id"], doc["month"]): doc["present"] for doc in attendance_monthly_collection.find()}
+    return daily, monthly
+
+
+def check_rollups() -> list:
+    """
+    Compare stored rollups with a fresh count.
+
+    Returns:
+        List of (kind, key, stored, actual) for every mismatch; empty when consistent
+    """
+    expected_daily, expected_monthly = compute_rollups()
+    stored_daily, stored_monthly = stored_rollups()
+    mismatches = []
+    for kind, expected, stored in (("daily", expected_daily, stored_daily),
+                                   ("monthly", expected_monthly, stored_monthly)):
+        for key in sorted(expected.keys() | stored.keys()):
+            if expected.get(key, 0) != stored.get(key, 0):
+                mismatches.append((kind, key, stored.get(key, 0), expected.get(key, 0)))
+    return mismatches
+
+
+def rebuild_rollups(batch_size: int = 1000) -> tuple:
+    """
+    Recompute every rollup from the attendance collection and replace
+    the stored ones. Marks written while this runs may be lost from the
+    counts; run it when recognizers are idle, then `check_rollups`.
+
+    Returns:
+        Tuple of (daily documents, monthly documents) written
+    """
+    daily, monthly = compute_rollups()
+
+    def replace_all(collection, docs):
+        ops = []
+        for doc in docs:
+            ops.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+            if len(ops) >= batch_size:
+                collection.bulk_write(ops, ordered=False)
+                ops = []
+        if ops:
+            collection.bulk_write(ops, ordered=False)
+
+    replace_all(attendance_daily_collection, (
+        {"_id": date, "present": count} for date, count in daily.items()
+    ))
+    replace_all(attendance_monthly_collection, (
+        {"_id": monthly_key(user_id, month), "user_id": user_id, "month": month, "present": count}
+        for (user_id, month), count in monthly.items()
+    ))
+
+    # Drop rollups whose records no longer exist
+    attendance_daily_collection.delete_many({"_id": {"$nin": list(daily)}})
+    attendance_monthly_collection.delete_many(
+        {"_id": {"$nin": [monthly_key(user_id, month) for user_id, month in monthly]}}
+    )
+    return len(daily), len(monthly)
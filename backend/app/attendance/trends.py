@@ -0,0 +1,108 @@
+"""
+Attendance analytics over a date range, aggregated inside MongoDB.
+
+Each query matches the range on the indexed `date` field first, so only
+records in the range are read, and returns one row per day, department
+or user instead of the raw records.
+"""
+import os
+from datetime import date, timedelta
+
+TREND_DEFAULT_DAYS = int(os.getenv("TREND_DEFAULT_DAYS", 30))
+TREND_MAX_DAYS = int(os.getenv("TREND_MAX_DAYS", 366))
+TREND_GROUPS = ("day", "department", "user")
+
+def trend_range(start: str | None = None, end: str | None = None):
+    """
+    Validate a requested range, defaulting to the last TREND_DEFAULT_DAYS days.
+
+    Returns:
+        Tuple of ("YYYY-MM-DD", "YYYY-MM-DD") start and end, inclusive
+
+    Raises:
+        ValueError: If a date is malformed, the range is reversed or too long
+    """
+    end_date = date.fromisoformat(end) if end else date.today()
+    start_date = date.fromisoformat(start) if start else end_date - timedelta(days=TREND_DEFAULT_DAYS - 1)
+    if start_date > end_date:
+        raise ValueError("'from' must not be after 'to'")
+    if (end_date - start_date).days >= TREND_MAX_DAYS:
+        raise ValueError(f"Range is limited to {TREND_MAX_DAYS} days")
+    return start_date.isoformat(), end_date.isoformat()
+
+
+def _pipeline(start: str, end: str, group_by: str) -> list:
+    match = {"$match": {"date": {"$gte": start, "$lte": end}, "status": "present"}}
+
+    if group_by == "day":
+        return [
+            match,
+            {"$group": {"_id": "$date", "present": {"$sum": 1}}},
+            {"$sort": {"_id": 1}},
+            {"$project": {"_id": 0, "date": "$_id", "present": 1}}
+        ]
+
+    per_user = {"$group": {"_id": "$user_id", "present": {"$sum": 1}, "last_date": {"$max": "$date"}}}
+    if group_by == "user":
+        return [
+            match,
+            per_user,
+            {"$sort": {"_id": 1}},
+            {"$project": {"_id": 0, "user_id": "$_id", "present": 1, "last_date": 1}}
+        ]
+
+    # department: collapse to one row per user before joining users
+    return [
+        match,
+        per_user,
+        {"$lookup": {
+            "from": "users",
+            "localField": "_id",
+            "foreignField": "user_id",
+            "as": "user"
+        }},
+        {"$group": {
+            "_id": {"$ifNull": [{"$arrayElemAt": ["$user.department", 0]}, None]},
+            "present": {"$sum": "$present"},
+            "users": {"$sum": 1}
+        }},
+        {"$sort": {"present": -1}},
+        {"$project": {"_id": 0, "department": "$_id", "present": 1, "users": 1}}
+    ]
+
+
+async def attendance_trends(db, start: str, end: str, group_by: str = "day") -> dict:
+    """
+    Aggregate attendance between two dates.
+
+    Args:
+        db: The API's async database
+        start, end: Inclusive "YYYY-MM-DD" bounds (see `trend_range`)
+        group_by: "day" (present/absent per day), "department" (records
+            and distinct users per department) or "user" (days present
+            and last date seen per user)
+
+    Returns:
+        Dict with the range, `total_users` (registered students) and the
+        aggregated `series`
+
+    Raises:
+        ValueError: If `group_by` is not one of TREND_GROUPS
+    """
+    if group_by not in TREND_GROUPS:
+        raise ValueError(f"group_by must be one of: {', '.join(TREND_GROUPS)}")
+
+    cursor = db.attendance.aggregate(_pipeline(start, end, group_by))
+    series = await cursor.to_list(length=None)
+    total_users = await db.users.count_documents({"role": "user"})
+    if group_by == "day":
+        for row in series:
+            row["absent"] = max(total_users - row["present"], 0)
+
+    return {
+        "from": start,
+        "to": end,
+        "group_by": group_by,
+        "total_users": total_users,
+        "series": series
+    }
@@ -0,0 +1,42 @@
+"""
+Async MongoDB access for the API routers.
+
+The motor client is opened by the app's lifespan (see `app.main`) and
+closed on shutdown; routers receive the database through the `get_db`
+dependency instead of importing a global, so DB round trips run on the
+event loop without holding a threadpool slot. Pool sizes come from
+MONGO_MAX_POOL_SIZE / MONGO_MIN_POOL_SIZE. Blocking code (recognizers,
+worker threads, scripts) keeps using `app.db.mongo`.
+"""
+from fastapi.requests import HTTPConnection
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from app.db.mongo import MONGO_DB_NAME, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_URI
+
+
+def open_database(app) -> AsyncIOMotorDatabase:
+    """Create the app's motor client (lifespan startup) and return its database."""
+    app.state.mongo_client = AsyncIOMotorClient(
+        MONGO_URI,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE
+    )
+    app.state.db = app.state.mongo_client[MONGO_DB_NAME]
+    return app.state.db
+
+
+def close_database(app):
+    """Close the app's motor client (lifespan shutdown)."""
+    client = getattr(app.state, "mongo_client", None)
+    if client is not None:
+        client.close()
+        app.state.mongo_client = None
+        app.state.db = None
+
+
+async def get_db(connection: HTTPConnection) -> AsyncIOMotorDatabase:
+    """
+    FastAPI dependency: the async database of the running app (HTTP or WebSocket).
+
+    Declared async so FastAPI resolves it on the event loop, not the threadpool.
+    """
+    return connection.app.state.db
@@ -10,9 +10,17 @@ MONGO_URI = os.getenv("MONGO_URI")
 if not MONGO_URI:
     raise Exception("❌ MONGO_URI not found in environment variables")
 
-client = MongoClient(MONGO_URI)
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "face_attendance")
+# Connection pool bounds, shared by the sync and async (app.db.async_mongo) clients
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
 
-db = client["face_attendance"]
+# Blocking client for recognizers, worker threads/processes and scripts
+client = MongoClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE, minPoolSize=MONGO_MIN_POOL_SIZE)
+
+db = client[MONGO_DB_NAME]
 attendance_collection = db["attendance"]
 users_collection = db["users"] 
-
+# Pre-aggregated counts maintained by app.attendance.rollups
+attendance_daily_collection = db["attendance_daily"]
+attendance_monthly_collection = db["attendance_monthly"]
@@ -0,0 +1,155 @@
+"""
+Index declarations for every collection, and checks that hot queries use them.
+
+`ensure_indexes()` creates the indexes below; it is idempotent and runs
+at API startup, from `app.scripts.check_query_plans`, and (for the
+attendance collection) when a recognizer's AttendanceSink starts.
+`check_query_plans()` runs `explain()` on each query in `HOT_QUERIES`
+and reports any whose winning plan scans the whole collection.
+
+The unique (user_id, date) attendance index is what makes marking
+race-free: when two recognizers upsert the same user and day at once,
+one insert wins and the other gets a duplicate key error, which writers
+treat as "already marked".
+"""
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure, PyMongoError
+from app.db.mongo import attendance_collection, attendance_monthly_collection, db, users_collection
+
+DUPLICATE_KEY = 11000
+
+INDEXES = {
+    "users": [
+        # Login, get_current_user and every per-user update
+        IndexModel([("user_id", ASCENDING)], unique=True, name="user_id_unique"),
+        # Student counts and listings
+        IndexModel([("role", ASCENDING)], name="role"),
+        # Department filter of attendance listings (covers the user_id it reads)
+        IndexModel([("department", ASCENDING), ("user_id", ASCENDING)], name="department_user_id"),
+        # Incremental gallery refresh by watermark
+        IndexModel([("face_registered_at", ASCENDING)], name="face_registered_at", sparse=True),
+    ],
+    "attendance": [
+        # One record per user per day; also serves per-user history
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], unique=True, name="user_id_date_unique"),
+        # Date ranges, trends and keyset pagination over everyone
+        IndexModel([("date", ASCENDING), ("user_id", ASCENDING)], name="date_user_id"),
+    ],
+}
+
+
+def apply_indexes(collection, models) -> list:
+    """
+    Create `models` on `collection`, one at a time so one failure does not
+    block the rest.
+
+    Returns:
+        List of (index name, error message) for indexes that could not be built
+    """
+    failures = []
+    for model in models:
+        try:
+            collection.create_indexes([model])
+        except OperationFailure as e:
+            # e.g. existing duplicate marks block a unique index
+            failures.append((model.document["name"], str(e)))
+    return failures
+
+
+def ensure_indexes(database=db) -> list:
+    """
+    Create every declared index that is missing (idempotent).
+
+    Returns:
+        List of (collection, index name, error message) for failed indexes
+    """
+    failures = []
+    for name, models in INDEXES.items():
+        for index_name, error in apply_indexes(database[name], models):
+            print(f"⚠ Could not create index {name}.{index_name}: {error}")
+            failures.append((name, index_name, error))
+    return failures
+
+
+def ensure_indexes_on_startup():
+    """Startup hook: never keeps the API from starting when MongoDB refuses."""
+    try:
+        ensure_indexes()
+    except PyMongoError as e:
+        print(f"⚠ Could not verify MongoDB indexes: {e}")
+
+
+def find_duplicate_marks() -> list:
+    """
+    Attendance records that block the unique (user_id, date) index.
+
+    Returns:
+        List of {"user_id", "date", "ids"} with ids ordered by mark time,
+        earliest (the one to keep) first
+    """
+    groups = attendance_collection.aggregate([
+        {"$sort": {"time": 1}},
+        {"$group": {"_id": {"user_id": "$user_id", "date": "$date"}, "ids": {"$push": "$_id"}}},
+        {"$match": {"ids.1": {"$exists": True}}}
+    ], allowDiskUse=True)
+    return [{"user_id": g["_id"]["user_id"], "date": g["_id"]["date"], "ids": g["ids"]} for g in groups]
+
+
+def remove_duplicate_marks() -> int:
+    """Delete all but the earliest record per user and day; returns the number removed."""
+    extra = [doc_id for group in find_duplicate_marks() for doc_id in group["ids"][1:]]
+    if not extra:
+        return 0
+    return attendance_collection.delete_many({"_id": {"$in": extra}}).deleted_count
+
+
+# Queries on request or recognition paths: (label, cursor factory).
+# Sample values only need the right types.
+HOT_QUERIES = [
+    ("mark_attendance upsert", lambda: attendance_collection.find({"user_id": "u", "date": "2025-01-20"})),
+    ("get_current_user / login", lambda: users_collection.find({"user_id": "u"})),
+    ("student count", lambda: users_collection.find({"role": "user"}, {"_id": 0, "role": 1})),
+    ("monthly summary rollup", lambda: attendance_monthly_collection.find({"_id": "u:2025-01"})),
+    ("own attendance page", lambda: attendance_collection.find({"user_id": "u"})
+        .sort([("date", DESCENDING), ("user_id", DESCENDING)]).limit(101)),
+    ("all attendance page", lambda: attendance_collection.find({})
+        .sort([("date", DESCENDING), ("user_id", DESCENDING)]).limit(101)),
+    ("attendance trends range", lambda: attendance_collection.find(
+        {"date": {"$gte": "2025-01-01", "$lte": "2025-01-31"}, "status": "present"})),
+    ("department members", lambda: users_collection.find({"department": "CS"}, {"_id": 0, "user_id": 1})),
+    ("gallery refresh", lambda: users_collection.find(
+        {"face_encodings": {"$exists": True, "$ne": None}, "face_registered_at": {"$gte": datetime(2025, 1, 1)}})),
+]
+
+
+def plan_stages(plan: dict) -> list:
+    """Every stage name in an explain() plan tree, root first."""
+    stages = [plan.get("stage")]
+    if "inputStage" in plan:
+        stages += plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return [stage for stage in stages if stage]
+
+
+def winning_plan(explanation: dict) -> dict:
+    planner = explanation["queryPlanner"]
+    plan = planner["winningPlan"]
+    # Slot-based engine (MongoDB 7+) nests the classic tree one level down
+    return plan.get("queryPlan", plan)
+
+
+def check_query_plans(queries=HOT_QUERIES) -> list:
+    """
+    Explain every hot query.
+
+    Returns:
+        List of (label, stages, ok) with ok False when the winning plan
+        contains a COLLSCAN
+    """
+    results = []
+    for label, make_cursor in queries:
+        stages = plan_stages(winning_plan(make_cursor().explain()))
+        results.append((label, stages, "COLLSCAN" not in stages))
+    return results
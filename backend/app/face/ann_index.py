@@ -0,0 +1,258 @@
+"""
+Approximate nearest-neighbour indexes over face encodings.
+Used when the gallery is too large for a brute-force scan per query.
+"""
+import os
+import numpy as np
+from app.face.gallery import ENCODING_DIM, FaceGallery, best_matches
+
+# Exact by default: IVF trades recall for speed, so large deployments opt in
+# (benchmark_ann measures ~0.95 recall@1 at nprobe=8 and ~1.0 at 32 on 20k encodings)
+FACE_INDEX = os.getenv("FACE_INDEX", "exact")
+FACE_INDEX_NPROBE = int(os.getenv("FACE_INDEX_NPROBE", 32))
+
+# Below this many encodings an IVF index just scans everything exactly
+IVF_MIN_TRAIN_SIZE = int(os.getenv("FACE_INDEX_MIN_TRAIN_SIZE", 4096))
+
+# Retrain (with a new nlist) once the index has grown by this factor since the last training
+IVF_RETRAIN_GROWTH = float(os.getenv("FACE_INDEX_RETRAIN_GROWTH", 2.0))
+
+# Rows per block when assigning vectors to centroids (bounds temporary memory)
+_ASSIGN_BLOCK = 8192
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid for every row of `vectors`."""
+    c_sq = np.einsum("ij,ij->i", centroids, centroids)
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), _ASSIGN_BLOCK):
+        block = vectors[start:start + _ASSIGN_BLOCK]
+        # ||v||^2 is constant per row so it does not affect the argmin
+        d2 = c_sq[None, :] - 2.0 * (block @ centroids.T)
+        labels[start:start + len(block)] = np.argmin(d2, axis=1)
+    return labels
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """
+    Lloyd's k-means with random-sample initialisation.
+
+    Returns:
+        Centroid matrix of shape (k, dim), float32
+    """
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = _assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        counts = np.bincount(labels, minlength=k)
+
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Re-seed empty clusters so every list stays useful
+        if empty.any():
+            centroids[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()), replace=False)]
+
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file index: encodings are partitioned by k-means into `nlist`
+    cells and a query only scans the `nprobe` cells closest to it.
+
+    `nprobe` is the recall/latency knob: raising it scans more cells, and
+    `nprobe >= nlist` is an exact search. Until the index holds
+    `min_train_size` encodings it keeps a single cell, i.e. brute force.
+    Once it has grown `retrain_growth` times past its last training it is
+    retrained; unless `nlist` was given, the cell count grows with it.
+    """
+
+    def __init__(self, nlist: int | None = None, nprobe: int = FACE_INDEX_NPROBE,
+                 min_train_size: int = IVF_MIN_TRAIN_SIZE, retrain_growth: float = IVF_RETRAIN_GROWTH):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.retrain_growth = retrain_growth
+        self.centroids = None
+        self.trained_size = 0
+        self._fixed_nlist = nlist is not None
+        self._lists = [FaceGallery()]
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def copy(self):
+        """Independent index with the same centroids and cells."""
+        index = IVFIndex(self.nlist, self.nprobe, self.min_train_size, self.retrain_growth)
+        index.centroids = self.centroids
+        index.trained_size = self.trained_size
+        index._fixed_nlist = self._fixed_nlist
+        index._lists = [cell.copy() for cell in self._lists]
+        index._size = self._size
+        return index
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def rows(self):
+        """(matrix, ids) of every stored encoding, cell by cell."""
+        matrix = np.concatenate([cell.matrix for cell in self._lists])
+        ids = np.concatenate([cell.ids for cell in self._lists])
+        return matrix, ids
+
+    def train(self, nlist: int | None = None):
+        """(Re)partition every stored encoding into k-means cells."""
+        matrix, ids = self.rows()
+        if len(matrix) == 0:
+            return
+        nlist = nlist or self.nlist or max(1, int(np.sqrt(len(matrix))))
+        nlist = min(nlist, len(matrix))
+
+        # Train on a sample; k-means quality saturates well before the full set
+        rng = np.random.default_rng(0)
+        sample_size = min(len(matrix), 256 * nlist)
+        sample = matrix[rng.choice(len(matrix), size=sample_size, replace=False)]
+
+        self.centroids = kmeans(sample, nlist)
+        self.nlist = nlist
+        self.trained_size = len(matrix)
+        self._lists = [FaceGallery(capacity=64) for _ in range(nlist)]
+        self._size = 0
+        self._insert(matrix, ids)
+
+    def _insert(self, encodings: np.ndarray, ids):
+        if self.is_trained:
+            labels = _assign(encodings, self.centroids)
+            for cell in np.unique(labels):
+                rows = np.flatnonzero(labels == cell)
+                self._lists[cell].add(encodings[rows], [ids[i] for i in rows])
+        else:
+            self._lists[0].add(encodings, ids)
+        self._size += len(encodings)
+
+    def add(self, encodings, ids):
+        """
+        Incrementally insert encodings; each goes to its nearest cell.
+
+        Args:
+            encodings: Array-like of shape (n, 128), or a single encoding
+            ids: A single user ID applied to every row, or a sequence of n IDs
+        """
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        if len(encodings) == 0:
+            return
+        if isinstance(ids, str):
+            ids = [ids] * len(encodings)
+        if len(ids) != len(encodings):
+            raise ValueError("Number of ids must match number of encodings")
+
+        self._insert(encodings, list(ids))
+        if not self.is_trained and self._size >= self.min_train_size:
+            self.train()
+        elif self.is_trained and self._size >= self.trained_size * self.retrain_growth:
+            # Cells sized for the old gallery get too long: re-partition with more of them
+            self.train(self.nlist if self._fixed_nlist else max(1, int(np.sqrt(self._size))))
+
+    def query(self, queries, k: int = 1, nprobe: int | None = None, exact: bool = False):
+        """
+        Find the (approximate) k nearest encodings for each query.
+
+        Args:
+            queries: Array-like of shape (m, 128)
+            k: Number of neighbours to return per query
+            nprobe: Cells to scan per query (defaults to `self.nprobe`)
+            exact: Scan every cell regardless of `nprobe`
+
+        Returns:
+            Tuple of (ids, distances), both shaped (m, min(k, len(index)))
+            and sorted by distance. Missing neighbours are padded with
+            None / inf when the probed cells hold fewer than k rows.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        m = len(queries)
+        k = min(k, self._size)
+        if m == 0 or k == 0:
+            return np.empty((m, 0), dtype=object), np.empty((m, 0), dtype=np.float32)
+
+        nprobe = len(self._lists) if exact else min(nprobe or self.nprobe, len(self._lists))
+        if self.is_trained and nprobe < len(self._lists):
+            probes = np.argpartition(self.centroids_distances(queries), nprobe - 1, axis=1)[:, :nprobe]
+        else:
+            probes = np.broadcast_to(np.arange(len(self._lists)), (m, len(self._lists)))
+
+        best_ids = np.full((m, k), None, dtype=object)
+        best_dists = np.full((m, k), np.inf, dtype=np.float32)
+
+        # Batch every query that probes the same cell into one gallery query
+        for cell in np.unique(probes):
+            gallery = self._lists[cell]
+            if len(gallery) == 0:
+                continue
+            rows = np.flatnonzero((probes == cell).any(axis=1))
+            cell_ids, cell_dists = gallery.query(queries[rows], k)
+
+            merged_dists = np.concatenate([best_dists[rows], cell_dists], axis=1)
+            merged_ids = np.concatenate([best_ids[rows], cell_ids], axis=1)
+            order = np.argsort(merged_dists, axis=1)[:, :k]
+            best_dists[rows] = np.take_along_axis(merged_dists, order, axis=1)
+            best_ids[rows] = np.take_along_axis(merged_ids, order, axis=1)
+
+        return best_ids, best_dists
+
+    def first_within(self, encoding, tolerance: float, exclude_id: str | None = None):
+        """
+        Find any encoding within tolerance, visiting cells nearest-first and
+        stopping at the first hit. Every cell is eventually scanned, so a
+        miss is exact (no false negatives from partitioning).
+
+        Returns:
+            (user_id, distance) or None
+        """
+        query = np.asarray(encoding, dtype=np.float32).reshape(1, ENCODING_DIM)
+        if self.is_trained:
+            cells = np.argsort(self.centroids_distances(query)[0])
+        else:
+            cells = range(len(self._lists))
+
+        for cell in cells:
+            hit = self._lists[cell].first_within(query[0], tolerance, exclude_id)
+            if hit is not None:
+                return hit
+        return None
+
+    def centroids_distances(self, queries: np.ndarray) -> np.ndarray:
+        """Squared distances (up to a per-query constant) from queries to centroids."""
+        c_sq = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        return c_sq[None, :] - 2.0 * (queries @ self.centroids.T)
+
+    def match(self, queries, tolerance: float):
+        """
+        Best match for each query, or None when no row is within tolerance.
+
+        Returns:
+            List of (user_id | None, distance | None), one per query
+        """
+        return best_matches(*self.query(queries, k=1), tolerance)
+
+
+def create_index(kind: str = FACE_INDEX):
+    """
+    Create an empty face index.
+
+    Args:
+        kind: "exact" for a brute-force FaceGallery, "ivf" for an IVFIndex
+
+    Returns:
+        Object exposing add(), query(), match(), first_within(), rows(), copy() and len()
+    """
+    if kind == "exact":
+        return FaceGallery()
+    if kind == "ivf":
+        return IVFIndex()
+    raise ValueError(f"Unknown face index type: {kind}")
@@ -0,0 +1,134 @@
+"""
+Batch face encoder.
+
+`face_recognition.face_encodings` handles one image per call and runs
+the dlib ResNet once per face. `BatchEncoder` takes many (image, boxes)
+pairs instead: landmarks are found per face, then each worker hands its
+whole share of images and faces to dlib's batched descriptor call, so
+per-call overhead is paid once per chunk rather than once per face.
+Images are converted to RGB into per-thread buffers that are reused
+across calls, and results come back as one contiguous float32 matrix.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import dlib
+import numpy as np
+from face_recognition import api as face_api
+from app.face.gallery import ENCODING_DIM
+
+BATCH_ENCODER_WORKERS = int(os.getenv("BATCH_ENCODER_WORKERS", os.cpu_count() or 2))
+
+# Below this many faces a batch is encoded on the calling thread
+PARALLEL_MIN_FACES = 8
+# Images per dlib call; also bounds the RGB buffers each thread keeps
+MAX_BATCH_IMAGES = 32
+
+
+class BatchEncoder:
+    """
+    Encodes faces from many images at once across a thread pool.
+
+    dlib releases the GIL while computing landmarks and descriptors, so
+    threads run in parallel without copying images to other processes.
+
+    Args:
+        workers: Encoding threads
+        num_jitters: Re-samples per face (higher is slower but more stable)
+    """
+
+    def __init__(self, workers: int = BATCH_ENCODER_WORKERS, num_jitters: int = 1):
+        self.workers = workers
+        self.num_jitters = num_jitters
+        self._local = threading.local()
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="batch-encoder")
+            return self._pool
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+    def _rgb(self, image: np.ndarray, slot: int) -> np.ndarray:
+        """BGR -> RGB into this thread's reusable buffer for `slot`."""
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        buffer = buffers.get(slot)
+        if buffer is None or buffer.shape != image.shape:
+            buffer = buffers[slot] = np.empty(image.shape, dtype=np.uint8)
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=buffer)
+
+    def _encode_chunk(self, pairs) -> np.ndarray:
+        """Encode a list of (bgr_image, boxes) on the current thread."""
+        rows = []
+        for start in range(0, len(pairs), MAX_BATCH_IMAGES):
+            images, shapes = [], []
+            for slot, (image, boxes) in enumerate(pairs[start:start + MAX_BATCH_IMAGES]):
+                rgb = self._rgb(image, slot)
+                detections = dlib.full_object_detections()
+                for box in boxes:
+                    detections.append(face_api.pose_predictor_5_point(rgb, face_api._css_to_rect(box)))
+                images.append(rgb)
+                shapes.append(detections)
+
+            descriptors = face_api.face_encoder.compute_face_descriptor(images, shapes, self.num_jitters)
+            rows.extend(np.asarray(d, dtype=np.float32) for per_image in descriptors for d in per_image)
+        if not rows:
+            return np.empty((0, ENCODING_DIM), dtype=np.float32)
+        return np.stack(rows)
+
+    def encode(self, pairs) -> np.ndarray:
+        """
+        Encode every face in a batch of images.
+
+        Args:
+            pairs: Sequence of (bgr_image, boxes) with boxes as
+                (top, right, bottom, left) in that image's coordinates
+
+        Returns:
+            Contiguous float32 matrix of shape (total_faces, 128), rows in
+            the order of `pairs` and then of each image's boxes
+        """
+        pairs = [(image, list(boxes)) for image, boxes in pairs if len(boxes)]
+        total = sum(len(boxes) for _, boxes in pairs)
+        if total == 0:
+            return np.empty((0, ENCODING_DIM), dtype=np.float32)
+        if total < PARALLEL_MIN_FACES or self.workers <= 1 or len(pairs) == 1:
+            return self._encode_chunk(pairs)
+
+        # Contiguous chunks of roughly equal face counts keep the output in order
+        per_worker = -(-total // self.workers)
+        chunks, current, count = [], [], 0
+        for pair in pairs:
+            current.append(pair)
+            count += len(pair[1])
+            if count >= per_worker:
+                chunks.append(current)
+                current, count = [], 0
+        if current:
+            chunks.append(current)
+
+        results = self._executor().map(self._encode_chunk, chunks)
+        return np.ascontiguousarray(np.concatenate(list(results)), dtype=np.float32)
+
+
+_default_encoder = None
+_default_lock = threading.Lock()
+
+
+def get_batch_encoder() -> BatchEncoder:
+    """Process-wide encoder, created on first use."""
+    global _default_encoder
+    with _default_lock:
+        if _default_encoder is None:
+            _default_encoder = BatchEncoder()
+        return _default_encoder
@@ -0,0 +1,323 @@
+"""
+Bulk enrolment of a whole class roster.
+
+Photos are decoded, detected and encoded in parallel worker processes
+(password hashes for new accounts are computed there too). Duplicate
+faces are then found against one refreshed index: a vectorised
+all-pairs check inside the batch, then an exact early-exit gallery scan
+per photo that ignores only the photo's own user. Users and encodings
+are written with `insert_many` / `bulk_write`.
+
+`bulk_enrol()` is a generator of per-item progress events, consumed by
+the `POST /users/bulk-enrol` endpoint and `app.scripts.bulk_enrol`.
+"""
+import csv
+import io
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime
+import cv2
+import face_recognition
+import numpy as np
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.db.mongo import users_collection
+from app.face.batch_encoder import BatchEncoder
+from app.face.encoding_store import pack_encodings
+from app.face.face_service import add_users_to_face_index, get_face_index
+from app.face.gallery import ENCODING_DIM
+from app.services.auth import hash_password
+from app.services.user_cache import user_cache
+
+BULK_ENROL_WORKERS = int(os.getenv("BULK_ENROL_WORKERS", os.cpu_count() or 2))
+# Photos handed to a worker process at a time
+BULK_ENROL_CHUNK = int(os.getenv("BULK_ENROL_CHUNK", 16))
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+ROSTER_FIELDS = ("user_id", "name", "password", "email", "department", "photo")
+
+
+@dataclass
+class EnrolmentItem:
+    """One photo to enrol; account fields are only needed for new users."""
+    user_id: str
+    image_data: bytes
+    filename: str | None = None
+    name: str | None = None
+    password: str | None = None
+    email: str | None = None
+    department: str | None = None
+
+
+def read_roster(text: str) -> dict:
+    """Parse a roster CSV (header row with `ROSTER_FIELDS` columns) into user_id -> row."""
+    roster = {}
+    for row in csv.DictReader(io.StringIO(text)):
+        row = {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+        if row.get("user_id"):
+            roster[row["user_id"]] = {key: row.get(key) or None for key in ROSTER_FIELDS}
+    return roster
+
+
+def _photo_user_id(filename: str) -> str:
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def items_from_files(files, roster: dict | None = None):
+    """
+    Build enrolment items from (filename, bytes) photos.
+
+    Photos are matched to roster rows by the roster's `photo` column, else
+    by file name (`<user_id>.jpg`).
+    """
+    roster = roster or {}
+    by_photo = {row["photo"]: user_id for user_id, row in roster.items() if row.get("photo")}
+    items = []
+    for filename, data in files:
+        user_id = by_photo.get(os.path.basename(filename)) or _photo_user_id(filename)
+        row = roster.get(user_id, {})
+        items.append(EnrolmentItem(
+            user_id=user_id,
+            image_data=data,
+            filename=filename,
+            name=row.get("name"),
+            password=row.get("password"),
+            email=row.get("email"),
+            department=row.get("department")
+        ))
+    return items
+
+
+def items_from_zip(data: bytes, roster: dict | None = None):
+    """Enrolment items from a zip of photos, with an optional `roster.csv` inside."""
+    files = []
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        for name in archive.namelist():
+            base = os.path.basename(name)
+            if base.lower() == "roster.csv" and roster is None:
+                roster = read_roster(archive.read(name).decode("utf-8-sig"))
+            elif base.lower().endswith(IMAGE_EXTENSIONS) and not base.startswith("."):
+                files.append((name, archive.read(name)))
+    return items_from_files(files, roster)
+
+
+# -- worker processes --------------------------------------------------------
+
+_encoder = None
+
+
+def _process_chunk(chunk):
+    """
+    Decode, detect and encode a chunk of photos in a worker process.
+
+    Args:
+        chunk: List of (position, image_data, password)
+
+    Returns:
+        List of (position, encoding, password_hash, error)
+    """
+    global _encoder
+    if _encoder is None:
+        # One thread per process: the pool already uses every core
+        _encoder = BatchEncoder(workers=1)
+
+    results, pending = [], []
+    for position, image_data, password in chunk:
+        frame = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            results.append((position, None, None, "Invalid image format"))
+            continue
+        locations = face_recognition.face_locations(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if len(locations) == 0:
+            results.append((position, None, None, "No face detected in the image"))
+        elif len(locations) > 1:
+            results.append((position, None, None, "Multiple faces detected. Please provide an image with only one face"))
+        else:
+            pending.append((position, frame, locations, password))
+
+    # Every single-face photo in the chunk goes through one batched encoder call
+    encodings = _encoder.encode([(frame, locations) for _, frame, locations, _ in pending])
+    for (position, _, _, password), encoding in zip(pending, encodings):
+        password_hash = hash_password(password) if password else None
+        results.append((position, encoding, password_hash, None))
+    return results
+
+
+# -- duplicate detection -----------------------------------------------------
+
+def find_batch_duplicates(encodings: np.ndarray, user_ids, tolerance: float, block: int = 1024) -> dict:
+    """
+    Vectorised all-pairs duplicate check inside a batch.
+
+    Returns:
+        {position: earlier position with the same face} - the first photo
+        of a face wins, later ones are duplicates
+    """
+    encodings = np.asarray(encodings, dtype=np.float32)
+    sq_norms = np.einsum("ij,ij->i", encodings, encodings)
+    limit = tolerance * tolerance
+    duplicates = {}
+    for start in range(0, len(encodings), block):
+        rows = encodings[start:start + block]
+        d2 = sq_norms[start:start + block, None] + sq_norms[None, :] - 2.0 * rows @ encodings.T
+        for i, j in zip(*np.nonzero(d2 <= limit)):
+            i += start
+            # Only pairs (earlier, later) of different users
+            if i < j and j not in duplicates and user_ids[i] != user_ids[j]:
+                duplicates[j] = i
+    return duplicates
+
+
+# -- orchestration -----------------------------------------------------------
+
+def _event(position: int, item: EnrolmentItem, status: str, error: str | None = None) -> dict:
+    event = {"index": position, "user_id": item.user_id, "filename": item.filename, "status": status}
+    if error:
+        event["error"] = error
+    return event
+
+
+def _validate(items):
+    """Per-item checks that need no image processing; returns (accepted positions, errors, existing)."""
+    existing = {
+        user["user_id"]: user
+        for user in users_collection.find(
+            {"user_id": {"$in": list({item.user_id for item in items})}},
+            {"_id": 0, "user_id": 1, "face_encodings": 1}
+        )
+    }
+    seen, accepted, errors = set(), [], {}
+    for position, item in enumerate(items):
+        if item.user_id in seen:
+            errors[position] = "Duplicate user_id in this batch"
+        elif item.user_id in existing and existing[item.user_id].get("face_encodings"):
+            errors[position] = "User already has a registered face. Re-registration not allowed."
+        elif item.user_id not in existing and not (item.name and item.password):
+            errors[position] = "User not found and roster has no name/password to create it"
+        else:
+            accepted.append(position)
+        seen.add(item.user_id)
+    return accepted, errors, existing
+
+
+def bulk_enrol(items, tolerance: float = 0.45, workers: int = BULK_ENROL_WORKERS):
+    """
+    Enrol a batch of photos, creating users that do not exist yet.
+
+    Args:
+        items: EnrolmentItem list
+        tolerance: Face distance below which two photos are the same person
+        workers: Worker processes for decoding, detection and encoding
+
+    Yields:
+        Progress events: one `encoded` or `error` event per photo as workers
+        finish, then one `enrolled` or `error` event per encoded photo, then
+        a final `{"status": "done", ...}` summary
+    """
+    items = list(items)
+    accepted, errors, existing = _validate(items)
+    for position, error in errors.items():
+        yield _event(position, items[position], "error", error)
+
+    # 1. Decode / detect / encode (and hash new passwords) across processes
+    encoded = {}
+    chunks = [
+        [(p, items[p].image_data, None if items[p].user_id in existing else items[p].password)
+         for p in accepted[start:start + BULK_ENROL_CHUNK]]
+        for start in range(0, len(accepted), BULK_ENROL_CHUNK)
+    ]
+    if chunks:
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as pool:
+            for future in as_completed([pool.submit(_process_chunk, chunk) for chunk in chunks]):
+                for position, encoding, password_hash, error in future.result():
+                    if error:
+                        errors[position] = error
+                        yield _event(position, items[position], "error", error)
+                    else:
+                        encoded[position] = (encoding, password_hash)
+                        yield _event(position, items[position], "encoded")
+
+    # 2. Duplicate check: all pairs within the batch, then the gallery
+    positions = sorted(encoded)
+    if positions:
+        matrix = np.stack([encoded[p][0] for p in positions]).astype(np.float32)
+        user_ids = [items[p].user_id for p in positions]
+        rejected = {}
+        for later, earlier in find_batch_duplicates(matrix, user_ids, tolerance).items():
+            rejected[positions[later]] = f"Same face as {user_ids[earlier]} in this batch"
+        # Exact search like find_duplicate_face (an ANN match can miss), ignoring only the row's own user
+        index = get_face_index()
+        for row, encoding in enumerate(matrix):
+            if positions[row] in rejected:
+                continue
+            hit = index.first_within(encoding, tolerance, exclude_id=user_ids[row])
+            if hit is not None:
+                rejected[positions[row]] = (f"This face already belongs to user: {hit[0]}. "
+                                            "Registration blocked to prevent impersonation.")
+        for position, error in rejected.items():
+            del encoded[position]
+            errors[position] = error
+            yield _event(position, items[position], "error", error)
+
+    # 3. Write new users with insert_many and existing ones with bulk_write
+    now = datetime.utcnow()
+    new_docs, updates, written, updated = [], [], [], []
+    for position in sorted(encoded):
+        item = items[position]
+        encoding, password_hash = encoded[position]
+        face_fields = {**pack_encodings(encoding.reshape(1, ENCODING_DIM)), "face_registered_at": now}
+        if item.user_id in existing:
+            updates.append(UpdateOne({"user_id": item.user_id}, {"$set": face_fields}))
+            updated.append(position)
+        else:
+            new_docs.append({
+                "user_id": item.user_id,
+                "password_hash": password_hash,
+                "role": "user",
+                "name": item.name,
+                "email": item.email,
+                "department": item.department,
+                "created_at": now,
+                **face_fields
+            })
+        written.append(position)
+
+    failed = {}
+    if new_docs:
+        try:
+            users_collection.insert_many(new_docs, ordered=False)
+        except BulkWriteError as e:
+            # e.g. a user created by someone else since validation
+            failed_ids = {err["op"]["user_id"]: err.get("errmsg", "Write failed")
+                          for err in e.details.get("writeErrors", [])}
+            failed.update((p, failed_ids[items[p].user_id]) for p in written if items[p].user_id in failed_ids)
+    created = len(new_docs) - len(failed)
+    if updates:
+        try:
+            users_collection.bulk_write(updates, ordered=False)
+        except BulkWriteError as e:
+            # Write errors carry the index of the failed operation in `updates`
+            failed.update((updated[err["index"]], err.get("errmsg", "Write failed"))
+                          for err in e.details.get("writeErrors", []))
+        user_cache.invalidate(*(items[p].user_id for p in updated))
+
+    enrolled = []
+    for position in written:
+        item = items[position]
+        if position in failed:
+            errors[position] = failed[position]
+            yield _event(position, item, "error", failed[position])
+        else:
+            enrolled.append((item.user_id, encoded[position][0].reshape(1, ENCODING_DIM)))
+            yield _event(position, item, "enrolled")
+    add_users_to_face_index(enrolled)
+
+    yield {
+        "status": "done",
+        "total": len(items),
+        "enrolled": len(enrolled),
+        "created": created,
+        "failed": len(errors)
+    }
@@ -0,0 +1,212 @@
+"""
+Interchangeable face detector backends.
+
+Every detector takes a BGR image and returns face boxes as
+(top, right, bottom, left) at that image's own scale, the same
+convention as `face_recognition.face_locations`, so boxes can be fed
+straight to the encoder.
+
+Backends:
+    hog   - dlib HOG via face_recognition (default, no model files)
+    haar  - OpenCV Haar cascade (bundled with opencv-python)
+    lbp   - OpenCV LBP cascade (lbpcascade_frontalface_improved.xml)
+    ssd   - OpenCV DNN ResNet-10 SSD (deploy.prototxt + caffemodel)
+    yunet - OpenCV YuNet (face_detection_yunet_2023mar.onnx)
+
+Model files for lbp/ssd/yunet are loaded from `FACE_MODEL_DIR`.
+"""
+import os
+import threading
+import cv2
+import face_recognition
+import numpy as np
+
+FACE_DETECTOR = os.getenv("FACE_DETECTOR", "hog")
+FACE_MODEL_DIR = os.getenv(
+    "FACE_MODEL_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+)
+DETECTOR_CONFIDENCE = float(os.getenv("DETECTOR_CONFIDENCE", 0.6))
+
+
+def _clip_boxes(boxes, height: int, width: int):
+    """(x, y, w, h) rows -> in-bounds (top, right, bottom, left) tuples."""
+    locations = []
+    for x, y, w, h in boxes:
+        top, left = max(int(y), 0), max(int(x), 0)
+        bottom, right = min(int(y + h), height), min(int(x + w), width)
+        if bottom > top and right > left:
+            locations.append((top, right, bottom, left))
+    return locations
+
+
+class FaceDetector:
+    """
+    Base class for detector backends.
+
+    Args:
+        scale: Downscale factor applied before detection; boxes are always
+            returned at the input image's scale
+    """
+
+    name = None
+
+    def __init__(self, scale: float = 1.0):
+        self.scale = scale
+
+    def detect(self, image: np.ndarray):
+        """Face boxes as (top, right, bottom, left) in `image` coordinates."""
+        small = image
+        if self.scale != 1:
+            small = cv2.resize(image, (0, 0), fx=self.scale, fy=self.scale)
+        locations = self._detect(small)
+        if self.scale == 1:
+            return locations
+        return [tuple(int(v / self.scale) for v in box) for box in locations]
+
+    def _detect(self, image: np.ndarray):
+        raise NotImplementedError
+
+
+class HogDetector(FaceDetector):
+    """dlib HOG + linear SVM - accurate on frontal faces, slowest on CPU."""
+
+    name = "hog"
+
+    def __init__(self, scale: float = 1.0, upsample: int = 1):
+        super().__init__(scale)
+        self.upsample = upsample
+
+    def _detect(self, image):
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        return face_recognition.face_locations(rgb, self.upsample, model="hog")
+
+
+class CascadeDetector(FaceDetector):
+    """OpenCV Haar or LBP cascade - very fast, more false positives."""
+
+    def __init__(self, cascade_path: str, scale: float = 1.0, min_neighbors: int = 5,
+                 min_size: int = 24):
+        super().__init__(scale)
+        if not os.path.exists(cascade_path):
+            raise FileNotFoundError(f"Missing cascade file: {cascade_path}")
+        self.classifier = cv2.CascadeClassifier(cascade_path)
+        if self.classifier.empty():
+            raise FileNotFoundError(f"Cannot load cascade: {cascade_path}")
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def _detect(self, image):
+        gray = cv2.equalizeHist(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+        boxes = self.classifier.detectMultiScale(
+            gray, scaleFactor=1.1, minNeighbors=self.min_neighbors,
+            minSize=(self.min_size, self.min_size)
+        )
+        return _clip_boxes(boxes, *gray.shape[:2])
+
+
+class HaarDetector(CascadeDetector):
+    name = "haar"
+
+    def __init__(self, scale: float = 1.0, **kwargs):
+        path = os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+        super().__init__(path, scale, **kwargs)
+
+
+class LbpDetector(CascadeDetector):
+    name = "lbp"
+
+    def __init__(self, scale: float = 1.0, model_dir: str = FACE_MODEL_DIR, **kwargs):
+        super().__init__(os.path.join(model_dir, "lbpcascade_frontalface_improved.xml"), scale, **kwargs)
+
+
+class SsdDetector(FaceDetector):
+    """OpenCV DNN ResNet-10 SSD (300x300 input) - robust to pose and lighting."""
+
+    name = "ssd"
+
+    def __init__(self, scale: float = 1.0, model_dir: str = FACE_MODEL_DIR,
+                 confidence: float = DETECTOR_CONFIDENCE):
+        super().__init__(scale)
+        prototxt = os.path.join(model_dir, "deploy.prototxt")
+        weights = os.path.join(model_dir, "res10_300x300_ssd_iter_140000.caffemodel")
+        for path in (prototxt, weights):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Missing SSD model file: {path}")
+        self.net = cv2.dnn.readNetFromCaffe(prototxt, weights)
+        self.confidence = confidence
+
+    def _detect(self, image):
+        height, width = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(image, 1.0, (300, 300), (104.0, 177.0, 123.0))
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+
+        kept = detections[detections[:, 2] >= self.confidence]
+        corners = kept[:, 3:7] * np.array([width, height, width, height])
+        boxes = [(x1, y1, x2 - x1, y2 - y1) for x1, y1, x2, y2 in corners]
+        return _clip_boxes(boxes, height, width)
+
+
+class YuNetDetector(FaceDetector):
+    """OpenCV YuNet (cv2.FaceDetectorYN) - fast CNN detector, good for small faces."""
+
+    name = "yunet"
+
+    def __init__(self, scale: float = 1.0, model_dir: str = FACE_MODEL_DIR,
+                 confidence: float = DETECTOR_CONFIDENCE):
+        super().__init__(scale)
+        model = os.path.join(model_dir, "face_detection_yunet_2023mar.onnx")
+        if not os.path.exists(model):
+            raise FileNotFoundError(f"Missing YuNet model file: {model}")
+        self.net = cv2.FaceDetectorYN.create(model, "", (320, 320), confidence)
+        self._input_size = None
+
+    def _detect(self, image):
+        height, width = image.shape[:2]
+        if self._input_size != (width, height):
+            self.net.setInputSize((width, height))
+            self._input_size = (width, height)
+        _, faces = self.net.detect(image)
+        if faces is None:
+            return []
+        return _clip_boxes(faces[:, :4], height, width)
+
+
+DETECTORS = {
+    cls.name: cls
+    for cls in (HogDetector, HaarDetector, LbpDetector, SsdDetector, YuNetDetector)
+}
+
+
+def create_detector(name: str = FACE_DETECTOR, **kwargs) -> FaceDetector:
+    """
+    Build a detector backend by name.
+
+    Raises:
+        ValueError: If the name is unknown
+        FileNotFoundError: If the backend's model files are missing
+    """
+    try:
+        cls = DETECTORS[name]
+    except KeyError:
+        raise ValueError(f"Unknown face detector '{name}' (choose from {', '.join(DETECTORS)})")
+    return cls(**kwargs)
+
+
+_local = threading.local()
+
+
+def get_detector(name: str = FACE_DETECTOR) -> FaceDetector:
+    """
+    Detector for the calling thread, created on first use.
+
+    OpenCV DNN networks are not safe to share between threads, so every
+    pipeline worker (and every pool process) gets its own instance.
+    """
+    cache = getattr(_local, "detectors", None)
+    if cache is None:
+        cache = _local.detectors = {}
+    if name not in cache:
+        cache[name] = create_detector(name)
+    return cache[name]
@@ -0,0 +1,54 @@
+"""
+Storage format for face encodings in MongoDB user documents.
+
+Format 1 (legacy): `face_encodings` is a list of 128-float lists.
+Format 2: `face_encodings` is one BinData blob of little-endian float32
+rows (n x 128), with `face_encoding_format` and `face_encoding_count`
+stored alongside it.
+"""
+import numpy as np
+from bson.binary import Binary
+from app.face.gallery import ENCODING_DIM
+
+ENCODING_FORMAT_VERSION = 2
+ENCODING_DTYPE = np.dtype("<f4")
+
+
+def pack_encodings(encodings) -> dict:
+    """
+    Build the user-document fields that store the given encodings.
+
+    Args:
+        encodings: Array-like of shape (n, 128), or a single encoding
+
+    Returns:
+        Dict of fields to `$set` on the user document
+    """
+    matrix = np.ascontiguousarray(encodings, dtype=ENCODING_DTYPE).reshape(-1, ENCODING_DIM)
+    return {
+        "face_encodings": Binary(matrix.tobytes()),
+        "face_encoding_format": ENCODING_FORMAT_VERSION,
+        "face_encoding_count": len(matrix)
+    }
+
+
+def unpack_encodings(stored) -> np.ndarray:
+    """
+    Read encodings from a user document's `face_encodings` value.
+
+    Binary values are wrapped with `np.frombuffer` without copying (the
+    result is read-only); legacy float lists are converted.
+
+    Returns:
+        float32 array of shape (n, 128); empty if nothing is stored
+    """
+    if not stored:
+        return np.empty((0, ENCODING_DIM), dtype=np.float32)
+    if isinstance(stored, bytes):
+        return np.frombuffer(stored, dtype=ENCODING_DTYPE).reshape(-1, ENCODING_DIM)
+    return np.asarray(stored, dtype=np.float32).reshape(-1, ENCODING_DIM)
+
+
+def is_legacy_format(user: dict) -> bool:
+    """True if the user document still stores encodings as float lists."""
+    return bool(user.get("face_encodings")) and not isinstance(user["face_encodings"], bytes)
@@ -2,127 +2,393 @@
 Face processing service for registration and recognition.
 Bridges API endpoints with face recognition models.
 """
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
 import cv2
 import face_recognition
 import numpy as np
-from io import BytesIO
 from app.db.mongo import users_collection
+from app.face.ann_index import FACE_INDEX, create_index
+from app.face.batch_encoder import get_batch_encoder
+from app.face.encoding_store import unpack_encodings
+from app.face.gallery import ENCODING_DIM, FaceGallery, LayeredGallery
+from app.face.gallery_snapshot import read_header, read_snapshot, write_snapshot
+from app.face.prototypes import FaceSummary, summarize_samples
 
+# Delta refreshes re-read this far behind the watermark so registrations
+# committed slightly out of timestamp order by other workers are not missed
+REFRESH_OVERLAP = timedelta(seconds=5)
 
-def register_face_from_image(image_data: bytes, user_id: str, samples: int = 10):
+GALLERY_SNAPSHOT_PATH = os.getenv(
+    "GALLERY_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gallery.snap")
+)
+
+# Rewrite the snapshot at startup once this many encodings come from deltas.
+# Only the initial load rewrites it: a long-running index never replaces a
+# user's rows (e.g. after compaction), so its later state may be stale.
+GALLERY_SNAPSHOT_MAX_DELTA = int(os.getenv("GALLERY_SNAPSHOT_MAX_DELTA", 256))
+
+# Encodings a shared index's delta layer holds before it is merged into the base
+GALLERY_DELTA_MAX = int(os.getenv("GALLERY_DELTA_MAX", 2048))
+
+# Frames sampled from an enrolment video clip
+ENROL_CLIP_FRAMES = int(os.getenv("ENROL_CLIP_FRAMES", 15))
+
+
+def _detect_single_face(frame):
+    """Face location of the only face in a BGR frame; ValueError otherwise."""
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    face_locations = face_recognition.face_locations(rgb)
+    
+    if len(face_locations) == 0:
+        raise ValueError("No face detected in the image")
+    
+    if len(face_locations) > 1:
+        raise ValueError("Multiple faces detected. Please provide an image with only one face")
+    
+    return face_locations
+
+
+def _decode_sample(data: bytes, max_frames: int = ENROL_CLIP_FRAMES):
+    """Frames of one uploaded sample: a still image, or frames spread across a short clip."""
+    frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if frame is not None:
+        return [frame]
+    
+    # Not an image: try it as a video clip (OpenCV only reads clips from files)
+    fd, path = tempfile.mkstemp(suffix=".clip")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        cap = cv2.VideoCapture(path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        step = max(1, total // max_frames) if total else 1
+        frames, index = [], 0
+        while len(frames) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if index % step == 0:
+                frames.append(frame)
+            index += 1
+        cap.release()
+        return frames
+    finally:
+        os.remove(path)
+
+
+def encode_face_samples(samples) -> FaceSummary:
     """
-    Process a single image and generate face encodings.
+    Encode several images and/or short clips of one person into a compact
+    centroid-plus-prototypes representation. CPU-bound and free of database
+    access, so it can run in a worker process.
+    
+    Frames without exactly one face are skipped when there are others to
+    use; a single still image keeps the strict single-image errors.
     
     Args:
-        image_data: Raw image bytes (JPEG/PNG)
-        user_id: User ID to register
-        samples: Number of encoding samples (not used for single image, kept for compatibility)
+        samples: Raw image (JPEG/PNG) or video clip bytes
     
     Returns:
-        List of face encodings (as lists of floats for JSON serialization)
+        FaceSummary (see `prototypes.summarize_samples`)
     
     Raises:
-        ValueError: If no face found or duplicate face detected
+        ValueError: If no usable face sample is found or the samples disagree
     """
-    # Convert bytes to numpy array
-    nparr = np.frombuffer(image_data, np.uint8)
-    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    
-    if frame is None:
+    frames = [frame for data in samples for frame in _decode_sample(data)]
+    if not frames:
         raise ValueError("Invalid image format")
     
-    # Convert BGR to RGB
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    pairs, first_error = [], None
+    for frame in frames:
+        try:
+            pairs.append((frame, _detect_single_face(frame)))
+        except ValueError as e:
+            first_error = first_error or e
+    if not pairs:
+        raise first_error
     
-    # Detect faces
-    face_locations = face_recognition.face_locations(rgb)
+    # All usable samples go through one batched encoder call
+    encodings = get_batch_encoder().encode(pairs)
+    return summarize_samples(encodings)
+
+
+def find_duplicate_face(encodings, current_uid: str, tolerance: float = 0.45) -> str | None:
+    """
+    Check if any face encoding already belongs to a different user.
     
-    if len(face_locations) == 0:
-        raise ValueError("No face detected in the image")
+    Served from the shared in-process index, which first pulls any faces
+    registered by other workers since its last refresh.
     
-    if len(face_locations) > 1:
-        raise ValueError("Multiple faces detected. Please provide an image with only one face")
+    Args:
+        encodings: Face encodings to check, shape (n, 128) or (128,)
+        current_uid: Current user ID (skip when checking)
+        tolerance: Face match tolerance threshold
     
-    # Generate encoding for detected face
-    encodings = face_recognition.face_encodings(rgb, face_locations)
+    Returns:
+        User ID of the first other user matched, None otherwise
+    """
+    index = shared_face_index.refresh()
+    for encoding in np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM):
+        hit = index.first_within(encoding, tolerance, exclude_id=current_uid)
+        if hit:
+            return hit[0]
+    return None
+
+
+def iter_registered_faces(since=None):
+    """
+    Stream registered users' encodings from MongoDB.
     
-    if not encodings:
-        raise ValueError("Could not generate face encoding")
+    Args:
+        since: Only users with `face_registered_at` at or after this time
     
-    # Check for duplicate faces
-    duplicate_uid = is_duplicate_face(encodings[0], user_id)
-    if duplicate_uid:
-        raise ValueError(f"This face already belongs to user: {duplicate_uid}. Registration blocked to prevent impersonation.")
+    Yields:
+        (user_id, encodings, face_registered_at) with encodings as a
+        float32 array of shape (n, 128)
+    """
+    query = {"face_encodings": {"$exists": True, "$ne": None}}
+    if since is not None:
+        query["face_registered_at"] = {"$gte": since}
+    
+    all_users = users_collection.find(
+        query,
+        {"_id": 0, "user_id": 1, "face_encodings": 1, "face_registered_at": 1}
+    )
+    
+    for user in all_users:
+        # Binary encodings are viewed in place; legacy float lists are converted
+        encodings = unpack_encodings(user.get("face_encodings"))
+        if len(encodings):
+            yield user["user_id"], encodings, user.get("face_registered_at")
+
+
+def _fetch_all_faces():
+    blocks = []
+    known_ids = []
+    watermark = None
+    
+    for user_id, encodings, registered_at in iter_registered_faces():
+        blocks.append(encodings)
+        known_ids.extend([user_id] * len(encodings))
+        if registered_at and (watermark is None or registered_at > watermark):
+            watermark = registered_at
     
-    # Convert numpy arrays to lists for JSON serialization
-    return [encoding.tolist() for encoding in encodings]
+    if not blocks:
+        return np.empty((0, ENCODING_DIM), dtype=np.float32), known_ids, watermark
+    return np.concatenate(blocks), known_ids, watermark
 
 
-def is_duplicate_face(new_encoding, current_uid: str, tolerance: float = 0.45) -> str | None:
+def write_gallery_snapshot(path: str = GALLERY_SNAPSHOT_PATH, rows=None) -> int:
     """
-    Check if the given face encoding already exists for a different user.
+    Write every registered face to a memory-mappable snapshot file.
     
     Args:
-        new_encoding: Face encoding to check
-        current_uid: Current user ID (skip when checking)
-        tolerance: Face match tolerance threshold
+        path: Snapshot file to (atomically) replace
+        rows: (matrix, ids, watermark) already in memory; fetched from
+            MongoDB when None
     
     Returns:
-        User ID if duplicate found, None otherwise
+        Epoch of the new snapshot
     """
-    all_users = users_collection.find({
-        "face_encodings": {"$exists": True, "$ne": None}
-    })
+    known_encodings, known_ids, watermark = rows if rows is not None else _fetch_all_faces()
+    header = read_header(path)
+    epoch = header[2] + 1 if header else 1
+    write_snapshot(path, known_encodings, known_ids, watermark, epoch)
+    return epoch
+
+
+class SharedFaceIndex:
+    """
+    Face index kept in sync with MongoDB.
     
-    for user in all_users:
-        existing_uid = user["user_id"]
+    The first refresh loads every registered face - from the gallery
+    snapshot when one is configured, else from MongoDB. Later refreshes only
+    fetch users whose `face_registered_at` is close to or after the newest
+    one already indexed, so faces registered by other workers become
+    visible without reloading the whole collection.
+    
+    Updates are copy-on-write: new faces go into a copy of the index that
+    then replaces `index` in one assignment, so readers holding the
+    previous index never see a half-applied update. `epoch` increases with
+    every swap. The index is a LayeredGallery and only its small delta
+    layer is copied per update; once the delta holds `GALLERY_DELTA_MAX`
+    encodings it is merged into a fresh copy of the base.
+    """
+    
+    def __init__(self, kind: str = FACE_INDEX, snapshot_path: str | None = None):
+        self.kind = kind
+        self.snapshot_path = snapshot_path
+        self.index = None
+        self.epoch = 0
+        self.watermark = None
+        self.user_ids = set()
+        self.last_reload_ms = None
+        self.snapshot_epoch = None
+        self._lock = threading.Lock()
+    
+    def _load_snapshot(self):
+        """
+        Base index over the gallery snapshot.
         
-        # Skip same user (re-registration check)
-        if existing_uid == current_uid:
-            continue
+        Returns:
+            Tuple of (index, rebuilt) - rebuilt is True when the snapshot
+            was just written from MongoDB or could not be used at all
+        """
+        snapshot = read_snapshot(self.snapshot_path)
+        rebuilt = snapshot is None
+        if snapshot is None:
+            # First process on this machine: build the snapshot for the others
+            try:
+                write_gallery_snapshot(self.snapshot_path)
+                snapshot = read_snapshot(self.snapshot_path)
+            except OSError:
+                snapshot = None
         
-        existing_encodings = user.get("face_encodings", [])
-        if not existing_encodings:
-            continue
+        if snapshot is None:
+            # Snapshot unavailable (e.g. read-only disk): load from MongoDB
+            return create_index(self.kind), rebuilt
         
-        # Convert list encodings back to numpy arrays for comparison
-        existing_encodings_np = [np.array(enc) for enc in existing_encodings]
+        if self.kind == "exact":
+            # Shared read-only pages below a private layer, so compaction never copies the snapshot
+            base = FaceGallery.wrap(snapshot.matrix, snapshot.ids, snapshot.sq_norms)
+            index = LayeredGallery(base, FaceGallery(capacity=64))
+        else:
+            index = create_index(self.kind)
+            index.add(snapshot.matrix, snapshot.ids)
         
-        # Compare faces
-        matches = face_recognition.compare_faces(
-            existing_encodings_np,
-            new_encoding,
-            tolerance=tolerance
-        )
+        self.epoch = snapshot.epoch
+        self.snapshot_epoch = snapshot.epoch
+        self.watermark = snapshot.watermark
+        self.user_ids = set(snapshot.ids)
+        return index, rebuilt
+    
+    def _publish(self, index, new_users):
+        """Add new users to `index` (a private copy) and swap it in."""
+        for user_id, encodings in new_users:
+            index.add(encodings, user_id)
+            self.user_ids.add(user_id)
+        if len(index.delta) >= GALLERY_DELTA_MAX:
+            index = self._compact(index)
+        self.index = index
+        self.epoch += 1
+    
+    @staticmethod
+    def _compact(index):
+        """Merge the delta layer into a copy of the base (O(base), once per GALLERY_DELTA_MAX rows)."""
+        base = index.base.copy()
+        base.add(*index.delta.rows())
+        return LayeredGallery(base, FaceGallery(capacity=64))
+    
+    def refresh(self):
+        """Load or catch up the index, then return it."""
+        rewrite = False
+        with self._lock:
+            start = time.perf_counter()
+            index = None
+            rebuilt = False
+            if self.index is None:
+                if self.snapshot_path:
+                    base, rebuilt = self._load_snapshot()
+                else:
+                    base = create_index(self.kind)
+                index = LayeredGallery(base, FaceGallery(capacity=64))
+            
+            since = None
+            if self.watermark is not None:
+                since = self.watermark - REFRESH_OVERLAP
+            elif self.user_ids:
+                # Snapshot of faces that predate face_registered_at: only newer ones are deltas
+                since = datetime.min
+            
+            new_users = []
+            for user_id, encodings, registered_at in iter_registered_faces(since):
+                if user_id not in self.user_ids:
+                    new_users.append((user_id, encodings))
+                if registered_at and (self.watermark is None or registered_at > self.watermark):
+                    self.watermark = registered_at
+            
+            if index is not None or new_users:
+                self._publish(index if index is not None else self.index.copy(), new_users)
+                self.last_reload_ms = (time.perf_counter() - start) * 1000
+            
+            added = sum(len(encodings) for _, encodings in new_users)
+            initial = index is not None
+            if self.snapshot_path and initial and not rebuilt and added > GALLERY_SNAPSHOT_MAX_DELTA:
+                # Published indexes are never modified, so they can be written out after unlocking
+                rewrite = True
+            index, watermark, loaded_epoch = self.index, self.watermark, self.snapshot_epoch
         
-        if True in matches:
-            return existing_uid  # Duplicate found
+        if rewrite:
+            try:
+                header = read_header(self.snapshot_path)
+                if header is None or header[2] == loaded_epoch:
+                    write_gallery_snapshot(self.snapshot_path, (*index.rows(), watermark))
+                # else: another process (or the compaction script) already replaced it
+            except OSError as e:
+                print(f"⚠ Could not rewrite gallery snapshot: {e}")
+        return index
     
-    return None
+    def add(self, user_id: str, encodings):
+        """
+        Insert a newly registered user's encodings, if the index is loaded.
+        
+        The watermark is left alone; the next refresh re-reads this user
+        from MongoDB and skips it as already indexed.
+        """
+        self.add_many([(user_id, encodings)])
+    
+    def add_many(self, users):
+        """Insert several users' encodings with a single index copy and swap."""
+        with self._lock:
+            if self.index is None:
+                return
+            new_users = [
+                (user_id, encodings) for user_id, encodings in users
+                if len(encodings) and user_id not in self.user_ids
+            ]
+            if new_users:
+                self._publish(self.index.copy(), new_users)
+    
+    def stats(self) -> dict:
+        """Current gallery size, epoch and the duration of the last reload."""
+        index = self.index
+        return {
+            "encodings": len(index) if index is not None else 0,
+            "users": len(self.user_ids),
+            "epoch": self.epoch,
+            "last_reload_ms": self.last_reload_ms
+        }
 
 
-def get_known_faces_from_db():
+shared_face_index = SharedFaceIndex()
+
+
+def get_face_index():
+    """Return the process-wide face index, loading or refreshing it as needed."""
+    return shared_face_index.refresh()
+
+
+def add_to_face_index(user_id: str, encodings):
     """
-    Load all registered face encodings from MongoDB.
+    Insert newly registered encodings into the shared index, if loaded.
     
-    Returns:
-        Tuple of (known_encodings, known_ids)
-        - known_encodings: List of numpy arrays
-        - known_ids: Corresponding user IDs
+    Args:
+        user_id: Owner of the encodings
+        encodings: float32 array of shape (n, 128)
     """
-    known_encodings = []
-    known_ids = []
-    
-    all_users = users_collection.find({
-        "face_encodings": {"$exists": True, "$ne": None}
-    })
+    shared_face_index.add(user_id, encodings)
+
+
+def add_users_to_face_index(users):
+    """
+    Insert a batch of newly registered users into the shared index, if loaded.
     
-    for user in all_users:
-        encodings = user.get("face_encodings", [])
-        if encodings:
-            # Convert list encodings back to numpy arrays
-            encodings_np = [np.array(enc) for enc in encodings]
-            known_encodings.extend(encodings_np)
-            known_ids.extend([user["user_id"]] * len(encodings_np))
-    
-    return known_encodings, known_ids
+    Args:
+        users: Iterable of (user_id, encodings) pairs
+    """
+    shared_face_index.add_many(users)
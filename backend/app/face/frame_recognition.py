@@ -0,0 +1,161 @@
+"""
+Recognition of frames uploaded by thin clients (browser kiosks).
+
+Clients send JPEG frames to the API instead of running dlib locally. The
+API process keeps one warm face index (hot-reloaded by a
+GalleryRefresher) and one batched attendance writer. Every face in a
+request is encoded in one batch and matched in one index query. At most
+`RECOGNIZE_WORKERS` requests are processed at once; a request that cannot
+get a slot within `RECOGNIZE_QUEUE_TIMEOUT` seconds is turned away.
+"""
+import os
+import threading
+import time
+import cv2
+import numpy as np
+from app.face.batch_encoder import get_batch_encoder
+from app.face.detectors import FACE_DETECTOR
+from app.face.face_service import shared_face_index
+from app.face.gallery_refresh import GalleryRefresher
+from app.face.pipeline import (
+    DETECTION_SCALE, FACE_MATCH_TOLERANCE, AttendanceWriter, StageStats, detect_faces, scale_locations
+)
+
+RECOGNIZE_WORKERS = int(os.getenv("RECOGNIZE_WORKERS", 2))
+RECOGNIZE_QUEUE_TIMEOUT = float(os.getenv("RECOGNIZE_QUEUE_TIMEOUT", 2))
+# Frames accepted by one request and the size of each
+RECOGNIZE_MAX_FRAMES = int(os.getenv("RECOGNIZE_MAX_FRAMES", 8))
+RECOGNIZE_MAX_FRAME_BYTES = int(os.getenv("RECOGNIZE_MAX_FRAME_BYTES", 2 * 1024 * 1024))
+
+
+class RecognizerBusy(Exception):
+    """Every recognition slot stayed taken for the whole queue timeout."""
+
+
+def decode_frame(data: bytes) -> np.ndarray:
+    """
+    Decode one uploaded JPEG (or any image OpenCV reads) to a BGR frame.
+
+    Raises:
+        ValueError: If the data is too large or not an image
+    """
+    if len(data) > RECOGNIZE_MAX_FRAME_BYTES:
+        raise ValueError(f"Frame larger than {RECOGNIZE_MAX_FRAME_BYTES} bytes")
+    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("Invalid image file")
+    return frame
+
+
+class FrameRecognizer:
+    """
+    Detects, encodes and matches faces in uploaded frames, marking
+    attendance for recognised users. Thread-safe; blocking.
+
+    Args:
+        tolerance: Maximum match distance
+        scale: Downscale factor applied before detection
+        detector: Detector backend name (see `detectors.DETECTORS`)
+        workers: Requests processed at once
+    """
+
+    def __init__(self, tolerance: float = FACE_MATCH_TOLERANCE, scale: float = DETECTION_SCALE,
+                 detector: str = FACE_DETECTOR, workers: int = RECOGNIZE_WORKERS):
+        self.tolerance = tolerance
+        self.scale = scale
+        self.detector = detector
+
+        self.refresher = None
+        self.attendance = None
+        self.stats = {name: StageStats() for name in ("detect", "encode", "match")}
+        self._slots = threading.BoundedSemaphore(workers)
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Load the gallery and start the refresher and attendance writer (idempotent)."""
+        with self._start_lock:
+            if self.refresher is not None:
+                return
+            shared_face_index.refresh()
+            refresher = GalleryRefresher(shared_face_index)
+            refresher.start()
+            self.attendance = AttendanceWriter()
+            self.attendance.start()
+            self.refresher = refresher
+
+    def shutdown(self):
+        """Stop the refresher and flush queued attendance writes."""
+        with self._start_lock:
+            if self.refresher is None:
+                return
+            self.refresher.stop()
+            self.attendance.stop()
+            self.refresher = None
+
+    def recognize(self, frames) -> list:
+        """
+        Recognise every face in a batch of decoded BGR frames.
+
+        Args:
+            frames: BGR frames, e.g. from `decode_frame`
+
+        Returns:
+            One list per frame of faces, each a dict with `user_id` (None
+            when unknown), `box` (top, right, bottom, left in frame pixels),
+            `distance` to the nearest registered face and `attendance`
+            ("queued", "already_marked", or None when unknown)
+
+        Raises:
+            RecognizerBusy: If no processing slot frees up in time
+        """
+        self.start()
+        if not self._slots.acquire(timeout=RECOGNIZE_QUEUE_TIMEOUT):
+            raise RecognizerBusy()
+        try:
+            start = time.perf_counter()
+            detected = [detect_faces(frame, self.scale, self.detector) for frame in frames]
+            self.stats["detect"].record(time.perf_counter() - start)
+
+            # One encoder batch and one index query for every face in the request
+            start = time.perf_counter()
+            encodings = get_batch_encoder().encode(detected)
+            self.stats["encode"].record(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            index = shared_face_index.index
+            if len(encodings) and index is not None and len(index):
+                matches = index.match(encodings, self.tolerance)
+            else:
+                matches = [(None, None)] * len(encodings)
+            self.stats["match"].record(time.perf_counter() - start)
+        finally:
+            self._slots.release()
+
+        results, position = [], 0
+        for _, locations in detected:
+            faces = []
+            for box in scale_locations(locations, self.scale):
+                user_id, distance = matches[position]
+                position += 1
+                attendance = None
+                if user_id is not None:
+                    attendance = "queued" if self.attendance.submit(user_id) else "already_marked"
+                faces.append({
+                    "user_id": user_id,
+                    "box": dict(zip(("top", "right", "bottom", "left"), box)),
+                    "distance": round(distance, 4) if distance is not None else None,
+                    "attendance": attendance
+                })
+            results.append(faces)
+        return results
+
+    def snapshot_stats(self) -> dict:
+        """Per-stage latency, gallery state and attendance counters."""
+        stats = {name: stage.snapshot() for name, stage in self.stats.items()}
+        if self.refresher is not None:
+            stats["gallery"] = self.refresher.stats()
+            stats["attendance"] = {"marked": self.attendance.marked_count, "dropped": self.attendance.dropped}
+        return stats
+
+
+frame_recognizer = FrameRecognizer()
@@ -0,0 +1,266 @@
+"""
+In-memory face gallery for fast nearest-neighbour matching.
+Holds every known encoding in one contiguous float32 matrix.
+"""
+import numpy as np
+
+ENCODING_DIM = 128
+
+
+class FaceGallery:
+    """
+    Contiguous (N x 128) float32 matrix of face encodings with an aligned id array.
+
+    Squared norms are precomputed on insert so a batch of queries is answered
+    with a single matrix product:  ||q - g||^2 = ||q||^2 + ||g||^2 - 2 q.g
+    """
+
+    def __init__(self, capacity: int = 1024, dim: int = ENCODING_DIM):
+        self.dim = dim
+        self._size = 0
+        self._matrix = np.empty((max(capacity, 1), dim), dtype=np.float32)
+        self._sq_norms = np.empty(max(capacity, 1), dtype=np.float32)
+        self._ids = np.empty(max(capacity, 1), dtype=object)
+
+    @classmethod
+    def from_encodings(cls, encodings, ids):
+        """Build a gallery from parallel sequences of encodings and user IDs."""
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        gallery = cls(capacity=len(encodings))
+        gallery.add(encodings, ids)
+        return gallery
+
+    @classmethod
+    def wrap(cls, matrix: np.ndarray, ids, sq_norms: np.ndarray | None = None):
+        """
+        Gallery over existing arrays without copying them (e.g. a read-only
+        memmap). Adding rows later copies everything into private memory.
+        """
+        gallery = cls.__new__(cls)
+        gallery.dim = matrix.shape[1]
+        gallery._size = len(matrix)
+        gallery._matrix = matrix
+        gallery._sq_norms = sq_norms if sq_norms is not None else np.einsum("ij,ij->i", matrix, matrix)
+        gallery._ids = np.empty(len(ids), dtype=object)
+        gallery._ids[:] = ids
+        return gallery
+
+    def __len__(self):
+        return self._size
+
+    def copy(self):
+        """Independent gallery with the same rows (and spare capacity for inserts)."""
+        gallery = FaceGallery(capacity=max(self._size + self._size // 4, 16), dim=self.dim)
+        gallery.add(self.matrix, self.ids)
+        return gallery
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """View of the populated rows of the encoding matrix."""
+        return self._matrix[:self._size]
+
+    @property
+    def ids(self) -> np.ndarray:
+        """View of the user IDs aligned with `matrix` rows."""
+        return self._ids[:self._size]
+
+    def rows(self):
+        """(matrix, ids) of every stored encoding."""
+        return self.matrix, self.ids
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        capacity = len(self._matrix)
+        if needed <= capacity:
+            return
+
+        capacity = max(capacity, 1)
+        while capacity < needed:
+            capacity *= 2
+
+        matrix = np.empty((capacity, self.dim), dtype=np.float32)
+        sq_norms = np.empty(capacity, dtype=np.float32)
+        ids = np.empty(capacity, dtype=object)
+        matrix[:self._size] = self._matrix[:self._size]
+        sq_norms[:self._size] = self._sq_norms[:self._size]
+        ids[:self._size] = self._ids[:self._size]
+        self._matrix, self._sq_norms, self._ids = matrix, sq_norms, ids
+
+    def add(self, encodings, ids):
+        """
+        Append encodings to the gallery.
+
+        Args:
+            encodings: Array-like of shape (n, 128), or a single encoding
+            ids: A single user ID applied to every row, or a sequence of n IDs
+        """
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        n = len(encodings)
+        if n == 0:
+            return
+
+        if isinstance(ids, str):
+            ids = [ids] * n
+        if len(ids) != n:
+            raise ValueError("Number of ids must match number of encodings")
+
+        self._reserve(n)
+        start, end = self._size, self._size + n
+        self._matrix[start:end] = encodings
+        self._sq_norms[start:end] = np.einsum("ij,ij->i", encodings, encodings)
+        self._ids[start:end] = ids
+        self._size = end
+
+    def distances(self, queries) -> np.ndarray:
+        """
+        Euclidean distances between every query and every gallery row.
+
+        Returns:
+            Array of shape (len(queries), len(gallery))
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        q_sq = np.einsum("ij,ij->i", queries, queries)
+        d2 = q_sq[:, None] + self._sq_norms[:self._size][None, :]
+        d2 -= 2.0 * (queries @ self.matrix.T)
+        np.maximum(d2, 0.0, out=d2)
+        return np.sqrt(d2, out=d2)
+
+    def query(self, queries, k: int = 1):
+        """
+        Find the k nearest gallery rows for each query encoding.
+
+        Args:
+            queries: Array-like of shape (m, 128) - e.g. all faces in one frame
+            k: Number of neighbours to return per query
+
+        Returns:
+            Tuple of (ids, distances), both shaped (m, k) and sorted by distance.
+            Empty galleries yield arrays with k == 0.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        m = len(queries)
+        k = min(k, self._size)
+        if m == 0 or k == 0:
+            return np.empty((m, 0), dtype=object), np.empty((m, 0), dtype=np.float32)
+
+        dist = self.distances(queries)
+        if k < self._size:
+            idx = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.broadcast_to(np.arange(self._size), (m, self._size))
+        part = np.take_along_axis(dist, idx, axis=1)
+        order = np.argsort(part, axis=1)
+        idx = np.take_along_axis(idx, order, axis=1)
+        return self.ids[idx], np.take_along_axis(part, order, axis=1)
+
+    def first_within(self, encoding, tolerance: float, exclude_id: str | None = None,
+                     block: int = 4096):
+        """
+        Find any row within tolerance of a single encoding, scanning in blocks
+        and stopping at the first block that contains a match.
+
+        Args:
+            encoding: Encoding to look up
+            tolerance: Maximum distance accepted as a match
+            exclude_id: Rows owned by this user ID are ignored
+
+        Returns:
+            (user_id, distance) of the closest match in the first matching
+            block, or None if no row is within tolerance
+        """
+        query = np.asarray(encoding, dtype=np.float32).reshape(self.dim)
+        max_d2 = tolerance * tolerance
+        q_sq = float(query @ query)
+
+        for start in range(0, self._size, block):
+            end = min(start + block, self._size)
+            d2 = q_sq + self._sq_norms[start:end] - 2.0 * (self._matrix[start:end] @ query)
+            hits = np.flatnonzero(d2 < max_d2)
+            if exclude_id is not None and len(hits):
+                hits = hits[self._ids[start + hits] != exclude_id]
+            if len(hits):
+                best = hits[np.argmin(d2[hits])]
+                return self._ids[start + best], float(np.sqrt(max(d2[best], 0.0)))
+
+        return None
+
+    def match(self, queries, tolerance: float):
+        """
+        Best match for each query, or None when no row is within tolerance.
+
+        Returns:
+            List of (user_id | None, distance | None), one per query
+        """
+        return best_matches(*self.query(queries, k=1), tolerance)
+
+
+class LayeredGallery:
+    """
+    Read-only base index (a memory-mapped snapshot shared with other
+    processes, an IVF index, or another LayeredGallery) plus a small
+    private delta gallery that receives all inserts. Queries search both
+    layers and merge the results.
+    """
+
+    def __init__(self, base: FaceGallery, delta):
+        self.base = base
+        self.delta = delta
+
+    def __len__(self):
+        return len(self.base) + len(self.delta)
+
+    def copy(self):
+        """Copy of the delta layer; the read-only base stays shared."""
+        return LayeredGallery(self.base, self.delta.copy())
+
+    def add(self, encodings, ids):
+        self.delta.add(encodings, ids)
+
+    def rows(self):
+        """(matrix, ids) of both layers, base first."""
+        base_matrix, base_ids = self.base.rows()
+        if len(self.delta) == 0:
+            return base_matrix, base_ids
+        delta_matrix, delta_ids = self.delta.rows()
+        return np.concatenate([base_matrix, delta_matrix]), np.concatenate([base_ids, delta_ids])
+
+    def query(self, queries, k: int = 1):
+        """Same contract as FaceGallery.query, over both layers."""
+        base_ids, base_dists = self.base.query(queries, k)
+        if len(self.delta) == 0:
+            return base_ids, base_dists
+
+        delta_ids, delta_dists = self.delta.query(queries, k)
+        ids = np.concatenate([base_ids, delta_ids], axis=1)
+        dists = np.concatenate([base_dists, delta_dists], axis=1)
+        order = np.argsort(dists, axis=1)[:, :k]
+        return np.take_along_axis(ids, order, axis=1), np.take_along_axis(dists, order, axis=1)
+
+    def first_within(self, encoding, tolerance: float, exclude_id: str | None = None):
+        hit = self.delta.first_within(encoding, tolerance, exclude_id)
+        if hit is None:
+            hit = self.base.first_within(encoding, tolerance, exclude_id)
+        return hit
+
+    def match(self, queries, tolerance: float):
+        return best_matches(*self.query(queries, k=1), tolerance)
+
+
+def best_matches(ids, dists, tolerance: float):
+    """
+    Reduce top-k query results to the best match per query.
+
+    Args:
+        ids, dists: (m, k) arrays as returned by a gallery or index `query`
+        tolerance: Maximum distance accepted as a match
+
+    Returns:
+        List of (user_id | None, distance | None), one per query
+    """
+    results = []
+    for row_ids, row_dists in zip(ids, dists):
+        if len(row_dists) and row_dists[0] < tolerance:
+            results.append((row_ids[0], float(row_dists[0])))
+        else:
+            results.append((None, float(row_dists[0]) if len(row_dists) else None))
+    return results
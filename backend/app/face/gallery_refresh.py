@@ -0,0 +1,97 @@
+"""
+Background hot-reload of the face gallery for long-running recognizers.
+"""
+import os
+import threading
+from pymongo.errors import PyMongoError
+from app.db.mongo import users_collection
+from app.face.face_service import SharedFaceIndex
+
+GALLERY_REFRESH_INTERVAL = float(os.getenv("GALLERY_REFRESH_INTERVAL", 5))
+
+# Only writes that can add a face are worth a refresh
+_FACE_CHANGES = [{
+    "$match": {
+        "operationType": {"$in": ["insert", "update", "replace"]},
+        "$or": [
+            {"operationType": {"$ne": "update"}},
+            {"updateDescription.updatedFields.face_encodings": {"$exists": True}}
+        ]
+    }
+}]
+
+
+class GalleryRefresher(threading.Thread):
+    """
+    Keeps a SharedFaceIndex current while a recognizer runs.
+
+    Tails a MongoDB change stream on the users collection when the server
+    supports one (replica sets), otherwise polls by `face_registered_at`
+    watermark every `interval` seconds. Either way only new faces are
+    fetched and the index is swapped atomically; read `self.index` on every
+    frame to pick up the latest version.
+    """
+
+    def __init__(self, shared: SharedFaceIndex, interval: float = GALLERY_REFRESH_INTERVAL,
+                 use_change_stream: bool = True):
+        super().__init__(name="gallery-refresher", daemon=True)
+        self.shared = shared
+        self.interval = interval
+        self.use_change_stream = use_change_stream
+        self.mode = None
+        self.errors = 0
+        self._stop_event = threading.Event()
+
+    @property
+    def index(self):
+        return self.shared.index
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _refresh(self):
+        try:
+            self.shared.refresh()
+        except PyMongoError:
+            # Keep serving the current gallery; the next cycle retries
+            self.errors += 1
+        except Exception as e:
+            # e.g. a malformed encoding blob: never let hot reload stop for good
+            self.errors += 1
+            print(f"⚠ Gallery refresh failed: {e!r}")
+
+    def _tail_change_stream(self) -> bool:
+        """Refresh on every face change; returns False if streams are unsupported."""
+        try:
+            with users_collection.watch(_FACE_CHANGES, max_await_time_ms=1000) as stream:
+                self.mode = "change_stream"
+                # Catch up on anything registered before the stream opened
+                self._refresh()
+                while not self._stop_event.is_set() and stream.alive:
+                    if stream.try_next() is not None:
+                        self._refresh()
+            return True
+        except Exception as e:
+            if self.mode != "change_stream":
+                return False
+            # Stream worked before: treat as transient, back off and reopen
+            self.errors += 1
+            if not isinstance(e, PyMongoError):
+                print(f"⚠ Gallery change stream failed: {e!r}")
+            self._stop_event.wait(self.interval)
+            return True
+
+    def run(self):
+        # Both loops survive any error: a dead refresher would silently freeze the gallery
+        if self.use_change_stream:
+            while not self._stop_event.is_set():
+                if not self._tail_change_stream():
+                    break
+
+        self.mode = "poll"
+        while not self._stop_event.wait(self.interval):
+            self._refresh()
+
+    def stats(self) -> dict:
+        """Gallery size, epoch, last reload latency and refresh mode."""
+        return {**self.shared.stats(), "mode": self.mode, "errors": self.errors}
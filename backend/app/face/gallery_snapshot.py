@@ -0,0 +1,154 @@
+"""
+On-disk gallery snapshot that recognizers memory-map at startup.
+
+Layout (little-endian):
+    [0, 4096)        header: magic, format version, dim, count, epoch,
+                     watermark (microseconds since the Unix epoch, UTC),
+                     byte length of the id table
+    [4096, ...)      float32 encoding matrix, count x dim
+    ...              float32 squared norms, count
+    ...              id table: UTF-8 JSON list of user IDs, one per row
+
+The matrix starts on a page boundary so every process mapping the file
+shares the same page-cache pages. Snapshots are written to a temporary
+file and renamed into place, so readers never observe a partial file and
+existing mappings stay valid after a rewrite.
+"""
+import json
+import os
+import struct
+import tempfile
+from datetime import datetime, timedelta
+from typing import NamedTuple
+import numpy as np
+from app.face.gallery import ENCODING_DIM
+
+SNAPSHOT_MAGIC = b"FACEGAL\0"
+SNAPSHOT_VERSION = 1
+HEADER_SIZE = 4096
+
+# magic, version, dim, count, epoch, watermark_us, ids_length
+_HEADER = struct.Struct("<8sIIQQqQ")
+_NO_WATERMARK = -1
+_UNIX_EPOCH = datetime(1970, 1, 1)
+
+
+class GallerySnapshot(NamedTuple):
+    matrix: np.ndarray      # read-only memmap, (count, dim) float32
+    sq_norms: np.ndarray    # read-only memmap, (count,) float32
+    ids: list
+    epoch: int
+    watermark: datetime | None
+
+
+def _to_micros(value: datetime | None) -> int:
+    if value is None:
+        return _NO_WATERMARK
+    return (value - _UNIX_EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value: int) -> datetime | None:
+    if value == _NO_WATERMARK:
+        return None
+    return _UNIX_EPOCH + timedelta(microseconds=value)
+
+
+def _unpack_header(raw: bytes):
+    if len(raw) < _HEADER.size:
+        return None
+    magic, version, dim, count, epoch, watermark_us, ids_length = _HEADER.unpack(raw[:_HEADER.size])
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        return None
+    return dim, count, epoch, _from_micros(watermark_us), ids_length
+
+
+def read_header(path: str):
+    """
+    Read a snapshot header.
+
+    Returns:
+        Tuple of (dim, count, epoch, watermark, ids_length), or None if the
+        file is missing or not a snapshot of this version
+    """
+    try:
+        with open(path, "rb") as f:
+            return _unpack_header(f.read(_HEADER.size))
+    except FileNotFoundError:
+        return None
+
+
+def write_snapshot(path: str, matrix, ids, watermark: datetime | None, epoch: int):
+    """
+    Atomically write a gallery snapshot.
+
+    Args:
+        path: Destination file
+        matrix: Encodings, shape (n, 128)
+        ids: User ID for each row
+        watermark: Newest `face_registered_at` included in the snapshot
+        epoch: Snapshot generation number
+    """
+    matrix = np.ascontiguousarray(matrix, dtype="<f4").reshape(-1, ENCODING_DIM)
+    if len(ids) != len(matrix):
+        raise ValueError("Number of ids must match number of encodings")
+    sq_norms = np.einsum("ij,ij->i", matrix, matrix).astype("<f4")
+    id_table = json.dumps(list(ids)).encode("utf-8")
+
+    header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, ENCODING_DIM, len(matrix),
+                          epoch, _to_micros(watermark), len(id_table))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".gallery-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header.ljust(HEADER_SIZE, b"\0"))
+            f.write(matrix.tobytes())
+            f.write(sq_norms.tobytes())
+            f.write(id_table)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_snapshot(path: str) -> GallerySnapshot | None:
+    """
+    Memory-map a gallery snapshot.
+
+    Returns:
+        GallerySnapshot backed by the page cache, or None if the file is
+        missing or invalid
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+
+    # Map through one open file so a concurrent rename cannot mix two snapshots
+    with f:
+        header = _unpack_header(f.read(_HEADER.size))
+        if header is None:
+            return None
+        dim, count, epoch, watermark, ids_length = header
+        if dim != ENCODING_DIM:
+            return None
+
+        matrix_bytes = count * dim * 4
+        norms_offset = HEADER_SIZE + matrix_bytes
+        ids_offset = norms_offset + count * 4
+
+        if count:
+            matrix = np.memmap(f, dtype="<f4", mode="r", offset=HEADER_SIZE, shape=(count, dim))
+            sq_norms = np.memmap(f, dtype="<f4", mode="r", offset=norms_offset, shape=(count,))
+        else:
+            matrix = np.empty((0, dim), dtype=np.float32)
+            sq_norms = np.empty(0, dtype=np.float32)
+
+        f.seek(ids_offset)
+        ids = json.loads(f.read(ids_length).decode("utf-8"))
+
+    if len(ids) != count:
+        return None
+
+    return GallerySnapshot(matrix, sq_norms, ids, epoch, watermark)
@@ -0,0 +1,422 @@
+"""
+Staged, multi-threaded camera recognition pipeline.
+
+    capture thread -> [latest frame] -> detect/track/encode workers -> [queue]
+        -> matcher thread -> [queue] -> attendance writer thread
+
+Stages are connected by bounded queues. The capture -> detect hand-off
+keeps only the newest frames, so a slow detector skips stale frames
+instead of falling behind the camera. dlib releases the GIL while
+detecting and encoding, so several worker threads run in parallel.
+Detected faces are tracked across frames and only encoded when their
+track is new or due for re-verification (see `tracker.FaceTracker`), and
+the capture stage skips static, empty frames and adapts the detection
+resolution to a latency budget (see `scheduler.FrameScheduler`).
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+import cv2
+import numpy as np
+from app.attendance.attendance_sink import AttendanceSink
+from app.attendance.presence_cache import PresenceCache
+from app.face.batch_encoder import get_batch_encoder
+from app.face.detectors import FACE_DETECTOR, get_detector
+from app.face.scheduler import FrameScheduler
+from app.face.tracker import FaceTracker
+
+FACE_MATCH_TOLERANCE = float(os.getenv("FACE_MATCH_TOLERANCE", 0.45))
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", 2))
+DETECTION_SCALE = float(os.getenv("DETECTION_SCALE", 0.25))
+
+
+class LatestQueue:
+    """Bounded queue that drops its oldest item when full (latest-frame-wins)."""
+
+    def __init__(self, maxsize: int = 1):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def empty(self) -> bool:
+        with self._cond:
+            return not self._items
+
+    def get(self, timeout: float | None = None):
+        """Oldest queued item; raises queue.Empty after `timeout` seconds."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                raise queue.Empty
+            return self._items.popleft()
+
+
+class StageStats:
+    """Throughput (over a sliding window) and average latency of one stage."""
+
+    def __init__(self, window: float = 2.0):
+        self.window = window
+        self.count = 0
+        self._stamps = deque()
+        self._latency = None
+        self._lock = threading.Lock()
+
+    def record(self, latency: float):
+        now = time.perf_counter()
+        with self._lock:
+            self.count += 1
+            self._stamps.append(now)
+            while self._stamps and now - self._stamps[0] > self.window:
+                self._stamps.popleft()
+            # Exponential moving average keeps the figure stable on screen
+            self._latency = latency if self._latency is None else 0.9 * self._latency + 0.1 * latency
+
+    def snapshot(self) -> dict:
+        now = time.perf_counter()
+        with self._lock:
+            recent = [t for t in self._stamps if now - t <= self.window]
+            return {
+                "count": self.count,
+                "fps": len(recent) / self.window,
+                "latency_ms": (self._latency or 0.0) * 1000
+            }
+
+
+@dataclass
+class FramePacket:
+    """One captured frame and everything the stages learn about it."""
+    frame_id: int
+    frame: np.ndarray
+    captured_at: float
+    scale: float = DETECTION_SCALE
+    locations: list = field(default_factory=list)
+    track_ids: list = field(default_factory=list)
+    encoded: list = field(default_factory=list)
+    encodings: np.ndarray | None = None
+    labels: list = field(default_factory=list)
+    distances: list = field(default_factory=list)
+
+
+class AttendanceWriter:
+    """
+    Marks attendance for recognised users at most once per user per day
+    (tracked in the shared PresenceCache), handing writes to a batched
+    AttendanceSink so database round trips never block a frame.
+    """
+
+    def __init__(self, sink: AttendanceSink | None = None, presence: PresenceCache | None = None):
+        self.sink = sink or AttendanceSink()
+        self.presence = presence or PresenceCache()
+        self.stats = StageStats()
+        self.marked_count = 0
+        self.dropped = 0
+
+    def start(self):
+        self.sink.start()
+
+    def submit(self, user_id: str) -> bool:
+        """
+        Queue a sighting without blocking; the user is seen again on later frames if full.
+
+        Returns:
+            True if a write was queued, False if the user was already marked
+            today or the sink is full
+        """
+        # Repeat sightings (from any recognizer on this machine) stop here
+        if not self.presence.claim(user_id):
+            return False
+        try:
+            future = self.sink.submit(user_id, block=False)
+        except queue.Full:
+            self.presence.discard(user_id)
+            self.dropped += 1
+            return False
+        submitted = time.perf_counter()
+        future.add_done_callback(lambda f: self._on_written(user_id, f, submitted))
+        return True
+
+    def _on_written(self, user_id: str, future, submitted: float):
+        self.stats.record(time.perf_counter() - submitted)
+        created = future.result()
+        if created:
+            self.marked_count += 1
+            print(f"  ✓ {user_id} - Attendance marked")
+        elif created is None:
+            print(f"  ⚠ {user_id} - Database unavailable, attendance spooled for retry")
+
+    def stop(self):
+        """Stop after writing everything already queued."""
+        self.sink.close()
+
+
+def scale_locations(locations, scale: float):
+    """Map (top, right, bottom, left) boxes from a resized image back to full size."""
+    return [tuple(int(v / scale) for v in box) for box in locations]
+
+
+def detect_faces(frame: np.ndarray, scale: float = DETECTION_SCALE, detector: str = FACE_DETECTOR):
+    """
+    Detect faces in a BGR frame without encoding them.
+
+    Args:
+        frame: BGR frame
+        scale: Downscale factor applied before detection
+        detector: Detector backend name (see `detectors.DETECTORS`)
+
+    Returns:
+        Tuple of (small, small_locations): the downscaled BGR image and the
+        face boxes found in it, ready for `encode_faces`
+    """
+    small = cv2.resize(frame, (0, 0), fx=scale, fy=scale) if scale != 1 else frame
+    return small, get_detector(detector).detect(small)
+
+
+def encode_faces(image: np.ndarray, locations) -> np.ndarray:
+    """float32 (n, 128) encodings of the given boxes in a BGR image."""
+    return get_batch_encoder().encode([(image, locations)])
+
+
+def detect_and_encode(frame: np.ndarray, scale: float = DETECTION_SCALE, detector: str = FACE_DETECTOR):
+    """
+    Detect and encode every face in a BGR frame.
+
+    Returns:
+        Tuple of (locations, encodings) with locations as
+        (top, right, bottom, left) at the frame's original scale
+    """
+    small, locations = detect_faces(frame, scale, detector)
+    return scale_locations(locations, scale), encode_faces(small, locations)
+
+
+class RecognitionPipeline:
+    """
+    Runs capture, detection/encoding, matching and attendance writes on
+    separate threads for one video source.
+
+    Args:
+        source: cv2.VideoCapture source (device index, URL or file path)
+        get_index: Callable returning the current face index
+        workers: Detection/encoding worker threads
+        tolerance: Maximum match distance
+        scale: Starting downscale factor applied before detection
+        tracker: FaceTracker deciding which faces need encoding
+        scheduler: FrameScheduler deciding which frames to detect, and at what scale
+        detector: Detector backend name (see `detectors.DETECTORS`)
+    """
+
+    def __init__(self, source, get_index, workers: int = PIPELINE_WORKERS,
+                 tolerance: float = FACE_MATCH_TOLERANCE, scale: float = DETECTION_SCALE,
+                 tracker: FaceTracker | None = None, scheduler: FrameScheduler | None = None,
+                 detector: str = FACE_DETECTOR):
+        self.source = source
+        self.get_index = get_index
+        self.workers = workers
+        self.tolerance = tolerance
+        self.detector = detector
+        self.tracker = tracker or FaceTracker()
+        self.scheduler = scheduler or FrameScheduler(scale)
+
+        self.frames = LatestQueue(maxsize=1)
+        self.detections = queue.Queue(maxsize=workers * 4)
+        self.attendance = AttendanceWriter()
+
+        self.stats = {name: StageStats() for name in ("capture", "detect", "encode", "match", "end_to_end")}
+        self.latest_frame = None
+        self.latest_result = None
+        self.detected_count = 0
+        self.matched_count = 0
+        self.errors = {"detect": 0, "match": 0}
+
+        self._stop = threading.Event()
+        self._threads = []
+        self._cap = None
+        self._busy = 0
+        self._busy_lock = threading.Lock()
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def start(self):
+        """Open the source and start every stage; returns False if it cannot be opened."""
+        get_detector(self.detector)  # fail fast on a missing model file
+        self._cap = cv2.VideoCapture(self.source)
+        if not self._cap.isOpened():
+            return False
+
+        self.attendance.start()
+        targets = [self._capture_loop] + [self._detect_loop] * self.workers + [self._match_loop]
+        for i, target in enumerate(targets):
+            thread = threading.Thread(target=target, name=f"pipeline-{target.__name__}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return True
+
+    def stop(self):
+        """Stop all stages, letting queued attendance writes finish."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self.attendance.stop()
+        if self._cap is not None:
+            self._cap.release()
+
+    @property
+    def marked_count(self) -> int:
+        return self.attendance.marked_count
+
+    @property
+    def running(self) -> bool:
+        return not self._stop.is_set()
+
+    # -- stages ------------------------------------------------------------
+
+    def _capture_loop(self):
+        # Recorded files are played back at their own frame rate, like a camera
+        is_file = isinstance(self.source, str) and os.path.isfile(self.source)
+        interval = 1.0 / (self._cap.get(cv2.CAP_PROP_FPS) or 30) if is_file else 0
+        frame_id = 0
+        next_at = time.perf_counter()
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            ret, frame = self._cap.read()
+            if not ret:
+                self._drain_and_stop()
+                break
+            now = time.perf_counter()
+            frame_id += 1
+            packet = FramePacket(frame_id, frame, now)
+            self.latest_frame = packet
+            if self.scheduler.should_process(frame):
+                packet.scale = self.scheduler.scale
+                self.frames.put(packet)
+            self.stats["capture"].record(now - start)
+            if interval:
+                next_at += interval
+                time.sleep(max(0.0, next_at - time.perf_counter()))
+
+    def _drain_and_stop(self):
+        """End of stream: let frames already captured finish, then stop."""
+        idle_checks = 0
+        while not self._stop.is_set() and idle_checks < 2:
+            with self._busy_lock:
+                idle = self._busy == 0
+            # Require two idle checks in a row to cover a hand-off in flight
+            idle_checks = idle_checks + 1 if idle and self.frames.empty() and self.detections.empty() else 0
+            time.sleep(0.01)
+        self._stop.set()
+
+    def _detect_loop(self):
+        while not self._stop.is_set():
+            try:
+                packet = self.frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            with self._busy_lock:
+                self._busy += 1
+            try:
+                self._detect(packet)
+                self._put(self.detections, packet)
+            except Exception as e:
+                # One bad frame must not end the worker: skip it and keep going
+                self._record_error("detect", packet, e)
+            finally:
+                with self._busy_lock:
+                    self._busy -= 1
+
+    def _detect(self, packet: FramePacket):
+        start = time.perf_counter()
+        small, small_locations = detect_faces(packet.frame, packet.scale, self.detector)
+        latency = time.perf_counter() - start
+        self.stats["detect"].record(latency)
+        self.scheduler.record_detection(latency, len(small_locations), packet.scale)
+
+        # Known tracks keep their cached identity; only the rest are encoded
+        packet.locations = scale_locations(small_locations, packet.scale)
+        packet.track_ids, packet.encoded = self.tracker.update(packet.frame_id, packet.locations)
+        if packet.encoded:
+            start = time.perf_counter()
+            try:
+                packet.encodings = encode_faces(small, [small_locations[i] for i in packet.encoded])
+            except BaseException:
+                self.tracker.release([packet.track_ids[i] for i in packet.encoded])
+                raise
+            self.stats["encode"].record(time.perf_counter() - start)
+
+    def _match_loop(self):
+        while not self._stop.is_set():
+            try:
+                packet = self.detections.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            with self._busy_lock:
+                self._busy += 1
+            try:
+                self._match(packet)
+            except Exception as e:
+                # The only matcher: if it died, attendance would silently stop being marked
+                self._record_error("match", packet, e)
+            finally:
+                with self._busy_lock:
+                    self._busy -= 1
+
+    def _match(self, packet: FramePacket):
+        start = time.perf_counter()
+        verified = []
+        if packet.encoded:
+            try:
+                results = self.get_index().match(packet.encodings, self.tolerance)
+                for i, (user_id, distance) in zip(packet.encoded, results):
+                    self.tracker.verify(packet.track_ids[i], user_id, distance)
+                    if user_id is not None:
+                        verified.append(user_id)
+            except BaseException:
+                # Let the tracks be encoded again right away instead of waiting out the pending timeout
+                self.tracker.release([packet.track_ids[i] for i in packet.encoded])
+                raise
+        identities = [self.tracker.identity(track_id) for track_id in packet.track_ids]
+        packet.labels = [user_id for user_id, _ in identities]
+        packet.distances = [distance for _, distance in identities]
+        self.stats["match"].record(time.perf_counter() - start)
+        if packet.locations:
+            self.detected_count += 1
+        self.matched_count += len(verified)
+
+        # Workers finish out of order; never replace a newer result with an older one
+        if self.latest_result is None or packet.frame_id > self.latest_result.frame_id:
+            self.latest_result = packet
+        self.stats["end_to_end"].record(time.perf_counter() - packet.captured_at)
+
+        for user_id in verified:
+            self.attendance.submit(user_id)
+
+    def _record_error(self, stage: str, packet: FramePacket, error: Exception):
+        self.errors[stage] += 1
+        print(f"  ⚠ {stage} failed on frame {packet.frame_id}: {error!r}")
+
+    def _put(self, target: queue.Queue, item):
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    # -- reporting ---------------------------------------------------------
+
+    def snapshot_stats(self) -> dict:
+        """Per-stage fps/latency, frames dropped before detection, errors, tracker and scheduler state."""
+        stats = {name: stage.snapshot() for name, stage in self.stats.items()}
+        stats["attendance"] = self.attendance.stats.snapshot()
+        stats["dropped_frames"] = self.frames.dropped
+        stats["errors"] = dict(self.errors)
+        stats["tracker"] = self.tracker.stats()
+        stats["scheduler"] = self.scheduler.stats()
+        return stats
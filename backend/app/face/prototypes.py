@@ -0,0 +1,92 @@
+"""
+Compact per-user face representation built from several samples.
+
+Instead of storing every enrolment sample, a user is stored as the
+centroid of their inlier samples plus a few prototypes picked by
+farthest-point sampling, so each user costs at most
+`1 + FACE_PROTOTYPES` gallery rows however many samples were taken.
+Samples far from the rest (another person in frame, motion blur, bad
+detection) are rejected first.
+"""
+import os
+from typing import NamedTuple
+import numpy as np
+from app.face.gallery import ENCODING_DIM
+
+FACE_PROTOTYPES = int(os.getenv("FACE_PROTOTYPES", 4))
+# A prototype must add at least this much spread to be worth storing
+PROTOTYPE_MIN_SPREAD = float(os.getenv("PROTOTYPE_MIN_SPREAD", 0.15))
+# Samples farther than this from the robust centre are always outliers
+OUTLIER_MAX_DISTANCE = float(os.getenv("OUTLIER_MAX_DISTANCE", 0.5))
+
+
+class FaceSummary(NamedTuple):
+    """Stored rows (centroid first, then prototypes) and what was rejected."""
+    encodings: np.ndarray
+    samples: int
+    rejected: int
+
+
+def reject_outliers(samples: np.ndarray, max_distance: float = OUTLIER_MAX_DISTANCE) -> np.ndarray:
+    """
+    Boolean mask of inlier samples.
+
+    A sample is an outlier when it is farther from the medoid than
+    `max_distance`, or than median + 3 * MAD of all medoid distances.
+    """
+    if len(samples) < 3:
+        return np.ones(len(samples), dtype=bool)
+    pairwise = np.linalg.norm(samples[:, None, :] - samples[None, :, :], axis=2)
+    medoid = samples[np.argmin(pairwise.sum(axis=1))]
+    distances = np.linalg.norm(samples - medoid, axis=1)
+    median = np.median(distances)
+    mad = np.median(np.abs(distances - median))
+    return distances <= min(max_distance, median + 3 * mad + 1e-6)
+
+
+def farthest_point_prototypes(samples: np.ndarray, seed: np.ndarray, count: int,
+                              min_spread: float = PROTOTYPE_MIN_SPREAD) -> np.ndarray:
+    """
+    Pick up to `count` diverse samples by farthest-point sampling from `seed`.
+
+    Stops early once the farthest remaining sample is within `min_spread`
+    of something already chosen.
+    """
+    nearest = np.linalg.norm(samples - seed, axis=1)
+    chosen = []
+    while len(chosen) < count:
+        best = int(np.argmax(nearest))
+        if nearest[best] < min_spread:
+            break
+        chosen.append(best)
+        nearest = np.minimum(nearest, np.linalg.norm(samples - samples[best], axis=1))
+    return samples[chosen]
+
+
+def summarize_samples(samples, prototypes: int = FACE_PROTOTYPES) -> FaceSummary:
+    """
+    Reduce one user's enrolment samples to a centroid plus prototypes.
+
+    Args:
+        samples: Encodings of the same person, shape (n, 128)
+        prototypes: Maximum prototypes stored next to the centroid
+
+    Returns:
+        FaceSummary with float32 encodings of shape (1 + k, 128), k <= prototypes
+
+    Raises:
+        ValueError: If most samples disagree (they may show different people)
+    """
+    samples = np.asarray(samples, dtype=np.float32).reshape(-1, ENCODING_DIM)
+    if len(samples) == 0:
+        raise ValueError("No face samples to enrol")
+
+    inliers = reject_outliers(samples)
+    if inliers.sum() * 2 < len(samples):
+        raise ValueError("Face samples are inconsistent. Please make sure every image shows the same person")
+    kept = samples[inliers]
+
+    centroid = kept.mean(axis=0)
+    chosen = farthest_point_prototypes(kept, centroid, prototypes)
+    encodings = np.vstack([centroid[None, :], chosen]).astype(np.float32)
+    return FaceSummary(encodings, len(samples), int(len(samples) - inliers.sum()))
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+"""
+Headless multi-camera recognition server.
+
+Runs N video sources (device indices, RTSP URLs or video files) from one
+process, sharing a single face gallery, one detection/encoding process
+pool and one attendance writer. Detection capacity is handed out
+round-robin so a busy entrance cannot starve the others.
+
+Usage (from backend/):
+    python -m app.face.recognition_server 0 rtsp://cam-2/stream
+    python -m app.face.recognition_server tests/entrance.mp4 --workers 4
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+from app.face.ann_index import FACE_INDEX
+from app.face.detectors import DETECTORS, FACE_DETECTOR
+from app.face.face_service import GALLERY_SNAPSHOT_PATH, SharedFaceIndex
+from app.face.gallery_refresh import GalleryRefresher
+from app.face.pipeline import (
+    DETECTION_SCALE, FACE_MATCH_TOLERANCE, AttendanceWriter, FramePacket,
+    LatestQueue, StageStats, detect_and_encode, scale_locations
+)
+
+SERVER_WORKERS = int(os.getenv("RECOGNITION_SERVER_WORKERS", os.cpu_count() or 2))
+
+
+def parse_source(value: str):
+    """Device indices are given as integers; anything else is a URL or path."""
+    return int(value) if value.isdigit() else value
+
+
+class StreamState:
+    """Capture thread and counters for one video source."""
+
+    def __init__(self, name: str, source):
+        self.name = name
+        self.source = source
+        self.cap = None
+        self.frames = LatestQueue(maxsize=1)
+        self.stats = {name: StageStats() for name in ("capture", "detect", "end_to_end")}
+        self.matched_count = 0
+        self.match_errors = 0
+        self.in_flight = 0
+        self.finished = threading.Event()
+        self.thread = None
+
+    @property
+    def is_file(self) -> bool:
+        return isinstance(self.source, str) and os.path.isfile(self.source)
+
+    def snapshot_stats(self) -> dict:
+        stats = {name: stage.snapshot() for name, stage in self.stats.items()}
+        stats["dropped_frames"] = self.frames.dropped
+        stats["matched"] = self.matched_count
+        stats["match_errors"] = self.match_errors
+        return stats
+
+
+class RecognitionServer:
+    """
+    Shares one gallery and one worker pool across several video streams.
+
+    Args:
+        sources: Video sources accepted by cv2.VideoCapture
+        get_index: Callable returning the current face index
+        workers: Processes in the detection/encoding pool
+        tolerance: Maximum match distance
+        scale: Downscale factor applied before detection
+        detector: Detector backend name (see `detectors.DETECTORS`)
+    """
+
+    def __init__(self, sources, get_index, workers: int = SERVER_WORKERS,
+                 tolerance: float = FACE_MATCH_TOLERANCE, scale: float = DETECTION_SCALE,
+                 detector: str = FACE_DETECTOR):
+        self.streams = [StreamState(f"stream-{i}", source) for i, source in enumerate(sources)]
+        self.get_index = get_index
+        self.workers = workers
+        self.tolerance = tolerance
+        self.scale = scale
+        self.detector = detector
+
+        self.attendance = AttendanceWriter()
+        self.results = queue.Queue()
+        self._slots = threading.Semaphore(workers * 2)  # keep the pool fed, never flooded
+        # Guards frame hand-off and per-stream in-flight counts
+        self._frame_ready = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+        self._pool = None
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def start(self) -> int:
+        """Open every source and start all threads; returns the number of open streams."""
+        opened = []
+        for stream in self.streams:
+            stream.cap = cv2.VideoCapture(stream.source)
+            if stream.cap.isOpened():
+                opened.append(stream)
+            else:
+                print(f"✗ {stream.name}: cannot open {stream.source}")
+        self.streams = opened
+        if not opened:
+            return 0
+
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.attendance.start()
+        for stream in self.streams:
+            stream.thread = self._spawn(self._capture_loop, stream)
+        self._spawn(self._schedule_loop)
+        self._spawn(self._match_loop)
+        return len(opened)
+
+    def _spawn(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True,
+                                  name=f"server-{target.__name__}")
+        thread.start()
+        self._threads.append(thread)
+        return thread
+
+    def stop(self):
+        self._stop.set()
+        with self._frame_ready:
+            self._frame_ready.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        self.attendance.stop()
+        for stream in self.streams:
+            stream.cap.release()
+
+    @property
+    def finished(self) -> bool:
+        """True once every stream has ended (only happens for video files)."""
+        return all(stream.finished.is_set() for stream in self.streams)
+
+    # -- stages ------------------------------------------------------------
+
+    def _capture_loop(self, stream: StreamState):
+        # Recorded files are played back at their own frame rate, like a camera
+        interval = 1.0 / (stream.cap.get(cv2.CAP_PROP_FPS) or 30) if stream.is_file else 0
+        frame_id = 0
+        next_at = time.perf_counter()
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            ret, frame = stream.cap.read()
+            if not ret:
+                break
+            now = time.perf_counter()
+            frame_id += 1
+            stream.frames.put(FramePacket(frame_id, frame, now))
+            stream.stats["capture"].record(now - start)
+            with self._frame_ready:
+                self._frame_ready.notify()
+            if interval:
+                next_at += interval
+                time.sleep(max(0.0, next_at - time.perf_counter()))
+
+        # Let frames already captured finish before declaring the stream done
+        while not self._stop.is_set():
+            with self._frame_ready:
+                if stream.frames.empty() and not stream.in_flight:
+                    break
+            time.sleep(0.01)
+        stream.finished.set()
+
+    def _next_frame(self, start: int):
+        """Round-robin from `start`: (position, stream, packet) of the next waiting frame."""
+        count = len(self.streams)
+        for offset in range(count):
+            position = (start + offset) % count
+            stream = self.streams[position]
+            try:
+                return position, stream, stream.frames.get(timeout=0)
+            except queue.Empty:
+                continue
+        return None
+
+    def _schedule_loop(self):
+        position = 0
+        while not self._stop.is_set():
+            if not self._slots.acquire(timeout=0.1):
+                continue
+            with self._frame_ready:
+                found = self._next_frame(position)
+                while found is None and not self._stop.is_set():
+                    self._frame_ready.wait(timeout=0.1)
+                    found = self._next_frame(position)
+                if found is not None:
+                    found[1].in_flight += 1
+            if found is None:
+                self._slots.release()
+                break
+
+            position, stream, packet = found
+            position += 1  # the next stream gets first pick next time
+
+            # Only the downscaled frame crosses the process boundary
+            small = cv2.resize(packet.frame, (0, 0), fx=self.scale, fy=self.scale)
+            submitted = time.perf_counter()
+            future = self._pool.submit(detect_and_encode, small, 1.0, self.detector)
+            future.add_done_callback(lambda f, s=stream, p=packet, t=submitted: self._on_detected(f, s, p, t))
+
+    def _on_detected(self, future, stream: StreamState, packet: FramePacket, submitted: float):
+        self._slots.release()
+        try:
+            locations, packet.encodings = future.result()
+            packet.locations = scale_locations(locations, self.scale)
+            stream.stats["detect"].record(time.perf_counter() - submitted)
+            self.results.put((stream, packet))
+        except Exception as e:
+            if not self._stop.is_set():
+                print(f"✗ {stream.name}: detection failed: {e}")
+            with self._frame_ready:
+                stream.in_flight -= 1
+
+    def _match_loop(self):
+        while not self._stop.is_set():
+            try:
+                stream, packet = self.results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                index = self.get_index()
+                results = index.match(packet.encodings, self.tolerance) if len(packet.encodings) else []
+                packet.labels = [user_id for user_id, _ in results]
+                for user_id in packet.labels:
+                    if user_id is not None:
+                        stream.matched_count += 1
+                        self.attendance.submit(user_id)
+                stream.stats["end_to_end"].record(time.perf_counter() - packet.captured_at)
+            except Exception as e:
+                # The single matcher serves every stream: skip the frame, never stop
+                stream.match_errors += 1
+                print(f"✗ {stream.name}: matching failed: {e}")
+            finally:
+                with self._frame_ready:
+                    stream.in_flight -= 1
+
+    # -- reporting ---------------------------------------------------------
+
+    def snapshot_stats(self) -> dict:
+        """Per-stream throughput and latency, keyed by stream name."""
+        return {stream.name: stream.snapshot_stats() for stream in self.streams}
+
+    def print_stats(self):
+        print(f"{'stream':<10}{'camera fps':>12}{'processed fps':>15}{'latency ms':>12}{'dropped':>9}{'matched':>9}  source")
+        for stream in self.streams:
+            stats = stream.snapshot_stats()
+            print(f"{stream.name:<10}{stats['capture']['fps']:>12.1f}{stats['detect']['fps']:>15.1f}"
+                  f"{stats['end_to_end']['latency_ms']:>12.0f}{stats['dropped_frames']:>9}"
+                  f"{stats['matched']:>9}  {stream.source}")
+        print(f"Attendance marked: {self.attendance.marked_count}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless multi-camera recognition server")
+    parser.add_argument("sources", nargs="+", help="Device index, RTSP/HTTP URL or video file")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="Detection processes")
+    parser.add_argument("--detector", choices=list(DETECTORS), default=FACE_DETECTOR, help="Face detector backend")
+    parser.add_argument("--report-interval", type=float, default=10.0, help="Seconds between stats reports")
+    args = parser.parse_args()
+
+    shared = SharedFaceIndex(FACE_INDEX, GALLERY_SNAPSHOT_PATH)
+    shared.refresh()
+    print(f"✓ Loaded {len(shared.index)} registered face encodings")
+    refresher = GalleryRefresher(shared)
+    refresher.start()
+
+    server = RecognitionServer([parse_source(s) for s in args.sources], lambda: refresher.index,
+                               workers=args.workers, detector=args.detector)
+    if not server.start():
+        print("✗ No video source could be opened")
+        refresher.stop()
+        return
+    print(f"✓ Serving {len(server.streams)} stream(s) with {args.workers} worker process(es) - Ctrl+C to stop\n")
+
+    try:
+        next_report = time.monotonic() + args.report_interval
+        while not server.finished:
+            time.sleep(0.2)
+            if time.monotonic() >= next_report:
+                server.print_stats()
+                next_report += args.report_interval
+    except KeyboardInterrupt:
+        print("\nInterrupted by user")
+    finally:
+        server.print_stats()
+        server.stop()
+        refresher.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,18 +9,36 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 import cv2
-import face_recognition
-import numpy as np
 from datetime import datetime
-from app.attendance.attendance_manager import mark_attendance
-from app.face.face_service import get_known_faces_from_db
-
-FACE_MATCH_TOLERANCE = float(os.getenv("FACE_MATCH_TOLERANCE", 0.45))
-marked_today = {}
+from app.face.ann_index import FACE_INDEX
+from app.face.face_service import GALLERY_SNAPSHOT_PATH, SharedFaceIndex
+from app.face.gallery_refresh import GalleryRefresher
+from app.face.pipeline import RecognitionPipeline
 
 def load_known_faces():
-    """Load face encodings from MongoDB instead of local files."""
-    return get_known_faces_from_db()
+    """Load the face gallery (snapshot plus MongoDB deltas), ready for hot reload."""
+    shared = SharedFaceIndex(FACE_INDEX, GALLERY_SNAPSHOT_PATH)
+    shared.refresh()
+    return shared
+
+def draw_results(frame, result):
+    """Draw boxes and labels from a pipeline result onto a frame."""
+    for (top, right, bottom, left), user_id in zip(result.locations, result.labels):
+        label = user_id or "Unknown"
+        
+        # Draw rectangle
+        if user_id is None:
+            color = (0, 0, 255)  # Red for unknown
+        else:
+            color = (0, 255, 0)  # Green for recognized
+        
+        cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+        
+        # Draw label background
+        label_y = top - 10 if top > 30 else bottom + 25
+        cv2.rectangle(frame, (left, label_y - 25), (right, label_y), color, -1)
+        cv2.putText(frame, label, (left + 5, label_y - 5), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
 
 def main():
     print("\n" + "=" * 70)
@@ -32,21 +50,26 @@ def main():
     print("\nInitializing...")
     
     # Load known faces
-    known_encodings, known_ids = load_known_faces()
+    shared = load_known_faces()
     
-    if not known_encodings:
+    if len(shared.index) == 0:
         print("✗ No registered users found!")
         print("  Please register students in Admin Dashboard first")
         return
     
-    print(f"✓ Loaded {len(known_ids)} registered users")
+    print(f"✓ Loaded {len(shared.index)} registered face encodings")
+    
+    # Pick up faces registered from the dashboard without a restart
+    refresher = GalleryRefresher(shared)
+    refresher.start()
     
-    # Open camera
+    # Open camera and start capture / detect / match / attendance stages
     print("✓ Opening camera...")
-    cap = cv2.VideoCapture(0)
+    pipeline = RecognitionPipeline(0, lambda: refresher.index)
     
-    if not cap.isOpened():
+    if not pipeline.start():
         print("✗ Camera not accessible!")
+        refresher.stop()
         return
     
     print("✓ Camera initialized")
@@ -54,91 +77,39 @@ def main():
     print("LIVE CAMERA FEED - Press 'q' to exit")
     print("=" * 70 + "\n")
     
-    frame_count = 0
-    detected_count = 0
-    matched_count = 0
-    marked_count = 0
+    shown_frame_id = 0
     
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("✗ Failed to read frame")
-            break
+    while pipeline.running:
+        packet = pipeline.latest_frame
+        if packet is None or packet.frame_id == shown_frame_id:
+            # Nothing new from the camera yet; keep the window responsive
+            if cv2.waitKey(5) & 0xFF == ord('q'):
+                break
+            continue
         
-        frame_count += 1
-        height, width = frame.shape[:2]
+        shown_frame_id = packet.frame_id
+        frame = packet.frame.copy()
+        width = frame.shape[1]
         
-        # Process every 3rd frame for performance
-        if frame_count % 3 == 0:
-            # Resize for faster processing
-            small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-            rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-            
-            # Detect faces
-            face_locations = face_recognition.face_locations(rgb_small_frame, model="hog")
-            face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-            
-            face_labels = []
-            
-            if face_locations:
-                detected_count += 1
-                
-                # Try to match each detected face
-                for face_encoding in face_encodings:
-                    distances = face_recognition.face_distance(known_encodings, face_encoding)
-                    
-                    if len(distances) > 0:
-                        best_match_index = np.argmin(distances)
-                        best_distance = distances[best_match_index]
-                        
-                        if best_distance < FACE_MATCH_TOLERANCE:
-                            user_id = known_ids[best_match_index]
-                            matched_count += 1
-                            face_labels.append(user_id)
-                            
-                            # Try to mark attendance
-                            today = datetime.now().strftime("%Y-%m-%d")
-                            if marked_today.get(user_id) != today:
-                                if mark_attendance(user_id):
-                                    marked_today[user_id] = today
-                                    marked_count += 1
-                                    print(f"  ✓ {user_id} - Attendance marked")
-                        else:
-                            face_labels.append("Unknown")
-                    else:
-                        face_labels.append("Unknown")
-            
-            # Draw boxes and labels on original frame
-            for (top, right, bottom, left), label in zip(face_locations, face_labels):
-                # Scale coordinates back to original image
-                top = int(top * 4)
-                right = int(right * 4)
-                bottom = int(bottom * 4)
-                left = int(left * 4)
-                
-                # Draw rectangle
-                if label == "Unknown":
-                    color = (0, 0, 255)  # Red for unknown
-                else:
-                    color = (0, 255, 0)  # Green for recognized
-                
-                cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-                
-                # Draw label background
-                label_y = top - 10 if top > 30 else bottom + 25
-                cv2.rectangle(frame, (left, label_y - 25), (right, label_y), color, -1)
-                cv2.putText(frame, label, (left + 5, label_y - 5), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+        result = pipeline.latest_result
+        if result is not None:
+            draw_results(frame, result)
         
         # Add statistics overlay
-        cv2.putText(frame, f"Frames: {frame_count}", (10, 30), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        cv2.putText(frame, f"Detected: {detected_count}", (10, 70), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        cv2.putText(frame, f"Matched: {matched_count}", (10, 110), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        cv2.putText(frame, f"Marked: {marked_count}", (10, 150), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        stats = pipeline.snapshot_stats()
+        overlay = [
+            f"Camera: {stats['capture']['fps']:.1f} fps",
+            f"Recognition: {stats['match']['fps']:.1f} fps",
+            f"Latency: {stats['end_to_end']['latency_ms']:.0f} ms",
+            f"Tracks: {stats['tracker']['tracks']} (encoding {stats['encode']['fps']:.1f}/s)",
+            f"Scheduler: {stats['scheduler']['mode']} @ {stats['scheduler']['scale']:.2f}x",
+            f"Matched: {pipeline.matched_count}",
+            f"Marked: {pipeline.marked_count}",
+            f"Gallery: {len(refresher.index)} (epoch {shared.epoch})"
+        ]
+        for i, text in enumerate(overlay):
+            cv2.putText(frame, text, (10, 30 + 40 * i), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
         cv2.putText(frame, "Press 'q' to exit", (width - 300, 30), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
         
@@ -148,15 +119,6 @@ def main():
         # Handle keyboard input
         key = cv2.waitKey(1) & 0xFF
         if key == ord('q'):
-            print("\n" + "=" * 70)
-            print("Session Summary")
-            print("=" * 70)
-            print(f"Total frames: {frame_count}")
-            print(f"Faces detected: {detected_count}")
-            print(f"Faces matched: {matched_count}")
-            print(f"Attendance marked: {marked_count}")
-            print("=" * 70)
-            print("Shutting down...\n")
             break
         elif key == ord('s'):
             filename = f"screenshot_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
@@ -164,9 +126,31 @@ def main():
             print(f"✓ Screenshot saved: {filename}")
     
     # Cleanup
-    cap.release()
+    pipeline.stop()
+    refresher.stop()
     cv2.destroyAllWindows()
     print("✓ Camera closed")
+    
+    stats = pipeline.snapshot_stats()
+    gallery_stats = refresher.stats()
+    print("\n" + "=" * 70)
+    print("Session Summary")
+    print("=" * 70)
+    print(f"Total frames: {stats['capture']['count']} ({stats['dropped_frames']} skipped by detector)")
+    print(f"Frames with faces: {pipeline.detected_count}")
+    print(f"Faces matched: {pipeline.matched_count}")
+    tracker = stats["tracker"]
+    print(f"Faces encoded: {tracker['faces_encoded']} of {tracker['faces_seen']} detected "
+          f"({tracker['faces_seen'] - tracker['faces_encoded']} served from tracks)")
+    print(f"Attendance marked: {pipeline.marked_count}")
+    scheduler = stats["scheduler"]
+    print(f"Frames skipped as static: {scheduler['skipped']} "
+          f"(final detection scale {scheduler['scale']:.2f}x, {scheduler['scale_changes']} changes)")
+    for stage in ("capture", "detect", "encode", "match", "attendance", "end_to_end"):
+        print(f"  {stage:<12} {stats[stage]['fps']:6.1f} fps  {stats[stage]['latency_ms']:8.1f} ms")
+    print(f"Gallery: {gallery_stats['encodings']} encodings, epoch {gallery_stats['epoch']}, "
+          f"last reload {gallery_stats['last_reload_ms'] or 0:.1f} ms ({gallery_stats['mode']})")
+    print("=" * 70)
 
 if __name__ == "__main__":
     try:
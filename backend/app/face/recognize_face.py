@@ -1,27 +1,31 @@
 import cv2
 import face_recognition
-import numpy as np
-from datetime import datetime
 from app.attendance.attendance_manager import mark_attendance
-from app.face.face_service import get_known_faces_from_db
+from app.attendance.presence_cache import PresenceCache
+from app.face.ann_index import FACE_INDEX
+from app.face.face_service import GALLERY_SNAPSHOT_PATH, SharedFaceIndex
+from app.face.gallery_refresh import GalleryRefresher
 import os
 
 FACE_MATCH_TOLERANCE = float(
     os.getenv("FACE_MATCH_TOLERANCE", 0.45)
 ) 
 
-# Runtime cache: user_id -> date (YYYY-MM-DD)
-marked_today = {}
+# Users already marked today, shared with other recognizers on this machine
+presence = PresenceCache()
+
+# Gallery kept across calls; each load only fetches newly registered faces
+shared_index = SharedFaceIndex(FACE_INDEX, GALLERY_SNAPSHOT_PATH)
 
 
 def load_known_faces():
-    """Load face encodings from MongoDB instead of local files."""
-    return get_known_faces_from_db()
+    """Return the face gallery, catching up on faces registered since the last call."""
+    return shared_index.refresh()
 
 
 def recognize_from_camera():
     """Single recognition cycle for GUI integration - returns status dict"""
-    known_encodings, known_ids = load_known_faces()
+    gallery = load_known_faces()
 
     result = {
         "face_detected": False,
@@ -30,7 +34,7 @@ def recognize_from_camera():
         "user_id": None
     }
 
-    if not known_encodings:
+    if len(gallery) == 0:
         return result
 
     try:
@@ -44,7 +48,6 @@ def recognize_from_camera():
         if not ret or frame is None:
             return result
 
-        today = datetime.now().strftime("%Y-%m-%d")
         rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         
         # Detect faces
@@ -54,26 +57,18 @@ def recognize_from_camera():
         if face_locations:
             result["face_detected"] = True
 
-        # Process each face
-        for face_encoding in face_encodings:
-            distances = face_recognition.face_distance(known_encodings, face_encoding)
-            
-            if len(distances) > 0:
-                best_match_index = np.argmin(distances)
-                best_distance = distances[best_match_index]
-
-                # Check if match is good enough
-                if best_distance < FACE_MATCH_TOLERANCE:
-                    user_id = known_ids[best_match_index]
-                    result["match_found"] = True
-                    result["user_id"] = user_id
-
-                    # Mark attendance if not already marked today
-                    if marked_today.get(user_id) != today:
-                        if mark_attendance(user_id):
-                            marked_today[user_id] = today
-                            result["attendance_marked"] = True
-                            print(f"✅ Attendance marked for {user_id}")
+        # Match every face in one gallery query
+        for user_id, _ in gallery.match(face_encodings, FACE_MATCH_TOLERANCE):
+            if user_id is not None:
+                result["match_found"] = True
+                result["user_id"] = user_id
+
+                # Mark attendance if not already marked today
+                if not presence.is_present(user_id):
+                    if mark_attendance(user_id):
+                        result["attendance_marked"] = True
+                        print(f"✅ Attendance marked for {user_id}")
+                    presence.claim(user_id)
         
         return result
 
@@ -83,12 +78,13 @@ def recognize_from_camera():
 
 
 def recognize():
-    known_encodings, known_ids = load_known_faces()
-
-    if not known_encodings:
+    if len(load_known_faces()) == 0:
         print("❌ No registered users found")
         return
 
+    refresher = GalleryRefresher(shared_index)
+    refresher.start()
+
     cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
     print("✅ Recognition started. Press 'q' to quit.")
 
@@ -97,30 +93,25 @@ def recognize():
         if not ret:
             continue
 
-        today = datetime.now().strftime("%Y-%m-%d")
+        gallery = refresher.index
 
         rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         face_locations = face_recognition.face_locations(rgb)
         face_encodings = face_recognition.face_encodings(rgb, face_locations)
 
-        for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-            matches = face_recognition.compare_faces(
-                known_encodings,
-                face_encoding,
-                tolerance=FACE_MATCH_TOLERANCE
-            )
+        matches = gallery.match(face_encodings, FACE_MATCH_TOLERANCE)
 
+        for (top, right, bottom, left), (user_id, _) in zip(face_locations, matches):
             name = "Unknown"
 
-            if True in matches:
-                match_index = matches.index(True)
-                name = known_ids[match_index]
+            if user_id is not None:
+                name = user_id
 
-                # ✅ Day-aware runtime guard
-                if marked_today.get(name) != today:
+                # ✅ Day-aware guard shared across recognizers
+                if not presence.is_present(name):
                     if mark_attendance(name):
-                        marked_today[name] = today
                         print(f"✅ Attendance marked for {name}")
+                    presence.claim(name)
 
             cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
             cv2.putText(
@@ -138,6 +129,7 @@ def recognize():
         if cv2.waitKey(1) & 0xFF == ord("q"):
             break
 
+    refresher.stop()
     cap.release()
     cv2.destroyAllWindows()
 
@@ -1,45 +1,16 @@
 import cv2
 import face_recognition
-import os
-import pickle
-import numpy as np
+from datetime import datetime
 from app.db.mongo import users_collection
-
-DATA_DIR = "app/face/data"
-os.makedirs(DATA_DIR, exist_ok=True)
-
-def is_duplicate_face(new_encoding, current_uid):
-    """
-    Checks if the given face encoding already exists
-    under a different user_id.
-    """
-    for file in os.listdir(DATA_DIR):
-        if not file.endswith(".pkl"):
-            continue
-
-        existing_uid = file.replace(".pkl", "")
-
-        # Skip same user (re-registration allowed)
-        if existing_uid == current_uid:
-            continue
-
-        with open(os.path.join(DATA_DIR, file), "rb") as f:
-            existing_encodings = pickle.load(f)
-
-        matches = face_recognition.compare_faces(
-            existing_encodings,
-            new_encoding,
-            tolerance=0.45  # strict tolerance
-        )
-
-        if True in matches:
-            return existing_uid  # duplicate found
-
-    return None
+from app.face.batch_encoder import get_batch_encoder
+from app.face.encoding_store import pack_encodings
+from app.face.face_service import add_to_face_index, find_duplicate_face
+from app.face.prototypes import summarize_samples
 
 def register_user(user_id, samples=10):
     cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
     encodings = []
+    encoder = get_batch_encoder()
 
     print(f"Registering user: {user_id}")
     print("Look at the camera...")
@@ -54,14 +25,7 @@ def register_user(user_id, samples=10):
         face_locations = face_recognition.face_locations(rgb)
 
         if len(face_locations) == 1:
-            encoding = face_recognition.face_encodings(rgb, face_locations)[0]
-            duplicate_uid = is_duplicate_face(encoding, user_id)
-            if duplicate_uid:
-                print("❌ Duplicate face detected!")
-                print(f"➡️ This face already belongs to user: {duplicate_uid}")
-                print("➡️ Registration blocked to prevent impersonation.")
-                exit(1)
-            encodings.append(encoding)
+            encodings.append(encoder.encode([(frame, face_locations)])[0])
             count += 1
             print(f"Captured sample {count}/{samples}")
 
@@ -80,10 +44,32 @@ def register_user(user_id, samples=10):
     cap.release()
     cv2.destroyAllWindows()
 
-    with open(f"{DATA_DIR}/{user_id}.pkl", "wb") as f:
-        pickle.dump(encodings, f)
+    if not encodings:
+        print("❌ No face samples captured")
+        exit(1)
+
+    # Store a centroid plus a few diverse prototypes instead of every raw sample
+    try:
+        summary = summarize_samples(encodings)
+    except ValueError as e:
+        print(f"❌ {e}")
+        exit(1)
+
+    duplicate_uid = find_duplicate_face(summary.encodings, user_id)
+    if duplicate_uid:
+        print("❌ Duplicate face detected!")
+        print(f"➡️ This face already belongs to user: {duplicate_uid}")
+        print("➡️ Registration blocked to prevent impersonation.")
+        exit(1)
+
+    users_collection.update_one(
+        {"user_id": user_id},
+        {"$set": {**pack_encodings(summary.encodings), "face_registered_at": datetime.utcnow()}}
+    )
+    add_to_face_index(user_id, summary.encodings)
 
-    print("✅ Registration complete")
+    print(f"✅ Registration complete: {summary.samples} samples "
+          f"({summary.rejected} rejected) stored as {len(summary.encodings)} encodings")
 
 if __name__ == "__main__":
     uid = input("Enter User ID / Roll No: ").strip()
@@ -0,0 +1,221 @@
+"""
+Face registration jobs, run off the API event loop.
+
+Decoding, detection and encoding run in a bounded process pool; the
+duplicate check and MongoDB write run on a thread. At most
+`REGISTRATION_WORKERS` jobs are processed at once and at most
+`REGISTRATION_MAX_PENDING` may be queued or running; each job's face
+processing is limited to `REGISTRATION_TIMEOUT` seconds. A worker process
+cannot be interrupted, so a timed-out job is reported as failed at once
+but keeps its slot (and blocks a new job for the same user) until its
+worker actually finishes. Jobs are kept
+in memory for `REGISTRATION_JOB_RETENTION` seconds after they finish so
+clients can poll their status.
+"""
+import asyncio
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from app.db.mongo import users_collection
+from app.face.encoding_store import pack_encodings
+from app.face.face_service import add_to_face_index, encode_face_samples, find_duplicate_face
+from app.face.prototypes import FaceSummary
+from app.services.user_cache import user_cache
+
+REGISTRATION_WORKERS = int(os.getenv("REGISTRATION_WORKERS", 2))
+REGISTRATION_MAX_PENDING = int(os.getenv("REGISTRATION_MAX_PENDING", 32))
+REGISTRATION_TIMEOUT = float(os.getenv("REGISTRATION_TIMEOUT", 30))
+REGISTRATION_JOB_RETENTION = float(os.getenv("REGISTRATION_JOB_RETENTION", 3600))
+
+
+class RegistrationQueueFull(Exception):
+    """Too many registrations are queued or running."""
+
+
+class RegistrationInProgress(Exception):
+    """The user already has a registration job queued or running."""
+
+
+class RegistrationJob:
+    """State of one face registration, as reported to polling clients."""
+
+    def __init__(self, user_id: str):
+        self.job_id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.error_status = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._done = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait up to `timeout` seconds; True if the job has finished."""
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.finished
+
+    def _finish(self, status: str, result=None, error: str | None = None, error_status: int | None = None):
+        self.status = status
+        self.result = result
+        self.error = error
+        self.error_status = error_status
+        self.finished_at = time.time()
+        self._done.set()
+
+    def to_dict(self) -> dict:
+        job = {
+            "job_id": self.job_id,
+            "user_id": self.user_id,
+            "status": self.status,
+            "status_url": f"/users/register-face/jobs/{self.job_id}"
+        }
+        if self.result is not None:
+            job["result"] = self.result
+        if self.error is not None:
+            job["error"] = self.error
+        return job
+
+
+def store_face_registration(user_id: str, summary: FaceSummary) -> dict:
+    """
+    Duplicate-check and store a freshly computed face summary (blocking I/O).
+
+    Raises:
+        ValueError: If the face already belongs to another user
+    """
+    encodings = summary.encodings
+    duplicate_uid = find_duplicate_face(encodings, user_id)
+    if duplicate_uid:
+        raise ValueError(f"This face already belongs to user: {duplicate_uid}. Registration blocked to prevent impersonation.")
+
+    users_collection.update_one(
+        {"user_id": user_id},
+        {"$set": {
+            **pack_encodings(encodings),
+            "face_registered_at": datetime.utcnow()
+        }}
+    )
+    user_cache.invalidate(user_id)
+    add_to_face_index(user_id, encodings)
+
+    return {
+        "message": "Face registered successfully",
+        "user_id": user_id,
+        "encodings_count": len(encodings),
+        "samples": summary.samples,
+        "rejected_samples": summary.rejected
+    }
+
+
+class RegistrationJobs:
+    """
+    Bounded queue of registration jobs. Use from the event loop only.
+
+    Args:
+        workers: Worker processes, also the number of jobs processed at once
+        max_pending: Jobs allowed to be queued or running
+        timeout: Seconds allowed for one job's face processing
+        retention: Seconds finished jobs stay available for polling
+    """
+
+    def __init__(self, workers: int = REGISTRATION_WORKERS, max_pending: int = REGISTRATION_MAX_PENDING,
+                 timeout: float = REGISTRATION_TIMEOUT, retention: float = REGISTRATION_JOB_RETENTION):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.retention = retention
+
+        self.jobs = {}
+        self.overrunning = 0
+        self._active = {}
+        self._slots = asyncio.Semaphore(workers)
+        self._pool = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for job_id in [j for j, job in self.jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self.jobs[job_id]
+
+    def submit(self, user_id: str, samples) -> RegistrationJob:
+        """
+        Queue a registration.
+
+        Args:
+            user_id: User to register
+            samples: Raw image and/or short video clip bytes of the user
+
+        Raises:
+            RegistrationQueueFull: If `max_pending` jobs are already queued or running
+            RegistrationInProgress: If this user already has an unfinished job
+        """
+        self._prune()
+        if user_id in self._active:
+            raise RegistrationInProgress(self._active[user_id].job_id)
+        if len(self._active) >= self.max_pending:
+            raise RegistrationQueueFull()
+
+        job = RegistrationJob(user_id)
+        self.jobs[job.job_id] = job
+        self._active[user_id] = job
+        asyncio.get_running_loop().create_task(self._run(job, list(samples)))
+        return job
+
+    async def _run(self, job: RegistrationJob, samples: list):
+        loop = asyncio.get_running_loop()
+        try:
+            async with self._slots:
+                job.status = "running"
+                future = loop.run_in_executor(self._executor(), encode_face_samples, samples)
+                done, _ = await asyncio.wait({future}, timeout=self.timeout)
+                if not done:
+                    job._finish("failed", error="Face processing timed out", error_status=504)
+                    await self._wait_overrun(future)
+                    return
+                summary = future.result()
+                result = await asyncio.to_thread(store_face_registration, job.user_id, summary)
+            job._finish("done", result=result)
+        except ValueError as e:
+            job._finish("failed", error=str(e), error_status=400)
+        except Exception as e:
+            job._finish("failed", error=f"Error processing face: {str(e)}", error_status=500)
+        finally:
+            self._active.pop(job.user_id, None)
+
+    async def _wait_overrun(self, future):
+        """Hold the caller's slot until a timed-out worker finishes; its result is discarded."""
+        self.overrunning += 1
+        try:
+            await asyncio.gather(future, return_exceptions=True)
+        finally:
+            self.overrunning -= 1
+
+    def get(self, job_id: str) -> RegistrationJob | None:
+        return self.jobs.get(job_id)
+
+    def stats(self) -> dict:
+        running = sum(1 for job in self._active.values() if job.status == "running")
+        queued = sum(1 for job in self._active.values() if job.status == "queued")
+        return {"running": running, "queued": queued, "overrunning": self.overrunning, "retained": len(self.jobs)}
+
+
+registration_jobs = RegistrationJobs()
@@ -0,0 +1,140 @@
+"""
+Adaptive frame scheduling for the camera pipeline.
+
+Decides, per captured frame, whether it is worth running detection on
+and at what resolution:
+
+- a cheap frame difference on a tiny grayscale thumbnail skips frames
+  while the scene is empty and static (one frame every
+  `SCHEDULER_IDLE_INTERVAL` seconds is still checked);
+- every frame is offered to the detectors while there is motion or
+  faces are in view;
+- the detection scale steps along a fixed ladder so the measured
+  detection latency stays within `DETECTION_LATENCY_BUDGET_MS`.
+"""
+import os
+import threading
+import time
+import cv2
+import numpy as np
+
+SCHEDULER_MOTION_THRESHOLD = float(os.getenv("SCHEDULER_MOTION_THRESHOLD", 4.0))
+SCHEDULER_IDLE_INTERVAL = float(os.getenv("SCHEDULER_IDLE_INTERVAL", 0.5))
+DETECTION_LATENCY_BUDGET_MS = float(os.getenv("DETECTION_LATENCY_BUDGET_MS", 60))
+
+# Detection resolutions to choose from, as a fraction of the frame size
+SCALE_LADDER = (0.2, 0.25, 0.33, 0.5, 0.75, 1.0)
+
+# Detections needed at a scale before its latency is trusted
+_SETTLE_SAMPLES = 5
+_THUMBNAIL_SIZE = (64, 48)
+
+
+class FrameScheduler:
+    """
+    Skips static frames and picks the detection scale for a latency budget.
+
+    The capture thread calls `should_process()` for every frame; detection
+    workers report back through `record_detection()`.
+
+    Args:
+        scale: Starting detection scale (snapped to the nearest ladder step)
+        latency_budget_ms: Target detection latency per frame
+        motion_threshold: Mean absolute thumbnail difference (0-255) that counts as motion
+        idle_interval: Seconds between checks while the scene is empty and static
+    """
+
+    def __init__(self, scale: float = 0.25, latency_budget_ms: float = DETECTION_LATENCY_BUDGET_MS,
+                 motion_threshold: float = SCHEDULER_MOTION_THRESHOLD,
+                 idle_interval: float = SCHEDULER_IDLE_INTERVAL):
+        self.latency_budget = latency_budget_ms / 1000.0
+        self.motion_threshold = motion_threshold
+        self.idle_interval = idle_interval
+
+        self.mode = "idle"
+        self.motion = 0.0
+        self.decisions = {"motion": 0, "faces": 0, "idle_check": 0, "skipped": 0}
+        self.scale_changes = 0
+
+        self._level = min(range(len(SCALE_LADDER)), key=lambda i: abs(SCALE_LADDER[i] - scale))
+        self._latency = None
+        self._samples = 0
+        self._faces_in_view = False
+        self._previous = None
+        self._last_processed = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def scale(self) -> float:
+        return SCALE_LADDER[self._level]
+
+    def _motion_score(self, frame: np.ndarray) -> float:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        thumbnail = cv2.resize(gray, _THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+        previous, self._previous = self._previous, thumbnail
+        if previous is None:
+            return float("inf")
+        return float(cv2.absdiff(thumbnail, previous).mean())
+
+    def should_process(self, frame: np.ndarray, now: float | None = None) -> bool:
+        """True if the frame should go to the detectors."""
+        now = time.monotonic() if now is None else now
+        self.motion = self._motion_score(frame)
+
+        with self._lock:
+            faces_in_view = self._faces_in_view
+        if faces_in_view:
+            self.mode = "faces"
+        elif self.motion >= self.motion_threshold:
+            self.mode = "motion"
+        elif now - self._last_processed >= self.idle_interval:
+            self.mode = "idle_check"
+        else:
+            self.mode = "idle"
+            self.decisions["skipped"] += 1
+            return False
+
+        self.decisions[self.mode] += 1
+        self._last_processed = now
+        return True
+
+    def record_detection(self, latency: float, faces: int, scale: float):
+        """
+        Feed back one detection result.
+
+        Args:
+            latency: Seconds the detection took
+            faces: Faces found in the frame
+            scale: Scale the frame was detected at
+        """
+        with self._lock:
+            self._faces_in_view = faces > 0
+            if scale != self.scale:
+                return  # measured before the last scale change
+            self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+            self._samples += 1
+            if self._samples < _SETTLE_SAMPLES:
+                return
+
+            # One ladder step up roughly doubles the pixels; leave headroom so it cannot bounce back
+            if self._latency > self.latency_budget and self._level > 0:
+                self._set_level(self._level - 1)
+            elif self._latency * 2.5 < self.latency_budget and self._level < len(SCALE_LADDER) - 1:
+                self._set_level(self._level + 1)
+
+    def _set_level(self, level: int):
+        self._level = level
+        self._latency = None
+        self._samples = 0
+        self.scale_changes += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "scale": self.scale,
+                "motion_level": self.motion,
+                "detect_latency_ms": (self._latency or 0.0) * 1000,
+                "scale_changes": self.scale_changes,
+                **self.decisions
+            }
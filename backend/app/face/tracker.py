@@ -0,0 +1,223 @@
+"""
+Lightweight face tracker for the camera pipeline.
+
+Detections are associated with tracks frame to frame by box overlap
+(IoU), falling back to centroid distance for fast movement. Each track
+caches the identity it was last verified as, so the expensive dlib
+encoder only runs when a track is new, its confidence has decayed, or
+its re-verification interval has expired - a person standing at the
+kiosk is encoded every few seconds instead of every frame.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+TRACK_IOU_THRESHOLD = float(os.getenv("TRACK_IOU_THRESHOLD", 0.3))
+TRACK_MAX_MISSED = int(os.getenv("TRACK_MAX_MISSED", 10))
+TRACK_REVERIFY_INTERVAL = float(os.getenv("TRACK_REVERIFY_INTERVAL", 2.0))
+TRACK_MIN_CONFIDENCE = float(os.getenv("TRACK_MIN_CONFIDENCE", 0.5))
+# Seconds an encoding may be in flight before the track is scheduled again
+TRACK_PENDING_TIMEOUT = float(os.getenv("TRACK_PENDING_TIMEOUT", 2.0))
+
+# IoU at or above which an association is treated as certain
+STRONG_IOU = 0.5
+
+
+def box_iou(a, b) -> float:
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return inter / float(area_a + area_b - inter)
+
+
+def _centroid_distance(a, b) -> float:
+    """Centroid distance between two boxes, relative to the size of `a`."""
+    ay, ax = (a[0] + a[2]) / 2, (a[1] + a[3]) / 2
+    by, bx = (b[0] + b[2]) / 2, (b[1] + b[3]) / 2
+    size = max(a[2] - a[0], a[1] - a[3], 1)
+    return ((ay - by) ** 2 + (ax - bx) ** 2) ** 0.5 / size
+
+
+@dataclass
+class Track:
+    """One face followed across frames, with its cached identity."""
+    track_id: int
+    box: tuple
+    user_id: str | None = None
+    distance: float | None = None
+    confidence: float = 0.0
+    verified_at: float | None = None
+    missed: int = 0
+    pending_since: float | None = None
+
+    def needs_encoding(self, now: float, reverify_interval: float, min_confidence: float,
+                       pending_timeout: float = TRACK_PENDING_TIMEOUT) -> bool:
+        if self.pending_since is not None and now - self.pending_since < pending_timeout:
+            return False  # an encoding is already on its way to the matcher
+        return (self.verified_at is None
+                or self.confidence < min_confidence
+                or now - self.verified_at >= reverify_interval)
+
+
+class FaceTracker:
+    """
+    Assigns track IDs to detections and decides which faces to encode.
+
+    Thread-safe: detection workers call `update()` and the matcher calls
+    `verify()`. Frames older than the newest one already applied are
+    associated read-only, so out-of-order workers never rewind a track.
+
+    Args:
+        iou_threshold: Minimum IoU to continue a track
+        max_missed: Processed frames a track survives without a detection
+        reverify_interval: Seconds before a track's identity is re-checked
+        min_confidence: Confidence below which a track is re-encoded early
+        pending_timeout: Seconds after which an encoding that never reached
+            `verify()` (lost to an error) no longer blocks re-encoding
+    """
+
+    def __init__(self, iou_threshold: float = TRACK_IOU_THRESHOLD, max_missed: int = TRACK_MAX_MISSED,
+                 reverify_interval: float = TRACK_REVERIFY_INTERVAL,
+                 min_confidence: float = TRACK_MIN_CONFIDENCE,
+                 pending_timeout: float = TRACK_PENDING_TIMEOUT):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.reverify_interval = reverify_interval
+        self.min_confidence = min_confidence
+        self.pending_timeout = pending_timeout
+
+        self.tracks = {}
+        self.faces_seen = 0
+        self.faces_encoded = 0
+        self._next_id = 1
+        self._frame_id = 0
+        self._lock = threading.Lock()
+
+    def _associate(self, locations):
+        """Greedy matching: returns {detection index: (track, iou)}."""
+        pairs = []
+        for i, box in enumerate(locations):
+            for track in self.tracks.values():
+                iou = box_iou(track.box, box)
+                if iou >= self.iou_threshold:
+                    pairs.append((iou, i, track))
+                elif _centroid_distance(track.box, box) < 0.5:
+                    # Moved too far for any overlap but still close: weak association
+                    pairs.append((0.0, i, track))
+        pairs.sort(key=lambda pair: pair[0], reverse=True)
+
+        assigned, used = {}, set()
+        for iou, i, track in pairs:
+            if i in assigned or track.track_id in used:
+                continue
+            assigned[i] = (track, iou)
+            used.add(track.track_id)
+        return assigned
+
+    def update(self, frame_id: int, locations, now: float | None = None):
+        """
+        Associate one frame's detections with tracks.
+
+        Args:
+            frame_id: Increasing frame number
+            locations: (top, right, bottom, left) boxes detected in the frame
+            now: Timestamp used for re-verification (defaults to time.monotonic())
+
+        Returns:
+            Tuple of (track_ids, to_encode): a track ID (or None) per detection
+            and the indices of detections whose faces must be encoded
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.faces_seen += len(locations)
+            assigned = self._associate(locations)
+
+            if frame_id < self._frame_id:
+                # Stale frame from a slower worker: label it, change nothing
+                track_ids = [assigned[i][0].track_id if i in assigned else None for i in range(len(locations))]
+                return track_ids, []
+            self._frame_id = frame_id
+
+            track_ids, to_encode = [], []
+            for i, box in enumerate(locations):
+                if i in assigned:
+                    track, iou = assigned[i]
+                    # Weak overlap means the face may have been swapped: trust it less
+                    track.confidence *= min(1.0, iou / STRONG_IOU)
+                    track.box = box
+                    track.missed = 0
+                else:
+                    track = Track(self._next_id, box)
+                    self.tracks[track.track_id] = track
+                    self._next_id += 1
+
+                if track.needs_encoding(now, self.reverify_interval, self.min_confidence, self.pending_timeout):
+                    track.pending_since = now
+                    to_encode.append(i)
+                track_ids.append(track.track_id)
+
+            seen = set(track_ids)
+            for track in list(self.tracks.values()):
+                if track.track_id not in seen:
+                    track.missed += 1
+                    track.confidence *= 0.5
+                    if track.missed > self.max_missed:
+                        del self.tracks[track.track_id]
+
+            self.faces_encoded += len(to_encode)
+            return track_ids, to_encode
+
+    def verify(self, track_id: int, user_id: str | None, distance: float | None,
+               now: float | None = None) -> bool:
+        """
+        Record a track's freshly matched identity.
+
+        Returns:
+            True if the track's identity changed (new track or new person)
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            track = self.tracks.get(track_id)
+            if track is None:
+                return False  # expired while its encoding was being matched
+            changed = track.verified_at is None or track.user_id != user_id
+            track.user_id = user_id
+            track.distance = distance
+            track.confidence = 1.0
+            track.verified_at = now
+            track.pending_since = None
+            return changed
+
+    def release(self, track_ids):
+        """Forget in-flight encodings that will never be verified (encoding or matching failed)."""
+        with self._lock:
+            for track_id in track_ids:
+                track = self.tracks.get(track_id)
+                if track is not None:
+                    track.pending_since = None
+
+    def identity(self, track_id: int | None):
+        """(user_id, distance) cached for a track, or (None, None)."""
+        with self._lock:
+            track = self.tracks.get(track_id)
+            if track is None:
+                return None, None
+            return track.user_id, track.distance
+
+    def __len__(self):
+        with self._lock:
+            return len(self.tracks)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tracks": len(self.tracks),
+                "faces_seen": self.faces_seen,
+                "faces_encoded": self.faces_encoded
+            }
@@ -1,12 +1,41 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.api.auth import router as auth_router
 from app.api.users import router as users_router
 from app.api.attendance import router as attendance_router
+from app.db.async_mongo import close_database, open_database
+from app.db.schema import ensure_indexes_on_startup
+from app.face.frame_recognition import frame_recognizer
+from app.face.registration_jobs import registration_jobs
+from app.services.login_guard import password_verifier
 from fastapi.middleware.cors import CORSMiddleware
 
+# App loggers (e.g. auth decisions at DEBUG); uvicorn configures its own
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s %(message)s"
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Index builds use the sync client; keep them off the event loop
+    await asyncio.to_thread(ensure_indexes_on_startup)
+    open_database(app)
+    yield
+    registration_jobs.shutdown()
+    frame_recognizer.shutdown()
+    password_verifier.shutdown()
+    close_database(app)
+
+
 app = FastAPI(
     title="Face Recognition Attendance System",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -21,6 +50,7 @@ app.include_router(auth_router)
 app.include_router(users_router)
 app.include_router(attendance_router)
 
+
 @app.get("/health")
-def health_check():
+async def health_check():
     return {"status": "ok"}
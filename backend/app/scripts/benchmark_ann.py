@@ -0,0 +1,75 @@
+"""
+Recall-vs-latency benchmark of the IVF face index against brute force.
+
+Uses synthetic 128-d encodings: a set of identities, each with a few noisy
+samples, queried with fresh noisy samples of enrolled identities.
+
+Usage (from backend/):
+    python -m app.scripts.benchmark_ann --size 100000 --queries 1000
+"""
+import argparse
+import time
+import numpy as np
+from app.face.ann_index import IVFIndex
+from app.face.gallery import ENCODING_DIM, FaceGallery
+
+
+def synthetic_encodings(identities: int, samples: int, noise: float, rng):
+    """Clustered encodings at dlib-like scale (~0.9 between different people)."""
+    scale = 0.9 / np.sqrt(2 * ENCODING_DIM)
+    centers = rng.normal(0, scale, (identities, ENCODING_DIM)).astype(np.float32)
+    encodings = np.repeat(centers, samples, axis=0)
+    encodings += rng.normal(0, noise / np.sqrt(ENCODING_DIM), encodings.shape).astype(np.float32)
+    ids = np.repeat(np.arange(identities), samples).astype(str)
+    return centers, encodings, ids
+
+
+def timed_query(index, queries, **kwargs):
+    start = time.perf_counter()
+    ids, _ = index.query(queries, k=1, **kwargs)
+    return ids[:, 0], (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100_000, help="Total encodings in the gallery")
+    parser.add_argument("--samples", type=int, default=1, help="Encodings per identity")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--noise", type=float, default=0.25, help="Per-sample noise (euclidean)")
+    parser.add_argument("--nlist", type=int, default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    identities = args.size // args.samples
+    centers, encodings, ids = synthetic_encodings(identities, args.samples, args.noise, rng)
+
+    picked = rng.choice(identities, size=args.queries)
+    queries = centers[picked] + rng.normal(0, args.noise / np.sqrt(ENCODING_DIM),
+                                           (args.queries, ENCODING_DIM)).astype(np.float32)
+
+    exact = FaceGallery.from_encodings(encodings, ids)
+    truth, exact_ms = timed_query(exact, queries)
+
+    start = time.perf_counter()
+    index = IVFIndex(nlist=args.nlist)
+    index.add(encodings, ids)
+    if not index.is_trained:
+        index.train()
+    build_s = time.perf_counter() - start
+
+    print(f"Gallery: {len(exact)} encodings, {args.queries} queries")
+    print(f"IVF build: {build_s:.2f}s ({index.nlist} cells)")
+    print()
+    print(f"{'method':<16}{'recall@1':>10}{'ms/query':>12}{'speedup':>10}")
+    print(f"{'brute force':<16}{1.0:>10.4f}{exact_ms:>12.4f}{1.0:>10.1f}")
+
+    nprobe = 1
+    while nprobe <= index.nlist:
+        found, ms = timed_query(index, queries, nprobe=nprobe)
+        recall = float(np.mean(found == truth))
+        print(f"{f'ivf nprobe={nprobe}':<16}{recall:>10.4f}{ms:>12.4f}{exact_ms / ms:>10.1f}")
+        nprobe *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Latency and recall benchmark of the face detector backends.
+
+Runs every available backend over a folder of test images. Recall is
+measured against a ground-truth file when one is given (JSON mapping
+file name -> list of [top, right, bottom, left] boxes, a detection
+counts when IoU >= 0.5); otherwise every image is assumed to contain
+exactly one face, as with enrolment photos.
+
+Usage (from backend/):
+    python -m app.scripts.benchmark_detectors tests/faces/
+    python -m app.scripts.benchmark_detectors tests/faces/ --truth boxes.json --scale 0.5
+"""
+import argparse
+import json
+import os
+import time
+import cv2
+from app.face.detectors import DETECTORS, create_detector
+from app.face.tracker import box_iou
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def load_images(folder: str):
+    images = []
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            image = cv2.imread(os.path.join(folder, name))
+            if image is not None:
+                images.append((name, image))
+    return images
+
+
+def matched_faces(found, truth) -> int:
+    """Ground-truth boxes hit by a detection (each detection counts once)."""
+    hits, used = 0, set()
+    for expected in truth:
+        for i, box in enumerate(found):
+            if i not in used and box_iou(expected, box) >= 0.5:
+                used.add(i)
+                hits += 1
+                break
+    return hits
+
+
+def benchmark(detector, images, truth=None, warmup: int = 2):
+    """Returns (ms per image, recall, detections per image)."""
+    for _, image in images[:warmup]:
+        detector.detect(image)
+
+    elapsed, expected, hits, detections = 0.0, 0, 0, 0
+    for name, image in images:
+        start = time.perf_counter()
+        found = detector.detect(image)
+        elapsed += time.perf_counter() - start
+        detections += len(found)
+        if truth is not None:
+            boxes = truth.get(name, [])
+            expected += len(boxes)
+            hits += matched_faces(found, boxes)
+        else:
+            expected += 1
+            hits += 1 if found else 0
+    return elapsed * 1000 / len(images), hits / max(expected, 1), detections / len(images)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="Folder of test images")
+    parser.add_argument("--truth", help="JSON ground-truth boxes per file name")
+    parser.add_argument("--scale", type=float, default=1.0, help="Downscale factor applied before detection")
+    parser.add_argument("--detectors", nargs="+", choices=list(DETECTORS), default=list(DETECTORS))
+    args = parser.parse_args()
+
+    images = load_images(args.folder)
+    if not images:
+        print(f"✗ No images found in {args.folder}")
+        return
+    truth = None
+    if args.truth:
+        with open(args.truth, encoding="utf-8") as f:
+            truth = {name: [tuple(box) for box in boxes] for name, boxes in json.load(f).items()}
+
+    print(f"Images: {len(images)}, scale {args.scale}, recall against "
+          f"{'ground truth (IoU >= 0.5)' if truth else 'one face per image'}")
+    print()
+    print(f"{'detector':<10}{'ms/image':>10}{'recall':>10}{'faces/image':>13}")
+    for name in args.detectors:
+        try:
+            detector = create_detector(name, scale=args.scale)
+        except (FileNotFoundError, cv2.error) as e:
+            print(f"{name:<10}  skipped: {e}")
+            continue
+        ms, recall, per_image = benchmark(detector, images, truth)
+        print(f"{name:<10}{ms:>10.1f}{recall:>10.3f}{per_image:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
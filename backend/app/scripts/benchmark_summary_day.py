@@ -0,0 +1,129 @@
+"""
+Load benchmark: requests per second and tail latency of /attendance/summary/day.
+
+Logs in as admin, then keeps `--concurrency` keep-alive connections busy
+for `--duration` seconds and reports throughput and p50/p99 latency per
+target. To compare the sync (blocking pymongo) and async (motor) data
+layers, run the previous build on a second port and pass both:
+
+    git worktree add ../before <commit before the async data layer>
+    (cd ../before/backend && uvicorn app.main:app --port 8001 --workers 1)
+    uvicorn app.main:app --port 8000 --workers 1
+
+Usage (from backend/, with the API(s) running):
+    python -m app.scripts.benchmark_summary_day --target before=http://localhost:8001 --target after=http://localhost:8000
+    python -m app.scripts.benchmark_summary_day --concurrency 16 64 256
+"""
+import argparse
+import http.client
+import json
+import os
+import threading
+import time
+import urllib.parse
+from datetime import date
+
+
+def login(base: str, user_id: str, password: str) -> str:
+    url = urllib.parse.urlsplit(base)
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    query = urllib.parse.urlencode({"user_id": user_id, "password": password})
+    conn.request("POST", f"/auth/login?{query}")
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    if response.status != 200:
+        raise RuntimeError(f"login failed ({response.status}): {body[:200]!r}")
+    return json.loads(body)["access_token"]
+
+
+def worker(base: str, path: str, token: str, start_at: float, stop_at: float, latencies: list, errors: list):
+    """Issue requests back to back on one keep-alive connection."""
+    url = urllib.parse.urlsplit(base)
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    headers = {"Authorization": f"Bearer {token}"}
+    while time.perf_counter() < stop_at:
+        sent = time.perf_counter()
+        try:
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+            ok = False
+        done = time.perf_counter()
+        if done < start_at:
+            continue  # warm-up
+        if ok:
+            latencies.append(done - sent)
+        else:
+            errors.append(done)
+    conn.close()
+
+
+def run(base: str, path: str, token: str, concurrency: int, duration: float, warmup: float) -> dict:
+    latencies, errors = [], []
+    start_at = time.perf_counter() + warmup
+    stop_at = start_at + duration
+    threads = [
+        threading.Thread(target=worker, args=(base, path, token, start_at, stop_at, latencies, errors), daemon=True)
+        for _ in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ordered = sorted(latencies)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000 if ordered else 0.0
+
+    return {
+        "requests": len(ordered),
+        "errors": len(errors),
+        "rps": len(ordered) / duration,
+        "p50_ms": percentile(0.50),
+        "p99_ms": percentile(0.99)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", metavar="LABEL=URL",
+                        help="API to benchmark; repeat to compare builds (default: api=http://localhost:8000)")
+    parser.add_argument("--admin-id", default=os.getenv("ADMIN_ID"))
+    parser.add_argument("--admin-password", default=os.getenv("ADMIN_PASSWORD"))
+    parser.add_argument("--date", default=date.today().isoformat(), help="Day to summarise")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[64], help="Concurrent connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per run")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before each run")
+    args = parser.parse_args()
+
+    targets = [t.split("=", 1) for t in (args.target or ["api=http://localhost:8000"])]
+    path = f"/attendance/summary/day?{urllib.parse.urlencode({'date': args.date})}"
+
+    tokens = {}
+    for label, base in targets:
+        try:
+            tokens[label] = login(base, args.admin_id, args.admin_password)
+        except (OSError, RuntimeError) as e:
+            print(f"✗ {label} ({base}): {e}")
+    if not tokens:
+        return
+
+    print(f"GET {path}, {args.duration:.0f}s per run\n")
+    print(f"{'target':<12}{'clients':>8}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for concurrency in args.concurrency:
+        for label, base in targets:
+            if label not in tokens:
+                continue
+            result = run(base, path, tokens[label], concurrency, args.duration, args.warmup)
+            print(f"{label:<12}{concurrency:>8}{result['requests']:>10}{result['errors']:>8}"
+                  f"{result['rps']:>10.0f}{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""
+Write the memory-mapped gallery snapshot used by recognizers at startup.
+
+Usage (from backend/):
+    python -m app.scripts.build_gallery_snapshot [--path FILE]
+"""
+import argparse
+from app.face.face_service import GALLERY_SNAPSHOT_PATH, write_gallery_snapshot
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the face gallery snapshot")
+    parser.add_argument("--path", default=GALLERY_SNAPSHOT_PATH)
+    args = parser.parse_args()
+
+    epoch = write_gallery_snapshot(args.path)
+    print(f"Gallery snapshot written: {args.path} (epoch {epoch})")
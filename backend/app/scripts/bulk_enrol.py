@@ -0,0 +1,70 @@
+"""
+Enrol a whole class roster of photos from the command line.
+
+Takes a zip or a folder of photos named `<user_id>.jpg` and an optional
+roster CSV (user_id, name, password, email, department, photo) used to
+create users that do not exist yet. A `roster.csv` inside the zip or
+folder is picked up automatically.
+
+Usage (from backend/):
+    python -m app.scripts.bulk_enrol photos/semester1.zip
+    python -m app.scripts.bulk_enrol photos/semester1/ --roster roster.csv --workers 8
+"""
+import argparse
+import os
+import time
+from app.face.bulk_enrolment import (
+    BULK_ENROL_WORKERS, IMAGE_EXTENSIONS, bulk_enrol, items_from_files, items_from_zip, read_roster
+)
+
+
+def load_items(path: str, roster_path: str | None):
+    roster = None
+    if roster_path:
+        with open(roster_path, encoding="utf-8-sig") as f:
+            roster = read_roster(f.read())
+
+    if os.path.isfile(path):
+        with open(path, "rb") as f:
+            return items_from_zip(f.read(), roster)
+
+    files = []
+    for name in sorted(os.listdir(path)):
+        full = os.path.join(path, name)
+        if name.lower() == "roster.csv" and roster is None:
+            with open(full, encoding="utf-8-sig") as f:
+                roster = read_roster(f.read())
+        elif name.lower().endswith(IMAGE_EXTENSIONS):
+            with open(full, "rb") as f:
+                files.append((name, f.read()))
+    return items_from_files(files, roster)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="Zip file or folder of photos")
+    parser.add_argument("--roster", help="Roster CSV for creating new users")
+    parser.add_argument("--tolerance", type=float, default=0.45, help="Duplicate face distance threshold")
+    parser.add_argument("--workers", type=int, default=BULK_ENROL_WORKERS, help="Worker processes")
+    args = parser.parse_args()
+
+    items = load_items(args.path, args.roster)
+    if not items:
+        print(f"✗ No photos found in {args.path}")
+        return
+    print(f"Enrolling {len(items)} photos with {args.workers} worker process(es)...")
+
+    start = time.perf_counter()
+    for event in bulk_enrol(items, tolerance=args.tolerance, workers=args.workers):
+        if event["status"] == "enrolled":
+            print(f"  ✓ {event['user_id']} - enrolled")
+        elif event["status"] == "error":
+            print(f"  ✗ {event['user_id']} ({event['filename']}) - {event['error']}")
+        elif event["status"] == "done":
+            elapsed = time.perf_counter() - start
+            print(f"\nDone in {elapsed:.1f}s: {event['enrolled']} enrolled "
+                  f"({event['created']} new users), {event['failed']} failed of {event['total']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Apply the declared MongoDB indexes and verify hot queries use them.
+
+Creates any missing index from `app.db.schema.INDEXES`, then runs
+`explain()` on every query in `HOT_QUERIES` and prints its plan. Exits
+with status 1 if an index could not be built or a plan falls back to a
+collection scan, so it can gate deployments and CI.
+
+If old duplicate attendance marks block the unique (user_id, date)
+index, --dedupe keeps the earliest mark per user and day and deletes the
+rest before building it.
+
+Usage (from backend/):
+    python -m app.scripts.check_query_plans
+    python -m app.scripts.check_query_plans --dedupe
+    python -m app.scripts.check_query_plans --no-create
+"""
+import argparse
+import sys
+from app.db.schema import check_query_plans, ensure_indexes, find_duplicate_marks, remove_duplicate_marks
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--no-create", action="store_true", help="Only check plans, do not create indexes")
+    parser.add_argument("--dedupe", action="store_true", help="Remove duplicate attendance marks first")
+    args = parser.parse_args()
+
+    failed = False
+    if args.dedupe:
+        print(f"✓ Removed {remove_duplicate_marks()} duplicate attendance mark(s)")
+
+    if not args.no_create:
+        failures = ensure_indexes()
+        if failures:
+            failed = True
+            duplicates = find_duplicate_marks()
+            if duplicates:
+                print(f"✗ {len(duplicates)} user/day pair(s) have duplicate marks; rerun with --dedupe")
+        else:
+            print("✓ All declared indexes present")
+
+    print(f"\n{'query':<28}{'plan':<8}  stages")
+    for label, stages, ok in check_query_plans():
+        print(f"{label:<28}{'✓ ok' if ok else '✗ SCAN':<8}  {' > '.join(stages)}")
+        failed = failed or not ok
+
+    if failed:
+        print("\n✗ Query plan check failed")
+        return 1
+    print("\n✅ Every hot query uses an index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Compact users stored with many raw face samples to centroid + prototypes.
+
+Reports gallery size and brute-force match cost before and after. Users
+whose samples are inconsistent are left untouched and listed.
+
+Compacted users get a new `face_registered_at` and the gallery snapshot
+is rewritten, so recognizers started afterwards load the compacted
+encodings. Recognizers and API workers already running keep matching
+against the old samples (they never replace a user already indexed):
+restart them after compacting.
+
+Usage (from backend/):
+    python -m app.scripts.compact_face_samples [--dry-run] [--batch-size 500]
+"""
+import argparse
+import time
+from datetime import datetime
+import numpy as np
+from pymongo import UpdateOne
+from app.db.mongo import users_collection
+from app.face.encoding_store import pack_encodings
+from app.face.face_service import GALLERY_SNAPSHOT_PATH, iter_registered_faces, write_gallery_snapshot
+from app.face.gallery import ENCODING_DIM, FaceGallery
+from app.face.prototypes import FACE_PROTOTYPES, summarize_samples
+
+
+def match_cost_ms(users, queries: np.ndarray, tolerance: float = 0.45) -> tuple:
+    """(gallery rows, ms per query) of brute-force matching over `users`."""
+    gallery = FaceGallery()
+    for user_id, encodings in users:
+        gallery.add(encodings, user_id)
+    if len(gallery) == 0:
+        return 0, 0.0
+    gallery.match(queries[:1], tolerance)  # warm-up
+    start = time.perf_counter()
+    gallery.match(queries, tolerance)
+    return len(gallery), (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def compact(batch_size: int = 500, dry_run: bool = False):
+    before, after, ops, skipped = [], [], [], []
+    compacted = 0
+    now = datetime.utcnow()
+    for user_id, encodings, _ in iter_registered_faces():
+        before.append((user_id, encodings))
+        if len(encodings) <= 1 + FACE_PROTOTYPES:
+            after.append((user_id, encodings))
+            continue
+        try:
+            summary = summarize_samples(encodings)
+        except ValueError:
+            skipped.append(user_id)
+            after.append((user_id, encodings))
+            continue
+        after.append((user_id, summary.encodings))
+        ops.append(UpdateOne({"user_id": user_id}, {"$set": {
+            **pack_encodings(summary.encodings),
+            "face_registered_at": now
+        }}))
+        compacted += 1
+
+        if len(ops) >= batch_size:
+            if not dry_run:
+                users_collection.bulk_write(ops, ordered=False)
+            ops = []
+
+    if ops and not dry_run:
+        users_collection.bulk_write(ops, ordered=False)
+    return before, after, compacted, skipped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact multi-sample face encodings")
+    parser.add_argument("--dry-run", action="store_true", help="Report without writing")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200, help="Queries for the match cost measurement")
+    args = parser.parse_args()
+
+    before, after, compacted, skipped = compact(args.batch_size, args.dry_run)
+
+    # Queries: noisy copies of stored samples, the same for both measurements
+    rng = np.random.default_rng(0)
+    rows = np.concatenate([encodings for _, encodings in before]) if before else np.empty((0, ENCODING_DIM))
+    queries = rows[rng.integers(0, max(len(rows), 1), args.queries)] if len(rows) else rows
+    queries = queries + rng.normal(0, 0.02, queries.shape).astype(np.float32)
+
+    action = "would be compacted" if args.dry_run else "compacted"
+    print(f"{compacted} of {len(before)} user(s) {action}")
+    if skipped:
+        print(f"Skipped (inconsistent samples): {', '.join(skipped)}")
+    if len(queries):
+        for label, users in (("before", before), ("after", after)):
+            size, ms = match_cost_ms(users, queries)
+            print(f"{label:<7} {size:>8} gallery rows  {ms:8.3f} ms/query")
+
+    if compacted and not args.dry_run:
+        try:
+            epoch = write_gallery_snapshot(GALLERY_SNAPSHOT_PATH)
+            print(f"✓ Gallery snapshot rewritten (epoch {epoch})")
+        except OSError as e:
+            print(f"⚠ Could not rewrite gallery snapshot {GALLERY_SNAPSHOT_PATH}: {e}")
+        print("⚠ Restart running recognizers and API workers to match against the compacted encodings")
@@ -0,0 +1,119 @@
+"""
+Load test: login throughput, and other endpoints' latency during a login storm.
+
+Creates `--users` throwaway students (`loadtest-<timestamp>-<n>`), then
+measures a probe endpoint on an idle server and again while every
+student logs in `--logins` times at `--concurrency` logins in flight
+(the "9am, whole class at once" case). Prints login throughput, login
+latency, the status codes returned (429 = throttled, 503 = verification
+queue full) and both probe latency distributions. The first login of
+each student runs bcrypt; repeats are served from the verified-session
+cache.
+
+All requests come from one address, so run the API with
+LOGIN_IP_ATTEMPTS above users x logins (or expect 429s), and against a
+test database.
+
+Usage (from backend/, with the API running):
+    python -m app.scripts.load_test_login --users 60 --logins 3 --concurrency 60
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.parse
+from app.scripts.load_test_registration import probe, request, summarize
+
+
+def login(base: str, user_id: str, password: str):
+    query = urllib.parse.urlencode({"user_id": user_id, "password": password})
+    return request("POST", f"{base}/auth/login?{query}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--admin-id", default=os.getenv("ADMIN_ID"))
+    parser.add_argument("--admin-password", default=os.getenv("ADMIN_PASSWORD"))
+    parser.add_argument("--users", type=int, default=60, help="Students logging in")
+    parser.add_argument("--logins", type=int, default=3, help="Logins per student")
+    parser.add_argument("--concurrency", type=int, default=60, help="Logins in flight at once")
+    parser.add_argument("--probe", default="/users/me", help="Endpoint to time")
+    parser.add_argument("--baseline", type=float, default=5.0, help="Seconds of idle measurement")
+    args = parser.parse_args()
+
+    base = args.base_url.rstrip("/")
+    status, data = login(base, args.admin_id, args.admin_password)
+    if status != 200:
+        print(f"✗ Admin login failed ({status})")
+        return
+    token = data["access_token"]
+
+    prefix = f"loadtest-{int(time.time())}"
+    password = "loadtest"
+    students = []
+    for n in range(args.users):
+        user_id = f"{prefix}-{n}"
+        status, _ = request("POST", f"{base}/users/create", token,
+                            json.dumps({"user_id": user_id, "password": password, "name": user_id}).encode(),
+                            "application/json")
+        if status == 200:
+            students.append(user_id)
+    print(f"✓ Created {len(students)} student(s)")
+
+    # Phase 1: idle server
+    baseline, stop = [], threading.Event()
+    prober = threading.Thread(target=probe, args=(f"{base}{args.probe}", token, stop, baseline))
+    prober.start()
+    time.sleep(args.baseline)
+    stop.set()
+    prober.join()
+
+    # Phase 2: same probe during the login storm
+    loaded, stop = [], threading.Event()
+    prober = threading.Thread(target=probe, args=(f"{base}{args.probe}", token, stop, loaded))
+    prober.start()
+    latencies, statuses, lock = [], [], threading.Lock()
+    attempts = [user_id for _ in range(args.logins) for user_id in students]
+    start = time.perf_counter()
+
+    def run():
+        while True:
+            with lock:
+                if not attempts:
+                    return
+                user_id = attempts.pop(0)
+            sent = time.perf_counter()
+            status, _ = login(base, user_id, password)
+            with lock:
+                latencies.append((time.perf_counter() - sent) * 1000)
+                statuses.append(status)
+
+    workers = [threading.Thread(target=run) for _ in range(args.concurrency)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    prober.join()
+
+    ok = statuses.count(200)
+    print(f"\n{len(statuses)} logins in {elapsed:.1f}s ({args.concurrency} concurrent): "
+          f"{ok / elapsed:.1f} successful logins/s")
+    counts = {status: statuses.count(status) for status in set(statuses)}
+    print("Status codes: " + ", ".join(f"{status}={count}" for status, count in sorted(counts.items())))
+    print("\nLatency (ms)")
+    print(f"{'':<22}{'samples':>8}{'p50':>10}{'p95':>10}{'max':>10}")
+    summarize("login", latencies)
+    summarize(f"{args.probe} idle", baseline)
+    summarize(f"{args.probe} during", loaded)
+
+    status, stats = request("GET", f"{base}/auth/login/stats", token)
+    if status == 200:
+        print("\nServer: " + ", ".join(f"{key}={value}" for key, value in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
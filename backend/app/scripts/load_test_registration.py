@@ -0,0 +1,147 @@
+"""
+Load test: dashboard latency while face registrations run.
+
+Measures a dashboard endpoint's latency on an idle server, then again
+while a burst of concurrent face registrations is processed, and prints
+both distributions. With face processing off the event loop the two
+should stay close.
+
+Creates throwaway users named `loadtest-<timestamp>-<n>`; run it against
+a test database. Registrations after the first are rejected as duplicate
+faces, but only after the full decode/detect/encode work, so they still
+load the server.
+
+Usage (from backend/, with the API running):
+    python -m app.scripts.load_test_registration --image face.jpg --registrations 20
+"""
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+
+def request(method: str, url: str, token: str | None = None, body: bytes | None = None,
+            content_type: str | None = None):
+    """Returns (status, parsed JSON body)."""
+    req = urllib.request.Request(url, data=body, method=method)
+    if token:
+        req.add_header("Authorization", f"Bearer {token}")
+    if content_type:
+        req.add_header("Content-Type", content_type)
+    try:
+        with urllib.request.urlopen(req, timeout=120) as response:
+            return response.status, json.loads(response.read() or b"null")
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"null")
+
+
+def multipart(field: str, filename: str, data: bytes):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def probe(url: str, token: str, stop: threading.Event, latencies: list):
+    """Hit the dashboard endpoint back to back until `stop` is set."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        request("GET", url, token)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def register(base: str, token: str, user_id: str, image: bytes, outcomes: list):
+    status, data = request("POST", f"{base}/users/create", token,
+                           json.dumps({"user_id": user_id, "password": "loadtest", "name": user_id}).encode(),
+                           "application/json")
+    if status != 200:
+        outcomes.append(f"create {status}")
+        return
+    body, content_type = multipart("file", f"{user_id}.jpg", image)
+    status, data = request("POST", f"{base}/users/register-face/{user_id}", token, body, content_type)
+    # Long jobs answer 202: poll until they finish
+    while status == 202 or (status == 200 and data.get("status") in ("queued", "running")):
+        time.sleep(0.5)
+        status, data = request("GET", f"{base}{data['status_url']}", token)
+    outcomes.append(data.get("status", "done") if status == 200 else f"register {status}")
+
+
+def summarize(label: str, latencies: list):
+    if not latencies:
+        print(f"{label:<22}no samples")
+        return
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{label:<22}{len(ordered):>8}{statistics.median(ordered):>10.1f}{p95:>10.1f}{ordered[-1]:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--admin-id", default=os.getenv("ADMIN_ID"))
+    parser.add_argument("--admin-password", default=os.getenv("ADMIN_PASSWORD"))
+    parser.add_argument("--image", required=True, help="Photo with exactly one face")
+    parser.add_argument("--registrations", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8, help="Registrations in flight at once")
+    parser.add_argument("--probe", default="/users/me", help="Dashboard endpoint to time")
+    parser.add_argument("--baseline", type=float, default=5.0, help="Seconds of idle measurement")
+    args = parser.parse_args()
+
+    base = args.base_url.rstrip("/")
+    query = urllib.parse.urlencode({"user_id": args.admin_id, "password": args.admin_password})
+    status, data = request("POST", f"{base}/auth/login?{query}")
+    if status != 200:
+        print(f"✗ Admin login failed ({status})")
+        return
+    token = data["access_token"]
+    with open(args.image, "rb") as f:
+        image = f.read()
+
+    # Phase 1: idle server
+    baseline, stop = [], threading.Event()
+    prober = threading.Thread(target=probe, args=(f"{base}{args.probe}", token, stop, baseline))
+    prober.start()
+    time.sleep(args.baseline)
+    stop.set()
+    prober.join()
+
+    # Phase 2: same probe while registrations run
+    loaded, outcomes, stop = [], [], threading.Event()
+    prober = threading.Thread(target=probe, args=(f"{base}{args.probe}", token, stop, loaded))
+    prober.start()
+    prefix = f"loadtest-{int(time.time())}"
+    slots = threading.Semaphore(args.concurrency)
+    start = time.perf_counter()
+
+    def run(n):
+        with slots:
+            register(base, token, f"{prefix}-{n}", image, outcomes)
+
+    workers = [threading.Thread(target=run, args=(n,)) for n in range(args.registrations)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    prober.join()
+
+    print(f"\n{args.registrations} registrations in {elapsed:.1f}s ({args.concurrency} concurrent)")
+    counts = {outcome: outcomes.count(outcome) for outcome in set(outcomes)}
+    print("Outcomes: " + ", ".join(f"{outcome}={count}" for outcome, count in sorted(counts.items())))
+    print(f"\nLatency of GET {args.probe} (ms)")
+    print(f"{'':<22}{'samples':>8}{'p50':>10}{'p95':>10}{'max':>10}")
+    summarize("idle", baseline)
+    summarize("during registrations", loaded)
+
+
+if __name__ == "__main__":
+    main()
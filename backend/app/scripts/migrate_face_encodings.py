@@ -0,0 +1,49 @@
+"""
+Convert legacy float-list face encodings to the binary float32 format.
+
+Usage (from backend/):
+    python -m app.scripts.migrate_face_encodings [--dry-run] [--batch-size 500]
+"""
+import argparse
+from pymongo import UpdateOne
+from app.db.mongo import users_collection
+from app.face.encoding_store import ENCODING_FORMAT_VERSION, pack_encodings, unpack_encodings
+
+
+def migrate(batch_size: int = 500, dry_run: bool = False) -> int:
+    """Rewrite every legacy document; returns the number of users converted."""
+    legacy = users_collection.find(
+        {
+            "face_encodings": {"$type": "array"},
+            "face_encoding_format": {"$ne": ENCODING_FORMAT_VERSION}
+        },
+        {"_id": 1, "face_encodings": 1}
+    )
+
+    converted = 0
+    ops = []
+    for user in legacy:
+        fields = pack_encodings(unpack_encodings(user["face_encodings"]))
+        ops.append(UpdateOne({"_id": user["_id"]}, {"$set": fields}))
+        converted += 1
+
+        if len(ops) >= batch_size:
+            if not dry_run:
+                users_collection.bulk_write(ops, ordered=False)
+            ops = []
+
+    if ops and not dry_run:
+        users_collection.bulk_write(ops, ordered=False)
+
+    return converted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate face encodings to binary float32 storage")
+    parser.add_argument("--dry-run", action="store_true", help="Count documents without writing")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    count = migrate(args.batch_size, args.dry_run)
+    action = "would be converted" if args.dry_run else "converted"
+    print(f"{count} user(s) {action}")
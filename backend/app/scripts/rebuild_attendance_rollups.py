@@ -0,0 +1,46 @@
+"""
+Backfill or verify the pre-aggregated attendance rollups.
+
+Without flags, recomputes every daily and per-user monthly count from
+the attendance collection and replaces the stored rollups (run it once
+after upgrading, and whenever --check reports drift). With --check, only
+compares and lists mismatches; the exit status is 1 if any are found.
+
+Usage (from backend/):
+    python -m app.scripts.rebuild_attendance_rollups
+    python -m app.scripts.rebuild_attendance_rollups --check
+"""
+import argparse
+import sys
+from app.attendance.rollups import check_rollups, rebuild_rollups
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rebuild or check attendance rollups")
+    parser.add_argument("--check", action="store_true", help="Only report mismatches")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=20, help="Mismatches listed by --check")
+    args = parser.parse_args()
+
+    if not args.check:
+        daily, monthly = rebuild_rollups(args.batch_size)
+        print(f"✓ Rebuilt {daily} daily and {monthly} monthly rollup(s)")
+
+    mismatches = check_rollups()
+    if not mismatches:
+        print("✓ Rollups match the attendance collection")
+        return 0
+
+    print(f"✗ {len(mismatches)} rollup(s) differ from the attendance collection")
+    for kind, key, stored, actual in mismatches[:args.limit]:
+        label = key if kind == "daily" else f"{key[0]} {key[1]}"
+        print(f"  {kind:<8} {label:<30} stored={stored:<6} actual={actual}")
+    if len(mismatches) > args.limit:
+        print(f"  ... and {len(mismatches) - args.limit} more")
+    if args.check:
+        print("Run without --check to rebuild")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 from app.db.mongo import users_collection
+from pymongo.errors import DuplicateKeyError
 from app.services.auth import hash_password
 from datetime import datetime
 import os
@@ -11,13 +12,16 @@ existing = users_collection.find_one({"user_id": ADMIN_ID})
 if existing:
     print("Admin already exists")
 else:
-    users_collection.insert_one({
-        "user_id": ADMIN_ID,
-        "password_hash": hash_password(ADMIN_PASSWORD),
-        "role": "admin",
-        "name": "Super Admin",
-        "email": None,
-        "department": None,
-        "created_at": datetime.utcnow()
-    })
-    print("Admin user created successfully")
+    try:
+        users_collection.insert_one({
+            "user_id": ADMIN_ID,
+            "password_hash": hash_password(ADMIN_PASSWORD),
+            "role": "admin",
+            "name": "Super Admin",
+            "email": None,
+            "department": None,
+            "created_at": datetime.utcnow()
+        })
+        print("Admin user created successfully")
+    except DuplicateKeyError:
+        print("Admin already exists")
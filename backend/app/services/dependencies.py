@@ -1,27 +1,49 @@
+import logging
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
 
-from app.db.mongo import users_collection
+from app.db.async_mongo import get_db
 from app.services.jwt_service import SECRET_KEY, ALGORITHM
+from app.services.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
+# Role of device tokens that may only submit frames for recognition
+KIOSK_ROLE = "kiosk"
+
+# Profile fields returned to routes; never password_hash or face_encodings
+USER_PROFILE_FIELDS = ("user_id", "role", "name", "email", "department", "created_at", "face_registered_at")
+
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db=Depends(get_db)
 ):
-    print("DEBUG: Authorization header received")
+    return await get_user_from_token(credentials.credentials, db)
+
+
+async def get_user_from_token(token: str, db):
+    """
+    Resolve a JWT to the user it was issued for.
+
+    Used directly by routes that cannot send an Authorization header,
+    such as WebSockets opened from the browser.
 
-    token = credentials.credentials
-    print("DEBUG: Token received:", token[:20], "...")
+    Args:
+        token: JWT, with or without a "Bearer " prefix
+        db: Async database (see `app.db.async_mongo.get_db`)
 
+    Raises:
+        HTTPException: 401 if the token is invalid or the user is gone
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
     )
 
-    token = credentials.credentials
     if token.lower().startswith("bearer "):
         token = token.split(" ", 1)[1]
 
@@ -33,35 +55,79 @@ def get_current_user(
         if user_id is None or role is None:
             raise credentials_exception
 
-    except JWTError:
+    except JWTError as e:
+        logger.debug("auth rejected reason=invalid_token error=%s", e)
+        raise credentials_exception
+
+    if role == KIOSK_ROLE:
+        # Device tokens never act as a user, even if a user_id happened to match
+        logger.info("auth rejected reason=kiosk_token sub=%s", user_id)
         raise credentials_exception
 
-    user = users_collection.find_one({"user_id": user_id})
+    # Fast path: dashboard polling is served without touching MongoDB
+    user_data = user_cache.get(user_id)
+    if user_data is not None:
+        logger.debug("auth ok user_id=%s source=cache", user_id)
+        return user_data
+
+    user = await db.users.find_one({"user_id": user_id}, {field: 1 for field in USER_PROFILE_FIELDS})
     if not user:
+        logger.info("auth rejected reason=unknown_user user_id=%s", user_id)
         raise credentials_exception
 
-    # Return all user fields except password_hash and face_encodings
-    user_data = {
-        "user_id": user["user_id"],
-        "role": user["role"],
-        "name": user.get("name"),
-        "email": user.get("email"),
-        "department": user.get("department"),
-        "created_at": user.get("created_at"),
-        "face_registered_at": user.get("face_registered_at")
-    }
+    user_data = {field: user.get(field) for field in USER_PROFILE_FIELDS}
     
     # Convert ObjectId to string if present
     if "_id" in user:
         user_data["_id"] = str(user["_id"])
     
+    user_cache.set(user_id, user_data)
+    logger.debug("auth ok user_id=%s source=db", user_id)
     return user_data
 
 
-def require_admin(current_user=Depends(get_current_user)):
+async def require_admin(current_user=Depends(get_current_user)):
     if current_user["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
         )
     return current_user
+
+
+async def get_recognizer_from_token(token: str, db):
+    """
+    Resolve a JWT allowed to submit frames for recognition.
+
+    Accepts kiosk device tokens (see `POST /auth/kiosk-token`), which are
+    not backed by a user and grant nothing else, and admin user tokens.
+
+    Returns:
+        Dict with `user_id` and `role` of the caller
+
+    Raises:
+        HTTPException: 401 if the token is invalid, 403 for non-admin users
+    """
+    raw = token.split(" ", 1)[1] if token.lower().startswith("bearer ") else token
+    try:
+        payload = jwt.decode(raw, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        payload = {}
+    if payload.get("role") == KIOSK_ROLE and payload.get("sub"):
+        logger.debug("auth ok kiosk=%s", payload["sub"])
+        return {"user_id": payload["sub"], "role": KIOSK_ROLE}
+
+    user = await get_user_from_token(token, db)
+    if user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Kiosk or admin access required"
+        )
+    return user
+
+
+async def require_recognizer(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db=Depends(get_db)
+):
+    return await get_recognizer_from_token(credentials.credentials, db)
@@ -0,0 +1,202 @@
+"""
+Password verification for logins, off the API's worker threads.
+
+bcrypt is deliberately slow, so a class logging in at once used to tie up
+every threadpool thread. Verifications now run on their own pool of
+`LOGIN_WORKERS` threads (bcrypt releases the GIL while hashing); at most
+`LOGIN_MAX_PENDING` may be queued or running, and further logins are
+refused rather than queued without limit.
+
+`LoginThrottle` limits attempts per client IP and failed attempts per
+user within `LOGIN_THROTTLE_WINDOW` seconds. A successful verification
+is remembered for `LOGIN_SESSION_TTL` seconds as an HMAC of the
+credentials under a per-process key, so logging in again (page reloads,
+expired tokens) skips bcrypt. The entry is tied to the stored hash, so a
+password change invalidates it.
+"""
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.services.auth import verify_password
+from app.services.user_cache import UserCache
+
+LOGIN_WORKERS = int(os.getenv("LOGIN_WORKERS", min(4, os.cpu_count() or 1)))
+LOGIN_MAX_PENDING = int(os.getenv("LOGIN_MAX_PENDING", 64))
+LOGIN_THROTTLE_WINDOW = float(os.getenv("LOGIN_THROTTLE_WINDOW", 60))
+LOGIN_USER_FAILURES = int(os.getenv("LOGIN_USER_FAILURES", 5))
+# Generous: a whole classroom may share one NAT address
+LOGIN_IP_ATTEMPTS = int(os.getenv("LOGIN_IP_ATTEMPTS", 300))
+LOGIN_SESSION_TTL = float(os.getenv("LOGIN_SESSION_TTL", 600))
+LOGIN_SESSION_SIZE = int(os.getenv("LOGIN_SESSION_SIZE", 10000))
+
+
+class LoginQueueFull(Exception):
+    """Too many password verifications are queued or running."""
+
+
+class LoginThrottled(Exception):
+    """Too many attempts from this client or for this user."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+class LoginThrottle:
+    """
+    Fixed-window attempt counters per key. Thread-safe.
+
+    Args:
+        window: Window length in seconds
+        user_failures: Failed attempts allowed per user per window
+        ip_attempts: Attempts allowed per client IP per window
+    """
+
+    def __init__(self, window: float = LOGIN_THROTTLE_WINDOW, user_failures: int = LOGIN_USER_FAILURES,
+                 ip_attempts: int = LOGIN_IP_ATTEMPTS):
+        self.window = window
+        self.user_failures = user_failures
+        self.ip_attempts = ip_attempts
+        self.throttled = 0
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._pruned_at = time.monotonic()
+
+    def _count(self, key, now: float):
+        started, count = self._counters.get(key, (now, 0))
+        if now - started >= self.window:
+            return now, 0
+        return started, count
+
+    def _prune(self, now: float):
+        if now - self._pruned_at < self.window:
+            return
+        self._counters = {k: v for k, v in self._counters.items() if now - v[0] < self.window}
+        self._pruned_at = now
+
+    def check(self, user_id: str, ip: str | None):
+        """
+        Count an attempt from `ip` and refuse it if either limit is reached.
+
+        Raises:
+            LoginThrottled: With the seconds until the blocking window ends
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            blocked = []
+            started, failures = self._count(("user", user_id), now)
+            if failures >= self.user_failures:
+                blocked.append(started)
+            if ip is not None:
+                ip_started, attempts = self._count(("ip", ip), now)
+                if attempts >= self.ip_attempts:
+                    blocked.append(ip_started)
+                else:
+                    self._counters[("ip", ip)] = (ip_started, attempts + 1)
+            if blocked:
+                self.throttled += 1
+                raise LoginThrottled(max(1, int(max(blocked) + self.window - now + 0.999)))
+
+    def failed(self, user_id: str):
+        """Record a failed attempt for `user_id`."""
+        now = time.monotonic()
+        with self._lock:
+            started, failures = self._count(("user", user_id), now)
+            self._counters[("user", user_id)] = (started, failures + 1)
+
+    def succeeded(self, user_id: str):
+        """Clear `user_id`'s failures after a successful login."""
+        with self._lock:
+            self._counters.pop(("user", user_id), None)
+
+
+class PasswordVerifier:
+    """
+    Bounded bcrypt verification pool with a cache of verified credentials.
+    Call `verify` from the event loop only.
+
+    Args:
+        workers: Threads running bcrypt, also the verifications run at once
+        max_pending: Verifications allowed to be queued or running
+        session_ttl: Seconds a successful verification is remembered; 0 disables
+        session_size: Verified credentials remembered at most
+    """
+
+    def __init__(self, workers: int = LOGIN_WORKERS, max_pending: int = LOGIN_MAX_PENDING,
+                 session_ttl: float = LOGIN_SESSION_TTL, session_size: int = LOGIN_SESSION_SIZE):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.verified = 0
+        self.rejected = 0
+        self.session_hits = 0
+        self.queue_full = 0
+        self.sessions = UserCache(ttl=session_ttl, max_size=session_size)
+        self._key = secrets.token_bytes(32)
+        self._pool = None
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="bcrypt")
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _digest(self, user_id: str, password: str, password_hash: str) -> str:
+        message = "\0".join((user_id, password_hash, password)).encode()
+        return hmac.new(self._key, message, hashlib.sha256).hexdigest()
+
+    async def verify(self, user_id: str, password: str, password_hash: str) -> bool:
+        """
+        Check `password` against the user's stored bcrypt hash.
+
+        Raises:
+            LoginQueueFull: If `max_pending` verifications are already queued or running
+        """
+        digest = self._digest(user_id, password, password_hash)
+        cached = self.sessions.get(user_id)
+        if cached is not None and hmac.compare_digest(cached["digest"], digest):
+            self.session_hits += 1
+            return True
+
+        if self.pending >= self.max_pending:
+            self.queue_full += 1
+            raise LoginQueueFull()
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            ok = await loop.run_in_executor(self._executor(), verify_password, password, password_hash)
+        finally:
+            self.pending -= 1
+
+        if ok:
+            self.verified += 1
+            self.sessions.set(user_id, {"digest": digest})
+        else:
+            self.rejected += 1
+        return ok
+
+    def snapshot_stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "verified": self.verified,
+            "rejected": self.rejected,
+            "queue_full": self.queue_full,
+            "session_hits": self.session_hits,
+            "sessions": self.sessions.stats()["entries"]
+        }
+
+
+password_verifier = PasswordVerifier()
+login_throttle = LoginThrottle()
@@ -0,0 +1,75 @@
+"""
+Short-lived cache of authenticated users' public profiles.
+
+`get_current_user` runs on every authenticated request; caching the
+profile it returns lets dashboard polling skip MongoDB. Entries expire
+after `USER_CACHE_TTL` seconds, so changes made by other processes
+(scripts, other API workers) show up within that time. Code in this
+process that changes a user calls `invalidate` so the change is visible
+immediately.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 30))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+
+
+class UserCache:
+    """
+    Thread-safe TTL cache with least-recently-used eviction.
+
+    Args:
+        ttl: Seconds an entry stays valid; 0 disables caching
+        max_size: Entries kept before the least recently used is evicted
+    """
+
+    def __init__(self, ttl: float = USER_CACHE_TTL, max_size: int = USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> dict | None:
+        """Cached profile (a copy), or None if absent or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return dict(entry[1])
+
+    def set(self, user_id: str, profile: dict):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, dict(profile))
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *user_ids: str):
+        """Drop the given users so their next request reads MongoDB."""
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+user_cache = UserCache()
@@ -1,14 +1,37 @@
 import api from './axios';
 
+// Kiosks store a device token that can only submit frames; admins fall back to their own
+const kioskToken = () => localStorage.getItem('kiosk_token') || localStorage.getItem('access_token');
+
 // Attendance APIs
 export const attendanceAPI = {
-  getMyAttendance: async () => {
-    const response = await api.get('/attendance/me');
+  // One page of the user's records, newest first; pass the previous page's next_cursor as cursor
+  getMyAttendance: async ({ cursor, limit = 100 } = {}) => {
+    const params = { limit };
+    if (cursor) params.cursor = cursor;
+    const response = await api.get('/attendance/me', { params });
+    return response.data;
+  },
+
+  // One page of all records; pass the previous page's next_cursor as cursor
+  getAttendancePage: async ({ cursor, limit = 100, from, to, department, userId } = {}) => {
+    const params = { limit };
+    if (cursor) params.cursor = cursor;
+    if (from) params.from = from;
+    if (to) params.to = to;
+    if (department) params.department = department;
+    if (userId) params.user_id = userId;
+    const response = await api.get('/attendance/all', { params });
     return response.data;
   },
 
-  getAllAttendance: async () => {
-    const response = await api.get('/attendance/all');
+  // Aggregated series for a date range (defaults to the last 30 days);
+  // groupBy is 'day', 'department' or 'user'
+  getTrends: async ({ from, to, groupBy = 'day' } = {}) => {
+    const params = { group_by: groupBy };
+    if (from) params.from = from;
+    if (to) params.to = to;
+    const response = await api.get('/attendance/trends', { params });
     return response.data;
   },
 
@@ -20,6 +43,30 @@ export const attendanceAPI = {
   getDailySummary: async (date) => {
     const response = await api.get(`/attendance/summary/day?date=${date}`);
     return response.data;
+  },
+
+  // Server-side recognition of one or more JPEG frames (Blobs) from a kiosk.
+  // Uses the kiosk token from /auth/kiosk-token when one is stored.
+  recognizeFrames: async (frames, token = kioskToken()) => {
+    const formData = new FormData();
+    frames.forEach((frame, i) => formData.append('files', frame, `frame-${i}.jpg`));
+
+    const response = await api.post('/attendance/recognize', formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data',
+        Authorization: `Bearer ${token}`
+      }
+    });
+    return response.data;
+  },
+
+  // Streaming recognition: send JPEG Blobs with socket.send(blob);
+  // onResult receives { frame, dropped, faces | error, processing_ms }
+  openRecognitionSocket: (onResult, token = kioskToken()) => {
+    const url = api.defaults.baseURL.replace(/^http/, 'ws');
+    const socket = new WebSocket(`${url}/attendance/recognize/ws?token=${encodeURIComponent(token)}`);
+    socket.onmessage = (event) => onResult(JSON.parse(event.data));
+    return socket;
   }
 };
 
@@ -49,7 +96,22 @@ export const userAPI = {
         'Content-Type': 'multipart/form-data'
       }
     });
-    return response.data;
+    if (response.status !== 202) {
+      return response.data;
+    }
+
+    // Long-running registration: poll the job until it finishes
+    let job = response.data;
+    while (job.status === 'queued' || job.status === 'running') {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      job = (await api.get(`/users/register-face/jobs/${job.job_id}`)).data;
+    }
+    if (job.status === 'failed') {
+      const error = new Error(job.error);
+      error.response = { data: { detail: job.error } };
+      throw error;
+    }
+    return job.result;
   }
 };
 
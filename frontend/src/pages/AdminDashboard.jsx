@@ -19,7 +19,6 @@ export const AdminDashboard = () => {
     absentToday: 0
   });
   const [allUsers, setAllUsers] = useState([]);
-  const [allAttendance, setAllAttendance] = useState([]);
   const [filteredUsers, setFilteredUsers] = useState([]);
   const [loading, setLoading] = useState(true);
   const [searchTerm, setSearchTerm] = useState('');
@@ -33,18 +32,24 @@ export const AdminDashboard = () => {
   const fetchData = async () => {
     try {
       setLoading(true);
-      // Fetch both users and attendance data
-      const [attendanceResponse, usersResponse] = await Promise.all([
-        attendanceAPI.getAllAttendance(),
+      // Get today's date in local timezone (YYYY-MM-DD)
+      const todayDate = new Date();
+      const today = todayDate.getFullYear() + '-' + 
+                    String(todayDate.getMonth() + 1).padStart(2, '0') + '-' + 
+                    String(todayDate.getDate()).padStart(2, '0');
+
+      // Aggregated on the server: per-day and per-user series for the last 30 days
+      const [dayTrends, userTrends, todaySummary, usersResponse] = await Promise.all([
+        attendanceAPI.getTrends({ to: today, groupBy: 'day' }),
+        attendanceAPI.getTrends({ to: today, groupBy: 'user' }),
+        attendanceAPI.getDailySummary(today),
         userAPI.getAllUsers()
       ]);
       
-      const records = attendanceResponse.attendance || [];
       const users = usersResponse.users || [];
       
-      setAllAttendance(records);
       setAllUsers(users);
-      processData(records, users);
+      processData(dayTrends.series || [], userTrends.series || [], todaySummary, users);
     } catch (error) {
       console.error('Failed to fetch data:', error);
       toast.error('Failed to load dashboard data');
@@ -53,32 +58,26 @@ export const AdminDashboard = () => {
     }
   };
 
-  const processData = (records, users) => {
+  const processData = (days, userSeries, todaySummary, users) => {
     // Create user map with attendance data
     const userMap = {};
-    
-    // Get today's date in local timezone (YYYY-MM-DD)
-    const todayDate = new Date();
-    const today = todayDate.getFullYear() + '-' + 
-                  String(todayDate.getMonth() + 1).padStart(2, '0') + '-' + 
-                  String(todayDate.getDate()).padStart(2, '0');
+    // Days with any attendance in the range count as class days; the
+    // percentages below cover the last 30 days only (labelled in the UI)
+    const classDays = days.length;
 
     // Initialize with user data
     users.forEach(user => {
       userMap[user.user_id] = {
         ...user,
-        totalDays: 0,
+        totalDays: classDays,
         presentDays: 0
       };
     });
 
-    // Process attendance records
-    records.forEach(record => {
-      if (userMap[record.user_id]) {
-        userMap[record.user_id].totalDays++;
-        if (record.status === 'present') {
-          userMap[record.user_id].presentDays++;
-        }
+    // Days present per user
+    userSeries.forEach(row => {
+      if (userMap[row.user_id]) {
+        userMap[row.user_id].presentDays = row.present;
       }
     });
 
@@ -89,13 +88,12 @@ export const AdminDashboard = () => {
         : 0
     }));
 
-    // Calculate today's stats - filter by today's date
-    const todayRecords = records.filter(r => r.date === today);
-    const presentToday = todayRecords.filter(r => r.status === 'present').length;
+    // Today's stats come from the daily summary
+    const presentToday = todaySummary.present_count;
     // Absent today = total students - present students (not just records that exist)
     const absentToday = usersList.length - presentToday;
 
-    console.log('Today:', today, 'Records for today:', todayRecords.length, 'Present:', presentToday, 'Absent:', absentToday);
+    console.log('Today:', todaySummary.date, 'Present:', presentToday, 'Absent:', absentToday);
 
     setStats({
       totalStudents: usersList.length,
@@ -103,29 +101,12 @@ export const AdminDashboard = () => {
       absentToday
     });
 
-    // Process chart data (last 30 days)
-    const dateMap = {};
-    records.forEach(record => {
-      if (!dateMap[record.date]) {
-        dateMap[record.date] = { present: 0, absent: 0, rawDate: record.date };
-      }
-      if (record.status === 'present') {
-        dateMap[record.date].present++;
-      } else {
-        dateMap[record.date].absent++;
-      }
-    });
-
-    const chartArray = Object.entries(dateMap)
-      .map(([date, { present, absent, rawDate }]) => ({
-        date: new Date(date).toLocaleDateString('en-US', { month: 'short', day: 'numeric' }),
-        present,
-        absent,
-        rawDate
-      }))
-      .sort((a, b) => new Date(a.rawDate) - new Date(b.rawDate))
-      .slice(-30)
-      .map(({ rawDate, ...rest }) => rest);
+    // Chart data (last 30 days, already sorted by date)
+    const chartArray = days.map(({ date, present, absent }) => ({
+      date: new Date(date).toLocaleDateString('en-US', { month: 'short', day: 'numeric' }),
+      present,
+      absent
+    }));
 
     setChartData(chartArray);
     filterAndSortStudents(usersList, searchTerm, sortBy);
@@ -228,6 +209,7 @@ export const AdminDashboard = () => {
           <div className="bg-white rounded-lg shadow p-6 border-l-4 border-red-500">
             <div className="text-gray-500 text-sm font-medium">Absent Today</div>
             <div className="text-3xl font-bold text-red-600 mt-2">{stats.absentToday}</div>
+            <div className="text-xs text-gray-400 mt-1">Registered students not marked present</div>
           </div>
         </div>
 
@@ -235,7 +217,10 @@ export const AdminDashboard = () => {
         <div className="grid grid-cols-1 lg:grid-cols-2 gap-8 mb-8">
           {/* Attendance Trend */}
           <div className="bg-white rounded-lg shadow p-6">
-            <h3 className="text-lg font-bold text-gray-900 mb-4">Attendance Trend (Last 30 Days)</h3>
+            <h3 className="text-lg font-bold text-gray-900">Attendance Trend (Last 30 Days)</h3>
+            <p className="text-xs text-gray-400 mb-4">
+              Days with any attendance only; absent = registered students not marked present that day
+            </p>
             {chartData.length === 0 ? (
               <div className="h-64 flex items-center justify-center text-gray-500">No data available</div>
             ) : (
@@ -290,7 +275,10 @@ export const AdminDashboard = () => {
         <div className="bg-white rounded-lg shadow">
           {/* Header */}
           <div className="border-b px-6 py-4">
-            <h3 className="text-lg font-bold text-gray-900 mb-4">Student Details Overview</h3>
+            <h3 className="text-lg font-bold text-gray-900">Student Details Overview</h3>
+            <p className="text-xs text-gray-400 mb-4">
+              Attendance % = days present over class days (days anyone attended) in the last 30 days
+            </p>
             
             <div className="grid grid-cols-1 sm:grid-cols-2 gap-4">
               {/* Search */}
@@ -309,7 +297,7 @@ export const AdminDashboard = () => {
                 className="px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent outline-none"
               >
                 <option value="name">Sort by Name</option>
-                <option value="attendance">Sort by Attendance %</option>
+                <option value="attendance">Sort by Attendance % (30 days)</option>
                 <option value="registered">Sort by Face Registration</option>
               </select>
             </div>
@@ -349,7 +337,7 @@ export const AdminDashboard = () => {
                         )}
                         <p className="text-sm text-gray-600">
                           {student.totalDays > 0 
-                            ? `${student.presentDays}/${student.totalDays} days` 
+                            ? `${student.presentDays}/${student.totalDays} class days` 
                             : 'No attendance'}
                         </p>
                       </div>
@@ -8,6 +8,8 @@ export const StudentDashboard = () => {
   const [records, setRecords] = useState([]);
   const [filteredRecords, setFilteredRecords] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [filterType, setFilterType] = useState('all'); // all, today, week, month
 
   useEffect(() => {
@@ -19,6 +21,7 @@ export const StudentDashboard = () => {
       setLoading(true);
       const data = await attendanceAPI.getMyAttendance();
       setRecords(data.attendance || []);
+      setNextCursor(data.next_cursor || null);
       filterRecords(data.attendance || [], 'all');
     } catch (error) {
       console.error('Failed to fetch attendance:', error);
@@ -28,6 +31,23 @@ export const StudentDashboard = () => {
     }
   };
 
+  // Older records are fetched a page at a time, only when asked for
+  const loadMoreRecords = async () => {
+    try {
+      setLoadingMore(true);
+      const data = await attendanceAPI.getMyAttendance({ cursor: nextCursor });
+      const allRecords = [...records, ...(data.attendance || [])];
+      setRecords(allRecords);
+      setNextCursor(data.next_cursor || null);
+      filterRecords(allRecords, filterType);
+    } catch (error) {
+      console.error('Failed to fetch attendance:', error);
+      toast.error('Failed to load more records');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const filterRecords = (allRecords, type) => {
     const today = new Date();
     let filtered = allRecords;
@@ -174,6 +194,18 @@ export const StudentDashboard = () => {
                 ))}
               </div>
             )}
+
+            {!loading && nextCursor && (
+              <div className="mt-4 text-center">
+                <button
+                  onClick={loadMoreRecords}
+                  disabled={loadingMore}
+                  className="px-4 py-2 rounded-lg font-medium transition bg-gray-100 text-gray-700 hover:bg-gray-200 disabled:opacity-50"
+                >
+                  {loadingMore ? 'Loading...' : 'Load older records'}
+                </button>
+              </div>
+            )}
           </div>
         </div>
       </main>